@@ -1,9 +1,14 @@
 """The ants module implements game logic for Ants Vs. SomeBees."""
 
+import bisect
+import hashlib
+import itertools
+import operator
 import random
 import sys
+from time import perf_counter
 from ucb import main, interact, trace
-from collections import OrderedDict
+from collections import OrderedDict, namedtuple
 
 
 ################
@@ -12,6 +17,8 @@ from collections import OrderedDict
 
 class Place(object):
     """A Place holds insects and has an exit to another Place."""
+    __slots__ = ('name', 'exit', 'bees', 'ant', 'entrance', 'colony', 'index',
+                 'tunnel', 'depth')
 
     def __init__(self, name, exit=None):
         """Create a Place with the given exit.
@@ -21,9 +28,13 @@ class Place(object):
         """
         self.name = name
         self.exit = exit
-        self.bees = []        # A list of Bees
+        self.bees = BeeList() # The Bees in this Place
         self.ant = None       # An Ant
         self.entrance = None  # A Place
+        self.colony = None    # The AntColony that registered this Place
+        self.index = None     # Registration order within the colony
+        self.tunnel = None    # The Tunnel that indexes this Place, if any
+        self.depth = None     # Steps from the exit end of the Tunnel
         # Phase 1: Add an entrance to the exit
         # BEGIN Problem 2
         if self.exit:
@@ -42,6 +53,8 @@ class Place(object):
         if insect.is_ant:
             if self.ant is None:
                 self.ant = insect
+                if self.colony is not None:
+                    self.colony.place_occupied(self)
             else:
                 # Phase 4: Special handling for BodyguardAnt
                 # BEGIN Problem 7
@@ -55,9 +68,18 @@ class Place(object):
                 else:
                     assert self.ant is None, 'Two ants in {0}'.format(self)
                 # END Problem 7
+            if self.tunnel is not None and self.tunnel.arrivals is not None:
+                self.tunnel.arrivals.append(insect)
         else:
             self.bees.append(insect)
+            if self.colony is not None:
+                self.colony.bee_entered(insect)
+            if self.tunnel is not None and len(self.bees) == 1:
+                self.tunnel.occupy(self)
         insect.place = self
+        colony = self.colony
+        if colony is not None and colony.zobrist is not None:
+            colony.hash_insect(insect)
 
     def remove_insect(self, insect):
         """Remove an Insect from this Place.
@@ -67,7 +89,7 @@ class Place(object):
         remove_insect tries to remove an Ant that is not anywhere in this
         Place, an AssertionError is raised.
 
-        A Bee is just removed from the list of Bees.
+        A Bee is just removed from the BeeList of Bees.
         """
         if insect.is_ant:
             # Phase 4: Special Handling for BodyguardAnt and QueenAnt
@@ -82,6 +104,8 @@ class Place(object):
                         self.ant = None
                 else:
                     self.ant = None
+                if self.ant is None and self.colony is not None:
+                    self.colony.place_vacated(self)
             else:
                 if hasattr(self.ant, 'container') and self.ant.container and self.ant.ant is insect:
                     #if the ant in the container is an OG queen, do not remove it
@@ -96,15 +120,211 @@ class Place(object):
                     assert False, '{0} is not in {1}'.format(insect, self)
         else:
             self.bees.remove(insect)
-
+            if self.colony is not None:
+                self.colony.bee_left(insect)
+            if self.tunnel is not None and not self.bees:
+                self.tunnel.vacate(self)
+
+        colony = self.colony
+        if colony is not None and colony.zobrist is not None:
+            colony.unhash_insect(insect)
         insect.place = None
 
     def __str__(self):
         return self.name
 
 
+class BeeList(object):
+    """An insertion-ordered collection of Bees that supports appending,
+    removing, membership tests and random choice in (amortized) constant
+    time.  It can be iterated, indexed and sliced like a list.
+
+    Removed Bees leave a hole that is skipped when iterating; the holes are
+    compacted away once they outnumber the Bees.
+
+    >>> bees = BeeList()
+    >>> a, b, c = Bee(1), Bee(2), Bee(3)
+    >>> for bee in [a, b, c]:
+    ...     bees.append(bee)
+    >>> bees.remove(a)
+    >>> len(bees), a in bees, b in bees
+    (2, False, True)
+    >>> bees[:]
+    [Bee(2, None), Bee(3, None)]
+    >>> bees[0] is b
+    True
+    >>> bees.choice(random.Random(0)) in [b, c]
+    True
+    """
+    __slots__ = ('items', 'positions')
+
+    def __init__(self, bees=()):
+        self.items = []      # Bees in insertion order, or None for a hole
+        self.positions = {}  # The index of each Bee in items
+        for bee in bees:
+            self.append(bee)
+
+    def append(self, bee):
+        self.positions[bee] = len(self.items)
+        self.items.append(bee)
+
+    def remove(self, bee):
+        try:
+            i = self.positions.pop(bee)
+        except KeyError:
+            raise ValueError('{0} is not in the BeeList'.format(bee))
+        items = self.items
+        if i == len(items) - 1:
+            items.pop()
+            while items and items[-1] is None:
+                items.pop()
+        else:
+            items[i] = None
+            if 2 * len(self.positions) < len(items):
+                self.compact()
+
+    def copy(self):
+        """Return a BeeList with the same Bees and holes, so that it makes
+        the same random choices.
+        """
+        new = BeeList()
+        new.items = list(self.items)
+        new.positions = dict(self.positions)
+        return new
+
+    def compact(self):
+        """Remove the holes left by removed Bees."""
+        self.items = [bee for bee in self.items if bee is not None]
+        self.positions = {bee: i for i, bee in enumerate(self.items)}
+
+    def choice(self, rng=random):
+        """Return a random Bee, which must exist, chosen with RNG."""
+        items = self.items
+        if len(items) == len(self.positions):
+            return rng.choice(items)
+        while True:
+            bee = items[rng.randrange(len(items))]
+            if bee is not None:
+                return bee
+
+    def __getitem__(self, i):
+        if len(self.items) != len(self.positions):
+            self.compact()
+        return self.items[i]
+
+    def __iter__(self):
+        return (bee for bee in self.items if bee is not None)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, bee):
+        return bee in self.positions
+
+    def __repr__(self):
+        return 'BeeList({0})'.format(list(self))
+
+
+class Tunnel(object):
+    """A Tunnel is a chain of Places in which each Place is the entrance of
+    the one before it.  It keeps the depths of the Places that hold Bees in
+    sorted order, so that the first such Place in a range of depths can be
+    found by binary search instead of by walking the chain.  While a QueenAnt
+    watches the Tunnel, it also logs the Ants added to it.
+
+    >>> tunnel = Tunnel()
+    >>> places = [Place(str(depth)) for depth in range(6)]
+    >>> for place in places:
+    ...     tunnel.add(place)
+    >>> places[1].add_insect(Bee(3))
+    >>> places[4].add_insect(Bee(3))
+    >>> tunnel.first_occupied(2, 6).name, tunnel.first_occupied(0, 3).name
+    ('4', '1')
+    >>> print(tunnel.first_occupied(2, 4))
+    None
+    """
+    __slots__ = ('places', 'occupied', 'arrivals')
+
+    def __init__(self):
+        self.places = []      # Places by depth, starting from the exit end
+        self.occupied = []    # Sorted depths of Places that hold Bees
+        self.arrivals = None  # Ants added since a QueenAnt last looked
+
+    def add(self, place):
+        """Append PLACE to the entrance end of the Tunnel."""
+        place.tunnel = self
+        place.depth = len(self.places)
+        self.places.append(place)
+        if place.bees:
+            self.occupied.append(place.depth)
+
+    def detach(self):
+        """Stop indexing the Places of this Tunnel."""
+        for place in self.places:
+            place.tunnel = place.depth = None
+
+    def occupy(self, place):
+        """Record that PLACE now holds Bees."""
+        bisect.insort(self.occupied, place.depth)
+
+    def vacate(self, place):
+        """Record that PLACE no longer holds Bees."""
+        del self.occupied[bisect.bisect_left(self.occupied, place.depth)]
+
+    def first_occupied(self, low, high):
+        """Return the Place with the lowest depth in [LOW, HIGH) that holds
+        Bees, or None if there is no such Place.
+        """
+        occupied = self.occupied
+        i = bisect.bisect_left(occupied, low)
+        if i < len(occupied) and occupied[i] < high:
+            return self.places[occupied[i]]
+
+
+class AliasTable(object):
+    """Draws an index at random in proportion to a list of weights, in
+    constant time per draw, using Vose's alias method.
+
+    >>> table = AliasTable([1, 0, 3])
+    >>> rng = random.Random(0)
+    >>> counts = [0, 0, 0]
+    >>> for _ in range(4000):
+    ...     counts[table.sample(rng)] += 1
+    >>> counts[1], round(counts[2] / counts[0])
+    (0, 3)
+    """
+    __slots__ = ('prob', 'alias')
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = sum(weights)
+        assert n > 0 and total > 0, 'Weights must have a positive sum'
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1]
+        large = [i for i, p in enumerate(scaled) if p >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+
+    def sample(self, rng=random):
+        """Return a random index, drawn with RNG."""
+        i = int(rng.random() * len(self.prob))
+        return i if rng.random() < self.prob[i] else self.alias[i]
+
+
 class Insect(object):
-    """An Insect, the base class of Ant and Bee, has armor and a Place."""
+    """An Insect, the base class of Ant and Bee, has armor and a Place.
+
+    Insects and Places declare __slots__ to keep large games compact, so
+    every subclass must declare __slots__ as well, listing the new instance
+    attributes it assigns.
+    """
+    __slots__ = ('armor', 'place')
 
     is_ant = False
     damage = 0
@@ -124,9 +344,21 @@ class Insect(object):
         >>> test_insect.armor
         3
         """
+        place = self.place
+        colony = place.colony if place is not None else None
+        hashed = colony is not None and colony.zobrist is not None
+        if hashed:
+            colony.unhash_insect(self)
         self.armor -= amount
+        if hashed:
+            colony.hash_insect(self)
+        events = colony.events if colony is not None else None
+        if events is not None and events.insect_damaged:
+            events.publish(InsectDamaged(self, amount))
         if self.armor <= 0:
-            self.place.remove_insect(self)
+            place.remove_insect(self)
+            if events is not None and events.insect_died:
+                events.publish(InsectDied(self, place))
 
     def action(self, colony):
         """The action performed each turn.
@@ -141,10 +373,17 @@ class Insect(object):
 
 class Bee(Insect):
     """A Bee moves from place to place, following exits and stinging ants."""
+    __slots__ = ('watersafe', 'effects')
 
     name = 'Bee'
     damage = 1
-    watersafe=True
+    status_immune = False
+
+    def __init__(self, armor, place=None):
+        """Create a Bee with an armor amount and a starting Place."""
+        Insect.__init__(self, armor, place)
+        self.watersafe = True
+        self.effects = None  # Status effect records, added by apply_effect
 
     def sting(self, ant):
         """Attack an Ant, reducing the Ant's armor by 1."""
@@ -152,7 +391,11 @@ class Bee(Insect):
 
     def move_to(self, place):
         """Move from the Bee's current Place to a new Place."""
-        self.place.remove_insect(self)
+        origin = self.place
+        colony = origin.colony
+        if colony is not None and colony.events.bee_moved:
+            colony.events.publish(BeeMoved(self, origin, place))
+        origin.remove_insect(self)
         place.add_insect(self)
 
     def blocked(self):
@@ -168,10 +411,22 @@ class Bee(Insect):
 
     def action(self, colony):
         """A Bee's action stings the Ant that blocks its exit if it is blocked,
-        or moves to the exit of its current place otherwise.
+        or moves to the exit of its current place otherwise, unless one of
+        its status effects prevents it from acting this turn.
 
         colony -- The AntColony, used to access game state information.
         """
+        if self.effects:
+            hashed = colony.zobrist is not None and self.place.colony is colony
+            if hashed:
+                colony.unhash_insect(self)
+            allowed = pass_effects(self.effects, colony)
+            if hashed:
+                colony.hash_insect(self)
+            if colony.events.effects_counted:
+                colony.events.publish(EffectsCounted(self))
+            if not allowed:
+                return
         if self.blocked():
             self.sting(self.place.ant)
         elif self.armor > 0 and self.place.exit is not None:
@@ -179,27 +434,49 @@ class Bee(Insect):
 
 
 class Ant(Insect):
-    """An Ant occupies a place and does work for the colony."""
+    """An Ant occupies a place and does work for the colony.
+
+    Unlike Bees, Ants keep a __dict__, so that the QueenAnt can double the
+    damage of an individual Ant and Ants can be given custom attributes.
+    It is only allocated once such an attribute is assigned.
+    """
+    __slots__ = ('__dict__',)
 
     is_ant = True
     implemented = False  # Only implemented Ant classes should be instantiated
     food_cost = 0
+    food_per_turn = 0  # Food that the Ant's action produces each turn
     blocks_path=True
     container=False
+    buffed = False  # Set on an Ant once a QueenAnt has doubled its damage
 
     def __init__(self, armor=1):
         """Create an Ant with an armor quantity."""
         Insect.__init__(self, armor)
 
+    def idle(self, colony, turns):
+        """Take TURNS actions at once, while there are no bees in any of
+        the colony's places but the Hive.  Ants whose actions do more than
+        produce food_per_turn must override it.
+        """
+        colony.food += self.food_per_turn * turns
+
     def can_contain(self,other):
         return self.container and self.ant==None and not other.container
 
+    @classmethod
+    def for_colony(cls, colony):
+        """Return a new Ant of this type to be deployed in COLONY."""
+        return cls()
+
 class HarvesterAnt(Ant):
     """HarvesterAnt produces 1 additional food per turn for the colony."""
+    __slots__ = ()
 
     name = 'Harvester'
     implemented = True
     food_cost=2
+    food_per_turn = 1
 
     def action(self, colony):
         """Produce 1 additional food for the colony.
@@ -214,6 +491,7 @@ class HarvesterAnt(Ant):
 
 class ThrowerAnt(Ant):
     """ThrowerAnt throws a leaf each turn at the nearest Bee in its range."""
+    __slots__ = ()
 
     name = 'Thrower'
     implemented = True
@@ -221,21 +499,30 @@ class ThrowerAnt(Ant):
     food_cost=4
     min_range=0
     max_range=10
-    def nearest_bee(self, hive):
+    def nearest_bee(self, hive, rng=random):
         """Return the nearest Bee in a Place that is not the Hive, connected to
         the ThrowerAnt's Place by following entrances.
 
         This method returns None if there is no such Bee (or none in range).
+        Ties between Bees in the same Place are broken with RNG.
         """
+        # Places registered in a colony are indexed by their Tunnel
+        tunnel = self.place.tunnel
+        if tunnel is not None:
+            depth = self.place.depth
+            spot = tunnel.first_occupied(depth + self.min_range,
+                                         depth + self.max_range)
+            if spot is not None:
+                return random_or_none(spot.bees, rng)
+            return None
         # BEGIN Problem 3B
         #begining with place of ThrowerAnt, check if there is an any in spots in front of it within a range
         #if there is an ant for said condition, attack random bee(may be multiple in a place) or else None
         spot=self.place
         distance=0
         while spot != hive or spot.entrance!=None:
-            if random_or_none(spot.bees) != None: 
-                if distance in range(self.min_range,self.max_range):
-                    return random_or_none(spot.bees)
+            if spot.bees and distance in range(self.min_range,self.max_range):
+                return random_or_none(spot.bees, rng)
             distance+=1
             spot=spot.entrance
         # END Problem 3B
@@ -247,12 +534,20 @@ class ThrowerAnt(Ant):
 
     def action(self, colony):
         """Throw a leaf at the nearest Bee in range."""
-        self.throw_at(self.nearest_bee(colony.hive))
+        target = self.nearest_bee(colony.hive, colony.rng)
+        if target is not None and colony.events.leaf_thrown:
+            colony.events.publish(LeafThrown(self, target))
+        self.throw_at(target)
 
-def random_or_none(s):
-    """Return a random element of sequence s, or return None if s is empty."""
+def random_or_none(s, rng=random):
+    """Return a random element of sequence s, or return None if s is empty.
+
+    rng -- the source of randomness, a random.Random or the random module
+    """
     if s:
-        return random.choice(s)
+        if isinstance(s, BeeList):
+            return s.choice(rng)
+        return rng.choice(s)
 
 
 ##############
@@ -261,6 +556,7 @@ def random_or_none(s):
 
 class Water(Place):
     """Water is a place that can only hold 'watersafe' insects."""
+    __slots__ = ()
 
     def add_insect(self, insect):
         """Add insect if it is watersafe, otherwise reduce its armor to 0."""
@@ -274,6 +570,7 @@ class Water(Place):
 
 class FireAnt(Ant):
     """FireAnt cooks any Bee in its Place when it expires."""
+    __slots__ = ()
 
     name = 'Fire'
     damage = 3
@@ -296,6 +593,7 @@ class FireAnt(Ant):
 
 class LongThrower(ThrowerAnt):
     """A ThrowerAnt that only throws leaves at Bees at least 5 places away."""
+    __slots__ = ()
 
     name = 'Long'
     # BEGIN Problem 4B
@@ -308,6 +606,7 @@ class LongThrower(ThrowerAnt):
 
 class ShortThrower(ThrowerAnt):
     """A ThrowerAnt that only throws leaves at Bees at most 3 places away."""
+    __slots__ = ()
 
     name = 'Short'
     # BEGIN Problem 4B
@@ -322,9 +621,9 @@ class ShortThrower(ThrowerAnt):
 # The WallAnt class
 # This Ant has not actions and just has high armor
 class WallAnt(Ant):
+    __slots__ = ()
     name='Wall'
     food_cost=4
-    armor=4
     def __init__(self, armor=4):
         """Create an Ant with an armor quantity."""
         Ant.__init__(self, armor)
@@ -333,6 +632,7 @@ class WallAnt(Ant):
 
 class NinjaAnt(Ant):
     """NinjaAnt does not block the path and damages all bees in its place."""
+    __slots__ = ()
 
     name = 'Ninja'
     damage = 1
@@ -357,6 +657,7 @@ class NinjaAnt(Ant):
 #Sponge Bob Square (p)ANTS
 #class of a ThrowerAnt that is watersafe
 class ScubaThrower(ThrowerAnt):
+    __slots__ = ()
     name='Scuba'
     food_cost=5
     implemented=True
@@ -368,6 +669,7 @@ class HungryAnt(Ant):
     """HungryAnt will take three turns to digest a Bee in its place.
     While digesting, the HungryAnt can't eat another Bee.
     """
+    __slots__ = ('digesting',)
     name = 'Hungry'
     # BEGIN Problem 6B
     #set time to digest a bee
@@ -394,16 +696,20 @@ class HungryAnt(Ant):
     def action(self, colony):
         # BEGIN Problem 6B
         #if there is a bee to eat and done digesting, eat the bee
-        if self.digesting <= 0 and random_or_none(self.place.bees):
-                self.eat_bee(random_or_none(self.place.bees))
+        if self.digesting <= 0 and self.place.bees:
+                self.eat_bee(random_or_none(self.place.bees, colony.rng))
         else:
         #still digesting
             self.digesting-=1
         # END Problem 6B
 
+    def idle(self, colony, turns):
+        self.digesting -= turns
+
 
 class BodyguardAnt(Ant):
     """BodyguardAnt provides protection to other Ants."""
+    __slots__ = ('ant',)
     name = 'Bodyguard'
     # BEGIN Problem 7
     # a container that has no ant in it(when created)
@@ -429,8 +735,17 @@ class BodyguardAnt(Ant):
             self.ant.action(colony)
         # END Problem 7
 
+    @property
+    def food_per_turn(self):
+        return self.ant.food_per_turn if self.ant is not None else 0
+
+    def idle(self, colony, turns):
+        if self.ant is not None:
+            self.ant.idle(colony, turns)
+
 class TankAnt(BodyguardAnt):
     """TankAnt provides both offensive and defensive capabilities."""
+    __slots__ = ()
     name = 'Tank'
     damage = 1
     # BEGIN Problem 8
@@ -449,60 +764,96 @@ class TankAnt(BodyguardAnt):
 
 class QueenAnt(ScubaThrower):
     """The Queen of the colony.  The game is over if a bee enters her place."""
+    __slots__ = ('OG', 'watching')
 
     name = 'Queen'
     # BEGIN Problem 9
-    num_queens=0 #how many queens are there? should only be 1
+    num_queens=0 #how many queens built outside of a colony? should only be 1
     food_cost=6
-    dbld=[] #list of ants already doubled
     implemented = True   # Change to True to view in the GUI
     # END Problem 9
 
-    def __init__(self):
+    def __init__(self, colony=None):
+        """Create a QueenAnt.  The first queen built for COLONY is its true
+        queen; queens built without a colony are counted on the class.
+        """
         # BEGIN Problem 9
         ScubaThrower.__init__(self,1)
+        self.watching=None #the Tunnel whose arrivals this queen follows
         #if there is no other queen, it is OG. if there is another one, it is a poser
-        if self.num_queens==0:
+        if colony is not None:
+            self.OG=colony.true_queen is None
+            if self.OG:
+                colony.true_queen=self
+        elif self.num_queens==0:
             self.OG=True
             QueenAnt.num_queens=1
         else:
             self.OG=False
         # END Problem 9
 
+    @classmethod
+    def for_colony(cls, colony):
+        return cls(colony)
+
     def action(self, colony):
         """A queen ant throws a leaf, but also doubles the damage of ants
         in her tunnel.
 
         Impostor queens do only one thing: reduce their own armor to 0.
+
+        The first time, the queen walks her tunnel to find the ants behind
+        her.  After that she only looks at the ants logged by her Tunnel
+        as they were added, so a turn costs O(new ants).
         """
         # BEGIN Problem 9
         if self.OG:
             #carryout normcal action of thrower ant
             ScubaThrower.action(self,colony)
+            tunnel=self.place.tunnel
+            if tunnel is not None and tunnel is self.watching:
+                depth=self.place.depth
+                for ant in tunnel.arrivals:
+                    place=ant.place
+                    if place is not None and place.tunnel is tunnel and place.depth<depth:
+                        self.buff(ant)
+                tunnel.arrivals.clear()
+                return
+            if self.watching is not None:
+                self.watching.arrivals=None
+            self.watching=tunnel
+            if tunnel is not None:
+                tunnel.arrivals=[]
             #start from place of the queen and work backwards(forward from POV of bees) to find ants
             spot=self.place.exit
             while spot.exit!=None:
                 if spot.ant!=None:
-                    #if there is a container, double its damage and add to dbld
-                    #also check if there is an ant in container and double its damage and add to dbld
-                    if spot.ant.container:
-                        if spot.ant not in self.dbld:
-                            spot.ant.damage*=2
-                            self.dbld=self.dbld+[spot.ant]
-                        if spot.ant.ant not in self.dbld and spot.ant.ant:
-                            spot.ant.ant.damage*=2
-                            self.dbld=self.dbld+[spot.ant.ant]
-                    else:
-                    #if the ant is not already in dbld, double its damage and add it to the list
-                        if spot.ant not in self.dbld:
-                            spot.ant.damage*=2
-                            self.dbld=self.dbld+[spot.ant]
+                    self.buff(spot.ant)
                 spot=spot.exit
         else:
             #there can only be one OG queen
             self.reduce_armor(1)
         # END Problem 9
 
+    def idle(self, colony, turns):
+        """Buff the ants behind the queen, as her first action would, or
+        expire if she is an impostor.  Her leaves have no targets.
+        """
+        self.action(colony)
+
+    def buff(self, ant):
+        """Double the damage of ANT, and of the ant it contains, unless a
+        queen has already done so.  The buff is marked on the ant itself, so
+        that the queen holds no references to ants that have left.
+        """
+        #if there is a container, double its damage and mark it buffed
+        #also check if there is an ant in container and double its damage
+        if not ant.buffed:
+            ant.damage*=2
+            ant.buffed=True
+        if ant.container and ant.ant is not None:
+            self.buff(ant.ant)
+
     def reduce_armor(self, amount):
         """Reduce armor by amount, and if the True QueenAnt has no armor
         remaining, signal the end of the game.
@@ -517,6 +868,7 @@ class QueenAnt(ScubaThrower):
 
 class AntRemover(Ant):
     """Allows the player to remove ants from the board in the GUI."""
+    __slots__ = ()
 
     name = 'Remover'
     implemented = False
@@ -538,7 +890,7 @@ def make_slow(action):
     #only do the action on even times
     def delay(colony):
         if colony.time%2==0:
-            action(colony)
+            return action(colony)
     return delay
     # END Problem EC
 
@@ -554,26 +906,58 @@ def make_stun(action):
     return stuck
     # END Problem EC
 
+def proceed(colony):
+    """The action that an effect wraps when it is applied: it only reports
+    that the Bee may act.
+    """
+    return True
+
 def apply_effect(effect, bee, duration):
-    """Apply a status effect to a Bee that lasts for duration turns."""
+    """Apply a status effect to a Bee that lasts for duration turns.
+
+    The Bee keeps a stack of [gate, remaining] records, where gate is the
+    effect applied to proceed, so it returns True on turns the Bee may act.
+    The newest effect is consulted first; older effects are only consulted
+    (and only count down) on turns that the newer ones let through.
+    """
     # BEGIN Problem EC
     #for an effected bee, within a duration, its actions are effected
-    #change bees actions to this new set of actions
-    new=effect(bee.action)
-    old=bee.action
-    def handicapped(colony):
-        nonlocal duration
-        if duration>0:
-            new(colony)
-        else:
-            old(colony)
-        duration-=1
-    bee.action=handicapped
+    if bee.status_immune or duration <= 0:
+        return
+    colony = bee.place.colony if bee.place is not None else None
+    hashed = colony is not None and colony.zobrist is not None
+    if hashed:
+        colony.unhash_insect(bee)
+    if bee.effects is None:
+        bee.effects = []
+    bee.effects.append([effect(proceed), duration])
+    if hashed:
+        colony.hash_insect(bee)
+    if colony is not None and colony.events.effect_applied:
+        colony.events.publish(EffectApplied(bee, effect, duration))
     # END Problem EC
 
+def pass_effects(effects, colony):
+    """Count down the status EFFECTS of a Bee for one action and return
+    whether they let the Bee act.  Expired records are dropped, so the cost
+    of an action does not grow with the number of effects ever applied.
+    """
+    i = len(effects) - 1
+    while i >= 0:
+        record = effects[i]
+        allowed = record[0](colony)
+        record[1] -= 1
+        if record[1] <= 0:
+            del effects[i]
+        if not allowed:
+            return False
+        i -= 1
+    return True
+
 
 class SlowThrower(ThrowerAnt):
     """ThrowerAnt that causes Slow on Bees."""
+    __slots__ = ()
 
     name = 'Slow'
     # BEGIN Problem EC
@@ -588,6 +972,7 @@ class SlowThrower(ThrowerAnt):
 
 class StunThrower(ThrowerAnt):
     """ThrowerAnt that causes Stun on Bees."""
+    __slots__ = ()
 
     name = 'Stun'
     # BEGIN Problem EC
@@ -606,6 +991,7 @@ class StunThrower(ThrowerAnt):
 
 class Wasp(Bee):
     """Class of Bee that has higher damage."""
+    __slots__ = ()
     name = 'Wasp'
     damage = 2
 
@@ -613,22 +999,21 @@ class Hornet(Bee):
     """Class of bee that is capable of taking two actions per turn, although
     its overall damage output is lower. Immune to status effects.
     """
+    __slots__ = ()
     name = 'Hornet'
     damage = 0.25
+    status_immune = True
 
     def action(self, colony):
         for i in range(2):
             if self.armor > 0:
                 super().action(colony)
 
-    def __setattr__(self, name, value):
-        if name != 'action':
-            object.__setattr__(self, name, value)
-
 class NinjaBee(Bee):
     """A Bee that cannot be blocked. Is capable of moving past all defenses to
     assassinate the Queen.
     """
+    __slots__ = ()
     name = 'NinjaBee'
 
     def blocked(self):
@@ -639,6 +1024,7 @@ class Boss(Wasp, Hornet):
     status effect immunity of Hornets. Damage to the boss is capped up to 8
     damage by a single attack.
     """
+    __slots__ = ()
     name = 'Boss'
     damage_cap = 8
     action = Wasp.action
@@ -654,11 +1040,16 @@ class Hive(Place):
 
     assault_plan -- An AssaultPlan; when & where bees enter the colony.
     """
+    __slots__ = ('assault_plan',)
 
     def __init__(self, assault_plan):
         self.name = 'Hive'
         self.assault_plan = assault_plan
-        self.bees = []
+        self.colony = None
+        self.index = None
+        self.tunnel = None
+        self.depth = None
+        self.bees = BeeList()
         for bee in assault_plan.all_bees:
             self.add_insect(bee)
         # The following attributes are always None for a Hive
@@ -667,9 +1058,19 @@ class Hive(Place):
         self.exit = None
 
     def strategy(self, colony):
-        exits = [p for p in colony.places.values() if p.entrance is self]
-        for bee in self.assault_plan.get(colony.time, []):
-            bee.move_to(random.choice(exits))
+        exits = colony.bee_entrances
+        lanes = colony.bee_lanes
+        for bee in self.assault_plan.release(colony.time):
+            if lanes is None:
+                entrance = colony.rng.choice(exits)
+            else:
+                entrance = exits[lanes.sample(colony.rng)]
+            if bee.place is None:
+                if colony.events.bee_moved:
+                    colony.events.publish(BeeMoved(bee, self, entrance))
+                entrance.add_insect(bee)  # Created on release by the plan
+            else:
+                bee.move_to(entrance)
             colony.active_bees.append(bee)
 
 
@@ -680,11 +1081,25 @@ class AntColony(object):
     time -- elapsed time
     food -- the colony's available food total
     queen -- the place where the queen resides
+    true_queen -- the first QueenAnt deployed in this colony, if any
     places -- A list of all places in the colony (including a Hive)
     bee_entrances -- A list of places that bees can enter
+    bee_lanes -- An AliasTable over bee_entrances built from the assault
+                 plan's lane_weights, or None to choose entrances uniformly
+    tunnels -- A list of Tunnels that index the places between the queen
+               and each bee entrance
+    events -- the EventBus of this colony's events, to which the GUIs and
+              recorders that follow the game subscribe
+
+    The colony keeps registries of the places that hold an ant and of the
+    bees in its places, which Place.add_insect and Place.remove_insect keep
+    up to date, so that listing its ants and bees does not scan every place.
+    Once keep_hash is called, they also keep the sum of the Zobrist keys of
+    its insects up to date, from which state_hash is read.
     """
 
-    def __init__(self, strategy, hive, ant_types, create_places, dimensions, food=2):
+    def __init__(self, strategy, hive, ant_types, create_places, dimensions, food=2,
+                 headless=False, seed=None):
         """Create an AntColony for simulating a game.
 
         Arguments:
@@ -693,14 +1108,25 @@ class AntColony(object):
         ant_types -- a list of ant constructors
         create_places -- a function that creates the set of places
         dimensions -- a pair containing the dimensions of the game layout
+        headless -- if True, the colony never writes to the console
+        seed -- seeds the colony's own random number generator, rng, which
+                makes all random choices in the game (None for a fresh seed)
         """
         self.time = 0
         self.food = food
+        self.food_spent = 0
+        self.headless = headless
+        self.rng = random.Random(seed)
+        self.true_queen = None
         self.strategy = strategy
         self.hive = hive
         self.ant_types = OrderedDict((a.name, a) for a in ant_types)
         self.dimensions = dimensions
-        self.active_bees = []
+        self.create_places = create_places
+        self.active_bees = BeeList()
+        self.zobrist = None  # The sum of insect_key, once keep_hash is called
+        self.stats = None  # A PhaseStats that play records its phases in
+        self.events = EventBus()
         self.configure(hive, create_places)
 
     def configure(self, hive, create_places):
@@ -708,39 +1134,163 @@ class AntColony(object):
         self.queen = QueenPlace('AntQueen')
         self.places = OrderedDict()
         self.bee_entrances = []
+        self.place_list = []     # Registered places, by index
+        self.ant_indices = []    # Sorted indices of places holding an ant
+        self.bee_registry = {}   # Bees in registered places (used as a set)
+        self.tunnels = []
         def register_place(place, is_bee_entrance):
+            place.colony = self
+            place.index = len(self.place_list)
+            self.place_list.append(place)
             self.places[place.name] = place
+            if place.ant is not None:
+                self.place_occupied(place)
+            for bee in place.bees:
+                self.bee_entered(bee)
             if is_bee_entrance:
                 place.entrance = hive
                 self.bee_entrances.append(place)
+            # Places are registered from the queen outward, so a place
+            # extends the tunnel of its exit, or starts a new one
+            exit = place.exit
+            if exit is not None and exit.tunnel is not None and \
+                    exit.tunnel.places[-1] is exit:
+                exit.tunnel.add(place)
+            elif place is not self.hive:
+                self.tunnels.append(Tunnel())
+                self.tunnels[-1].add(place)
         register_place(self.hive, False)
         create_places(self.queen, register_place, self.dimensions[0], self.dimensions[1])
+        # Only index tunnels whose entrances lead straight to the hive
+        for tunnel in self.tunnels:
+            chain = tunnel.places[1:] + [hive]
+            if any(p.entrance is not e for p, e in zip(tunnel.places, chain)):
+                tunnel.detach()
+        self.tunnels = [t for t in self.tunnels if t.places[0].tunnel is t]
+        weights = hive.assault_plan.lane_weights
+        if weights is None:
+            self.bee_lanes = None
+        else:
+            assert len(weights) == len(self.bee_entrances), \
+                'Expected one lane weight per bee entrance'
+            self.bee_lanes = AliasTable(weights)
 
-    def simulate(self):
+    def simulate(self, max_turns=None):
         """Simulate an attack on the ant colony (i.e., play the game)."""
-        num_bees = len(self.bees)
+        result = self.play(max_turns)
+        if result.winner == 'ants':
+            print('All bees are vanquished. You win!')
+            return True
+        if result.winner is None:
+            print('The ants held out for {0} turns.'.format(result.turns))
+            return True
+        print('The ant queen has perished. Please try again.')
+        return False
+
+    def play(self, max_turns=None, mid_turn=False):
+        """Play the game to completion without any console output and return
+        a GameResult describing its outcome.
+
+        If MAX_TURNS is given, the game stops after that many turns with no
+        winner, which is the only way an endless assault plan can end well.
+        If MID_TURN is true, the bees and the strategy have already had
+        their turn, as in a clone made by the strategy, so play starts with
+        the actions of the ants.  Idle turns are skipped by fast_forward.
+        If the colony's stats are set, each phase of each turn is timed.
+        """
+        total_bees, bees_killed = self.num_bees, 0
+        stats = self.stats
         try:
-            while True:
-                self.hive.strategy(self)            # Bees invade
-                self.strategy(self)                 # Ants deploy
+            while max_turns is None or self.time < max_turns:
+                if mid_turn:
+                    mid_turn = False
+                else:
+                    if self.events.turn_started:
+                        self.events.publish(TurnStarted(self))
+                    if stats is not None:
+                        if stats.time('fast-forward', self.fast_forward,
+                                      max_turns):
+                            continue
+                        stats.time('hive', self.hive.strategy, self)
+                        stats.time('strategy', self.strategy, self)
+                    elif self.fast_forward(max_turns):
+                        continue
+                    else:
+                        self.hive.strategy(self)    # Bees invade
+                        self.strategy(self)         # Ants deploy
                 for ant in self.ants:               # Ants take actions
                     if ant.armor > 0:
-                        ant.action(self)
+                        if stats is None:
+                            ant.action(self)
+                        else:
+                            stats.act(ant, self)
                 for bee in self.active_bees[:]:     # Bees take actions
                     if bee.armor > 0:
-                        bee.action(self)
+                        if stats is None:
+                            bee.action(self)
+                        else:
+                            stats.act(bee, self)
                     if bee.armor <= 0:
-                        num_bees -= 1
+                        bees_killed += 1
                         self.active_bees.remove(bee)
-                if num_bees == 0:
+                if bees_killed == total_bees:
                     raise AntsWinException()
                 self.time += 1
+            return GameResult(None, self.time, self.food_spent, bees_killed)
         except AntsWinException:
-            print('All bees are vanquished. You win!')
-            return True
+            winner = 'ants'
         except BeesWinException:
-            print('The ant queen has perished. Please try again.')
-            return False
+            winner = 'bees'
+        # Bees that expired in the final turn may not have been counted yet
+        bees_killed += sum(1 for bee in self.active_bees if bee.armor <= 0)
+        return GameResult(winner, self.time + 1, self.food_spent, bees_killed)
+
+    def fast_forward(self, max_turns=None):
+        """Play the coming turns at once while nothing happens in them but
+        the ants gathering food, and return the number of turns played.
+
+        Turns are idle while no bees are in the colony's places but the
+        Hive, the assault plan releases none, and the strategy makes no
+        move.  Strategies opt in by having an idle_turns(colony, income)
+        attribute that returns how many turns from this one on they would
+        make no move, if the food grows by INCOME each turn, or None if
+        they never would.  Each ant then takes all its actions at once with
+        Ant.idle.
+
+        >>> plan = AssaultPlan().add_wave(Bee, 3, 10, 1)
+        >>> colony = AntColony(baseline_strategy, Hive(plan), ant_types(),
+        ...                    dry_layout, (1, 3), headless=True)
+        >>> colony.fast_forward(), colony.play(1), colony.food
+        (0, GameResult(winner=None, turns=1, food_spent=2, bees_killed=0), 1)
+        >>> colony.fast_forward(), colony.time, colony.food
+        (3, 4, 4)
+        >>> colony.play(5), colony.food
+        (GameResult(winner=None, turns=5, food_spent=6, bees_killed=0), 1)
+        >>> colony.fast_forward(), colony.time, colony.food
+        (3, 8, 4)
+        >>> colony.play(9), colony.fast_forward(), colony.time
+        (GameResult(winner=None, turns=9, food_spent=10, bees_killed=0), 1, 10)
+        """
+        idle_turns = getattr(self.strategy, 'idle_turns', None)
+        if idle_turns is None or len(self.bee_registry) != len(self.hive.bees) \
+                or not self.num_bees:
+            return 0
+        turns = self.hive.assault_plan.next_wave(self.time)
+        turns = float('inf') if turns is None else turns - self.time
+        if max_turns is not None:
+            turns = min(turns, max_turns - self.time)
+        if turns <= 0:
+            return 0
+        ants = self.ants
+        strategy_turns = idle_turns(self, sum(ant.food_per_turn for ant in ants))
+        if strategy_turns is not None:
+            turns = min(turns, strategy_turns)
+        if turns <= 0 or turns == float('inf'):
+            return 0
+        for ant in ants:
+            ant.idle(self, turns)
+        self.time += turns
+        return turns
 
     def deploy_ant(self, place_name, ant_type_name):
         """Place an ant if enough food is available.
@@ -749,26 +1299,223 @@ class AntColony(object):
         """
         constructor = self.ant_types[ant_type_name]
         if self.food < constructor.food_cost:
-            print('Not enough food remains to place ' + ant_type_name)
+            if not self.headless:
+                print('Not enough food remains to place ' + ant_type_name)
         else:
-            ant = constructor()
-            self.places[place_name].add_insect(ant)
+            ant = constructor.for_colony(self)
+            place = self.places[place_name]
+            try:
+                place.add_insect(ant)
+            except AssertionError:
+                if self.true_queen is ant:  # A failed deploy crowns no one
+                    self.true_queen = None
+                raise
+            if self.events.ant_deployed:
+                self.events.publish(AntDeployed(ant, place))
             self.food -= constructor.food_cost
+            self.food_spent += constructor.food_cost
             return ant
 
     def remove_ant(self, place_name):
         """Remove an Ant from the Colony."""
         place = self.places[place_name]
-        if place.ant is not None:
-            place.remove_insect(place.ant)
+        ant = place.ant
+        if ant is not None:
+            place.remove_insect(ant)
+            if ant.place is None and self.events.ant_removed:
+                self.events.publish(AntRemoved(ant, place))
+
+    def snapshot(self):
+        """Return a ColonySnapshot of the game state, which restore can
+        return the colony to any number of times.
+
+        >>> colony = AntColony(baseline_strategy, Hive(make_hard_assault_plan()),
+        ...                    ant_types(), dry_layout, (4, 9), headless=True,
+        ...                    seed=1)
+        >>> colony.play(10)
+        GameResult(winner=None, turns=10, food_spent=28, bees_killed=2)
+        >>> saved = colony.snapshot()
+        >>> colony.play()
+        GameResult(winner='bees', turns=13, food_spent=40, bees_killed=0)
+        >>> colony.restore(saved)
+        >>> colony.time, colony.food_spent, len(colony.ants)
+        (10, 28, 8)
+        >>> colony.play()
+        GameResult(winner='bees', turns=13, food_spent=40, bees_killed=0)
+        """
+        contents, insects = [], []
+        for place in self.place_list:
+            ant, bees = place.ant, place.bees
+            if ant is None and not bees:
+                continue
+            contents.append((place, ant, bees.copy()))
+            if ant is not None:
+                insects.append((ant, insect_state(ant)))
+                if ant.container and ant.ant is not None:
+                    insects.append((ant.ant, insect_state(ant.ant)))
+            insects.extend((bee, insect_state(bee)) for bee in bees)
+        return ColonySnapshot(
+            self.time, self.food, self.food_spent, self.true_queen,
+            self.rng.getstate(), tuple(contents), tuple(insects),
+            tuple((t, tuple(t.occupied), copy_state(t.arrivals))
+                  for t in self.tunnels),
+            tuple(self.ant_indices), tuple(self.bee_registry),
+            self.active_bees.copy(), self.hive.assault_plan.snapshot(),
+            self.zobrist)
+
+    def restore(self, snapshot):
+        """Return the colony to the state recorded in SNAPSHOT, which must
+        have been taken from this colony.  Insects created since then are
+        discarded.
+        """
+        self.time, self.food, self.food_spent, self.true_queen = snapshot[:4]
+        self.rng.setstate(snapshot.rng_state)
+        place_list = self.place_list
+        for i in self.ant_indices:
+            place_list[i].ant = None
+        for bee in self.bee_registry:
+            if bee.place is not None:
+                bee.place.bees = BeeList()
+        for place, ant, bees in snapshot.contents:
+            place.ant = ant
+            place.bees = bees.copy()
+        for insect, state in snapshot.insects:
+            set_insect_state(insect, state)
+        for tunnel, occupied, arrivals in snapshot.tunnels:
+            tunnel.occupied = list(occupied)
+            tunnel.arrivals = copy_state(arrivals)
+        self.ant_indices = list(snapshot.ant_indices)
+        self.bee_registry = dict.fromkeys(snapshot.bee_registry)
+        self.active_bees = snapshot.active_bees.copy()
+        self.hive.assault_plan.restore(snapshot.plan)
+        self.zobrist = snapshot.zobrist
+
+    def clone(self):
+        """Return an independent copy of the colony, with its own places,
+        insects, tunnels, random number generator and assault plan.  The
+        strategy, ant types and other functions and classes are shared.
+        The copy starts with an EventBus of its own with no subscribers, so
+        games played on it are not seen by those following the colony.
+
+        >>> colony = AntColony(baseline_strategy, Hive(make_normal_assault_plan()),
+        ...                    ant_types(), wet_layout, (3, 9), headless=True,
+        ...                    seed=2)
+        >>> _ = colony.play(12)
+        >>> copy = colony.clone()
+        >>> copy.places['tunnel_0_0'].colony is copy
+        True
+        >>> copy.play() == colony.play()
+        True
+        """
+        new = object.__new__(type(self))
+        memo = {id(self): new}
+        new.__dict__.update((name, clone_state(value, memo))
+                            for name, value in self.__dict__.items()
+                            if name != 'events')
+        new.events = EventBus()
+        return new
+
+    def place_occupied(self, place):
+        """Record that an Ant has been added to an empty PLACE."""
+        bisect.insort(self.ant_indices, place.index)
+
+    def place_vacated(self, place):
+        """Record that the last Ant has been removed from PLACE."""
+        del self.ant_indices[bisect.bisect_left(self.ant_indices, place.index)]
+
+    def bee_entered(self, bee):
+        """Record that BEE has been added to one of the colony's places."""
+        self.bee_registry[bee] = None
+
+    def bee_left(self, bee):
+        """Record that BEE has been removed from one of the colony's places."""
+        del self.bee_registry[bee]
+
+    def keep_hash(self):
+        """Keep the sum of the Zobrist keys of the colony's insects up to
+        date from now on, so that reading state_hash takes constant time
+        rather than a pass over the colony.  Copies made by clone and
+        snapshot keep it too.
+
+        >>> colony = AntColony(baseline_strategy, Hive(make_normal_assault_plan()),
+        ...                    ant_types(), wet_layout, (3, 9), headless=True,
+        ...                    seed=2)
+        >>> _ = colony.play(6)
+        >>> colony.keep_hash()
+        >>> _ = colony.play(12)
+        >>> colony.zobrist is not None and colony.state_hash == zobrist_hash(colony)
+        True
+        """
+        if self.zobrist is None:
+            self.zobrist = insects_hash(self)
+
+    def hash_insect(self, insect):
+        """Add the key of INSECT, in one of the colony's places, to its hash."""
+        self.zobrist += insect_key(insect)
+
+    def unhash_insect(self, insect):
+        """Remove the key of INSECT, in one of the colony's places, from its
+        hash.  It must be called before the insect leaves its place or
+        changes its armor or status effects, with hash_insect called after.
+        """
+        self.zobrist -= insect_key(insect)
+
+    @property
+    def state_hash(self):
+        """A 64-bit Zobrist hash of the type and armor of the ant in each
+        place, the armor and status effects of the bees in each place, the
+        food, and the time.  Colonies with the same layout and the same hash
+        are almost surely in the same position, although the hash does not
+        cover the assault plan, the random number generator, or the state
+        of individual ants such as a HungryAnt's digestion.  It is computed
+        from scratch unless keep_hash has been called.
+
+        >>> colony = AntColony(baseline_strategy, Hive(make_normal_assault_plan()),
+        ...                    ant_types(), wet_layout, (3, 9), headless=True,
+        ...                    seed=2)
+        >>> _ = colony.play(12)
+        >>> colony.state_hash == zobrist_hash(colony)
+        True
+        >>> copy = colony.clone()
+        >>> copy.remove_ant('tunnel_0_0')
+        >>> copy.state_hash == colony.state_hash
+        False
+        >>> copy.state_hash == zobrist_hash(copy)
+        True
+        >>> copy.food += HarvesterAnt.food_cost
+        >>> copy.deploy_ant('tunnel_0_0', 'Harvester')
+        HarvesterAnt(1, tunnel_0_0)
+        >>> copy.state_hash == colony.state_hash
+        True
+        >>> copy.keep_hash()
+        >>> copy.remove_ant('tunnel_1_0')
+        >>> copy.state_hash == zobrist_hash(copy)
+        True
+        """
+        if self.zobrist is None:
+            return zobrist_hash(self)
+        return (self.zobrist + zobrist_key(('time', self.time)) +
+                zobrist_key(('food', self.food))) & ZOBRIST_MASK
 
     @property
     def ants(self):
-        return [p.ant for p in self.places.values() if p.ant is not None]
+        """The ant in each place that holds one, in place order."""
+        place_list = self.place_list
+        return [place_list[i].ant for i in self.ant_indices]
 
     @property
     def bees(self):
-        return [b for p in self.places.values() for b in p.bees]
+        """All bees in the colony's places, including the Hive, in the order
+        they entered their current places.
+        """
+        return list(self.bee_registry)
+
+    @property
+    def num_bees(self):
+        """The number of bees in the colony's places, including the Hive,
+        plus those that the assault plan has yet to create.
+        """
+        return len(self.bee_registry) + self.hive.assault_plan.pending_bees
 
     @property
     def insects(self):
@@ -778,8 +1525,424 @@ class AntColony(object):
         status = ' (Food: {0}, Time: {1})'.format(self.food, self.time)
         return str([str(i) for i in self.ants + self.bees]) + status
 
+class GameResult(namedtuple('GameResult',
+                            ['winner', 'turns', 'food_spent', 'bees_killed'])):
+    """The outcome of a game played by AntColony.play.
+
+    winner -- 'ants' or 'bees', or None if the turn limit was reached
+    turns -- the number of turns played, including the last one
+    food_spent -- the total food cost of all deployed ants
+    bees_killed -- the number of bees that ran out of armor
+    """
+    __slots__ = ()
+
+class PhaseStats(object):
+    """The wall time and number of calls of each phase of the turns played
+    by an AntColony whose stats are set to it: fast-forward, hive release,
+    strategy, and the actions of each type of ant and bee.
+
+    >>> colony = AntColony(baseline_strategy, Hive(make_test_assault_plan()),
+    ...                    ant_types(), dry_layout, (1, 9), headless=True, seed=0)
+    >>> colony.stats = PhaseStats()
+    >>> colony.play()
+    GameResult(winner='ants', turns=9, food_spent=10, bees_killed=2)
+    >>> for phase, (calls, seconds) in colony.stats.phases.items():
+    ...     print(phase, calls)
+    fast-forward 9
+    hive 8
+    strategy 8
+    ants HarvesterAnt 8
+    bees Bee 9
+    ants ThrowerAnt 6
+    """
+
+    def __init__(self):
+        self.phases = {}  # Maps each phase to [calls, seconds]
+
+    def add(self, phase, seconds):
+        """Record one call of PHASE that took SECONDS."""
+        record = self.phases.get(phase)
+        if record is None:
+            record = self.phases[phase] = [0, 0.0]
+        record[0] += 1
+        record[1] += seconds
+
+    def time(self, phase, function, *args):
+        """Call FUNCTION on ARGS as PHASE and return its result."""
+        start = perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.add(phase, perf_counter() - start)
+
+    def act(self, insect, colony):
+        """Take the action of INSECT, as a phase named for its type."""
+        kind = 'ants ' if insect.is_ant else 'bees '
+        self.time(kind + type(insect).__name__, insect.action, colony)
+
+    def __str__(self):
+        total = sum(seconds for _, seconds in self.phases.values()) or 1
+        lines = ['{0:<24} {1:>8} {2:>10} {3:>9} {4:>6}'.format(
+            'phase', 'calls', 'total ms', 'us/call', 'share')]
+        for phase, (calls, seconds) in sorted(self.phases.items(),
+                                              key=lambda item: -item[1][1]):
+            lines.append('{0:<24} {1:>8} {2:>10.2f} {3:>9.2f} {4:>5.1f}%'.format(
+                phase, calls, seconds * 1e3, seconds / calls * 1e6,
+                100 * seconds / total))
+        return '\n'.join(lines)
+
+class ColonySnapshot(namedtuple('ColonySnapshot',
+                                ['time', 'food', 'food_spent', 'true_queen',
+                                 'rng_state', 'contents', 'insects', 'tunnels',
+                                 'ant_indices', 'bee_registry', 'active_bees',
+                                 'plan', 'zobrist'])):
+    """The game state of an AntColony, recorded by AntColony.snapshot.
+
+    contents -- a (place, ant, bees) triple for each place that holds insects
+    insects -- an (insect, state) pair for each of those insects
+    tunnels -- a (tunnel, occupied, arrivals) triple for each Tunnel
+    plan -- the state of the assault plan
+    zobrist -- the sum of the Zobrist keys of the insects, or None
+    """
+    __slots__ = ()
+
+
+#############
+# Snapshots #
+#############
+
+_state_slots = {}
+
+def state_slots(cls):
+    """Return the names of the slots of CLS and its bases."""
+    names = _state_slots.get(cls)
+    if names is None:
+        names = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if name != '__dict__' and name not in names:
+                    names.append(name)
+        names = _state_slots[cls] = tuple(names)
+    return names
+
+def copy_state(value):
+    """Copy the lists and sets in VALUE, such as the status effect records of
+    a Bee, leaving the insects, places and functions they hold shared.
+    """
+    if type(value) is list:
+        return [copy_state(item) for item in value]
+    if type(value) is set:
+        return set(value)
+    return value
+
+def insect_state(insect):
+    """Return the slot values and attributes of INSECT."""
+    values = tuple(copy_state(getattr(insect, name))
+                   for name in state_slots(type(insect)))
+    attributes = getattr(insect, '__dict__', None)
+    return values, attributes and dict(attributes)
+
+def set_insect_state(insect, state):
+    """Return INSECT to a STATE returned by insect_state."""
+    values, attributes = state
+    for name, value in zip(state_slots(type(insect)), values):
+        setattr(insect, name, copy_state(value))
+    if attributes is not None:
+        insect.__dict__.clear()
+        insect.__dict__.update(attributes)
+    elif getattr(insect, '__dict__', None):
+        insect.__dict__.clear()
+
+_tee_type = type(itertools.tee(())[0])
+_shared_types = frozenset([int, float, str, bool, type(None), type,
+                           type(len), type(proceed)])
+
+def clone_state(value, memo):
+    """Return a copy of VALUE for AntColony.clone.  Places, insects, tunnels
+    and BeeLists are copied slot by slot, along with the containers that hold
+    them.  The objects already copied are found in MEMO by id, so that the
+    copy links to them in the same way.  Functions, classes and other values
+    are shared.
+    """
+    if type(value) in _shared_types:
+        return value
+    new = memo.get(id(value), memo)
+    if new is not memo:
+        return new
+    copier = _copiers.get(type(value))
+    if copier is None:
+        copier = _copiers[type(value)] = make_copier(type(value))
+    return copier(value, memo)
+
+def make_copier(cls):
+    """Return a function that copies instances of CLS for clone_state."""
+    if cls is list:
+        def copy(value, memo):
+            new = memo[id(value)] = []
+            new.extend([item if type(item) in _shared_types
+                         else clone_state(item, memo) for item in value])
+            return new
+    elif cls is tuple:
+        def copy(value, memo):
+            new = memo[id(value)] = tuple(clone_state(item, memo)
+                                          for item in value)
+            return new
+    elif cls is set:
+        def copy(value, memo):
+            new = memo[id(value)] = {clone_state(item, memo) for item in value}
+            return new
+    elif issubclass(cls, Hive):
+        copy_place = copy_slots(cls)
+        def copy(value, memo):
+            # Bees wait in the hive untouched until they are released, so
+            # their slots are copied as they are rather than walked
+            waiting = []
+            for bee in value.bees:
+                if id(bee) not in memo and bee.effects is None and \
+                        not getattr(bee, '__dict__', None):
+                    new = memo[id(bee)] = object.__new__(type(bee))
+                    for name in state_slots(type(bee)):
+                        setattr(new, name, getattr(bee, name))
+                    waiting.append(new)
+            new = copy_place(value, memo)
+            for bee in waiting:
+                bee.place = new
+            return new
+    elif cls is BeeList:
+        def copy(value, memo):
+            new = memo[id(value)] = object.__new__(cls)
+            if not value.items:  # Most places hold no bees
+                new.items, new.positions = [], {}
+                return new
+            new.items = items = [None if bee is None else clone_state(bee, memo)
+                                 for bee in value.items]
+            new.positions = {bee: i for i, bee in enumerate(items)
+                             if bee is not None}
+            return new
+    elif issubclass(cls, (Place, Insect, Tunnel)):
+        copy = copy_slots(cls)
+    elif issubclass(cls, dict):
+        def copy(value, memo):
+            new = memo[id(value)] = cls.__new__(cls)
+            for k, v in value.items():
+                if type(k) not in _shared_types:
+                    k = clone_state(k, memo)
+                if type(v) not in _shared_types:
+                    v = clone_state(v, memo)
+                new[k] = v
+            if getattr(value, '__dict__', None):
+                new.__dict__.update(clone_state(value.__dict__, memo))
+            return new
+    elif issubclass(cls, random.Random):
+        def copy(value, memo):
+            new = memo[id(value)] = cls.__new__(cls)
+            new.setstate(value.getstate())
+            return new
+    elif cls is _tee_type:
+        def copy(value, memo):
+            new = memo[id(value)] = value.__copy__()
+            return new
+    else:
+        def copy(value, memo):
+            return value
+    return copy
+
+def copy_slots(cls):
+    """Return a function that copies instances of CLS, a class with
+    __slots__, slot by slot for clone_state.
+    """
+    names = state_slots(cls)
+    get = operator.attrgetter(*names) if len(names) > 1 else \
+        lambda value: (getattr(value, names[0]),)
+    def copy(value, memo):
+        new = memo[id(value)] = object.__new__(cls)
+        try:
+            values = get(value)
+        except AttributeError:  # Some slots are unset
+            values = [getattr(value, name, memo) for name in names]
+        for name, item in zip(names, values):
+            if type(item) not in _shared_types:
+                copied = memo.get(id(item), memo)
+                item = clone_state(item, memo) if copied is memo else copied
+                if item is memo:
+                    continue
+            setattr(new, name, item)
+        if getattr(value, '__dict__', None):
+            new.__dict__.update(clone_state(value.__dict__, memo))
+        return new
+    return copy
+
+_copiers = {}
+
+
+##########
+# Events #
+##########
+
+class InsectDamaged(namedtuple('InsectDamaged', ['insect', 'amount'])):
+    """An insect's armor was reduced by AMOUNT."""
+    __slots__ = ()
+    topic = 'insect_damaged'
+
+class InsectDied(namedtuple('InsectDied', ['insect', 'place'])):
+    """An insect ran out of armor and was removed from PLACE."""
+    __slots__ = ()
+    topic = 'insect_died'
+
+class AntDeployed(namedtuple('AntDeployed', ['ant', 'place'])):
+    """The strategy deployed ANT to PLACE.  The event comes after the ant
+    is added, so a deploy that fails publishes nothing; the events of its
+    arrival, such as drowning in Water, come before it.
+    """
+    __slots__ = ()
+    topic = 'ant_deployed'
+
+class AntRemoved(namedtuple('AntRemoved', ['ant', 'place'])):
+    """The strategy removed ANT from PLACE."""
+    __slots__ = ()
+    topic = 'ant_removed'
+
+class BeeMoved(namedtuple('BeeMoved', ['bee', 'origin', 'destination'])):
+    """A bee is moving from ORIGIN to DESTINATION, or being released from
+    the Hive, which is then its ORIGIN.  The event comes before the move,
+    so that a move into the queen's place, which ends the game, is seen.
+    """
+    __slots__ = ()
+    topic = 'bee_moved'
+
+class LeafThrown(namedtuple('LeafThrown', ['ant', 'target'])):
+    """A ThrowerAnt threw a leaf at the bee TARGET."""
+    __slots__ = ()
+    topic = 'leaf_thrown'
+
+class EffectApplied(namedtuple('EffectApplied', ['bee', 'effect', 'duration'])):
+    """A status EFFECT, such as make_slow, was applied to BEE for DURATION
+    turns.
+    """
+    __slots__ = ()
+    topic = 'effect_applied'
+
+class EffectsCounted(namedtuple('EffectsCounted', ['bee'])):
+    """The status effects of BEE counted down for one of its actions."""
+    __slots__ = ()
+    topic = 'effects_counted'
+
+class TurnStarted(namedtuple('TurnStarted', ['colony'])):
+    """COLONY started a turn, before the bees invade.  Turns skipped by
+    AntColony.fast_forward do not start.
+    """
+    __slots__ = ()
+    topic = 'turn_started'
+
+EVENT_TYPES = (InsectDamaged, InsectDied, AntDeployed, AntRemoved, BeeMoved,
+               LeafThrown, EffectApplied, EffectsCounted, TurnStarted)
+
+class EventBus(object):
+    """Delivers the events of a game to the handlers subscribed to their
+    types, in the order they subscribed.  Each AntColony has its own, so
+    handlers only see the game they subscribed to.
+
+    The handlers of each type are kept in a tuple named by the type's
+    topic, which is empty while no one is subscribed.  The game checks it
+    before creating an event, so events cost nothing but that check when
+    no one listens.
+
+    >>> bus = EventBus()
+    >>> bus.insect_died
+    ()
+    >>> handler = bus.subscribe(InsectDied, print)
+    >>> bus.publish(InsectDied('bee', 'tunnel_0_0'))
+    InsectDied(insect='bee', place='tunnel_0_0')
+    >>> bus.unsubscribe(InsectDied, print)
+    >>> bus.insect_died
+    ()
+    """
+
+    def __init__(self):
+        for event_type in EVENT_TYPES:
+            setattr(self, event_type.topic, ())
+
+    def subscribe(self, event_type, handler):
+        """Call HANDLER with each event of EVENT_TYPE, and return it."""
+        topic = event_type.topic
+        setattr(self, topic, getattr(self, topic) + (handler,))
+        return handler
+
+    def unsubscribe(self, event_type, handler):
+        """Stop calling HANDLER with events of EVENT_TYPE."""
+        handlers = list(getattr(self, event_type.topic))
+        handlers.remove(handler)
+        setattr(self, event_type.topic, tuple(handlers))
+
+    def publish(self, event):
+        """Call the handlers subscribed to the type of EVENT with it."""
+        for handler in getattr(self, event.topic):
+            handler(event)
+
+
+###########
+# Hashing #
+###########
+
+ZOBRIST_MASK = 2 ** 64 - 1
+ZOBRIST_CACHE = 1 << 16  # The most keys to keep before starting afresh
+
+_zobrist_keys = {}
+
+def zobrist_key(feature):
+    """Return the 64-bit key of FEATURE, a tuple of numbers, strings, classes
+    and tuples of them.
+
+    Keys are digests of the repr of FEATURE, with classes replaced by their
+    names and numbers by floats, rather than draws from a random number
+    generator, so they are the same in every process.
+    """
+    key = _zobrist_keys.get(feature)
+    if key is None:
+        if len(_zobrist_keys) >= ZOBRIST_CACHE:
+            _zobrist_keys.clear()
+        text = repr(tuple(x.__name__ if isinstance(x, type) else
+                          float(x) if type(x) is int else x for x in feature))
+        digest = hashlib.blake2b(text.encode(), digest_size=8).digest()
+        key = _zobrist_keys[feature] = int.from_bytes(digest, 'little')
+    return key
+
+def insect_key(insect):
+    """Return the Zobrist key of INSECT in its place: its type and armor,
+    and for a bee, its status effects.
+
+    Keys are added together rather than combined with exclusive or, so that
+    two identical bees in one place do not cancel out.
+    """
+    effects = None
+    if not insect.is_ant and insect.effects:
+        effects = tuple((gate.__qualname__, remaining)
+                        for gate, remaining in insect.effects)
+    feature = (insect.place.index, type(insect), insect.armor, effects)
+    key = _zobrist_keys.get(feature)
+    return zobrist_key(feature) if key is None else key
+
+def zobrist_hash(colony):
+    """Compute the state_hash of COLONY from scratch."""
+    return (insects_hash(colony) + zobrist_key(('time', colony.time)) +
+            zobrist_key(('food', colony.food))) & ZOBRIST_MASK
+
+def insects_hash(colony):
+    """Return the sum of the Zobrist keys of the insects of COLONY."""
+    total = 0
+    for place in colony.place_list:
+        ant = place.ant
+        if ant is not None:
+            total += insect_key(ant)
+            if ant.container and ant.ant is not None:
+                total += insect_key(ant.ant)
+        for bee in place.bees:
+            total += insect_key(bee)
+    return total
+
 class QueenPlace(Place):
     """QueenPlace at the end of the tunnel, where the queen resides."""
+    __slots__ = ()
 
     def add_insect(self, insect):
         """Add an Insect to this Place.
@@ -831,18 +1994,79 @@ def interactive_strategy(colony):
     msg = '<Control>-D (<Control>-Z <Enter> on Windows) completes a turn.\n'
     interact(msg)
 
-def start_with_strategy(args, strategy):
-    """Reads command-line arguments and starts a game with those options."""
+def baseline_strategy(colony):
+    """A non-interactive strategy that fills the dry places of each tunnel
+    from the back, with a HarvesterAnt in the last place and ThrowerAnts in
+    front of it, whenever there is enough food.  Places holding bees are
+    skipped, so that every game ends.
+    """
+    if colony.food < HarvesterAnt.food_cost:
+        return
+    for place, ant_type in baseline_places(colony):
+        if colony.food < ant_type.food_cost:
+            return
+        colony.deploy_ant(place.name, ant_type.name)
+
+def baseline_places(colony):
+    """Yield the places that baseline_strategy fills, in order, with the
+    type of ant that it deploys to each.
+    """
+    tunnels = []
+    for entrance in colony.bee_entrances:
+        tunnel, place = [], entrance
+        while place.exit is not None:
+            tunnel.append(place)
+            place = place.exit
+        tunnels.append(tunnel[::-1])
+    for step in range(max(len(t) for t in tunnels)):
+        for tunnel in tunnels:
+            if step >= len(tunnel):
+                continue
+            place = tunnel[step]
+            if place.ant is not None or place.bees or isinstance(place, Water):
+                continue
+            yield place, HarvesterAnt if step == 0 else ThrowerAnt
+
+def baseline_idle_turns(colony, income):
+    """Return the number of turns that baseline_strategy makes no move, if
+    the food grows by INCOME each turn, or None if it never does.
+    """
+    for place, ant_type in baseline_places(colony):
+        cost = max(ant_type.food_cost, HarvesterAnt.food_cost)
+        if colony.food >= cost:
+            return 0
+        if income <= 0:
+            return None
+        return -((colony.food - cost) // income)
+    return None
+
+baseline_strategy.idle_turns = baseline_idle_turns
+
+def parse_game_args(args):
+    """Parse the command-line arguments that configure a game."""
     import argparse
     parser = argparse.ArgumentParser(description="Play Ants vs. SomeBees")
     parser.add_argument('-d', type=str, metavar='DIFFICULTY',
-                        help='sets difficulty of game (easy/medium/hard/insane)')
+                        help='sets difficulty of game (easy/medium/hard/insane/endless)')
     parser.add_argument('-w', '--water', action='store_true',
                         help='loads a full layout with water')
     parser.add_argument('--food', type=int,
                         help='number of food to start with when testing', default=2)
-    args = parser.parse_args()
-
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for the random choices made during the game')
+    parser.add_argument('--headless', action='store_true',
+                        help='play without console I/O using the baseline '
+                             'strategy and print the result')
+    parser.add_argument('--max-turns', type=int, default=None,
+                        help='stop the game after this many turns')
+    parser.add_argument('--profile', action='store_true',
+                        help='print the time spent in each phase of the turns')
+    return parser.parse_args(args)
+
+def game_config(args):
+    """Return the (assault_plan, layout, dimensions, food) of a game
+    configured by parsed command-line ARGS.
+    """
     assault_plan = make_test_assault_plan()
     layout = dry_layout
     tunnel_length = 9
@@ -867,10 +2091,31 @@ def start_with_strategy(args, strategy):
         assault_plan = make_insane_assault_plan()
         num_tunnels = 4
         food = 2
+    elif args.d in ['endless']:
+        assault_plan = make_endless_assault_plan()
+        num_tunnels = 4
+        food = 2
+
+    return assault_plan, layout, (num_tunnels, tunnel_length), food
 
-    hive = Hive(assault_plan)
-    dimensions = (num_tunnels, tunnel_length)
-    return AntColony(strategy, hive, ant_types(), layout, dimensions, food).simulate()
+def make_colony(args, strategy, headless=False):
+    """Create an AntColony configured by parsed command-line ARGS."""
+    assault_plan, layout, dimensions, food = game_config(args)
+    colony = AntColony(strategy, Hive(assault_plan), ant_types(), layout,
+                       dimensions, food, headless, args.seed)
+    if getattr(args, 'profile', False):
+        colony.stats = PhaseStats()
+    return colony
+
+def start_with_strategy(args, strategy):
+    """Reads command-line arguments and starts a game with those options."""
+    args = parse_game_args(args)
+    colony = make_colony(args, strategy)
+    try:
+        return colony.simulate(args.max_turns)
+    finally:
+        if colony.stats is not None:
+            print(colony.stats)
 
 
 ###########
@@ -902,9 +2147,14 @@ class AssaultPlan(dict):
 
     An AssaultPlan is a dictionary from times (int) to waves (list of Bees).
 
+    Bees enter the colony through a uniformly random bee entrance, unless
+    lane_weights is set to a list with one weight per bee entrance.
+
     >>> AssaultPlan().add_wave(4, 2)
     {4: [Bee(3, None), Bee(3, None)]}
     """
+    lane_weights = None
+    pending_bees = 0  # Bees that will only be created when released
 
     def add_wave(self, bee_type, bee_armor, time, count):
         """Add a wave at time with count Bees that have the specified armor."""
@@ -917,11 +2167,150 @@ class AssaultPlan(dict):
         """Place all Bees in the hive and return the list of Bees."""
         return [bee for wave in self.values() for bee in wave]
 
-def make_test_assault_plan():
-    return AssaultPlan().add_wave(Bee, 3, 2, 1).add_wave(Bee, 3, 3, 1)
+    def release(self, time):
+        """Return the Bees of the wave at time."""
+        return self.get(time, [])
+
+    def next_wave(self, time):
+        """Return the earliest time from TIME on at which a wave is
+        released, or None if there is none.
+        """
+        return min((t for t, wave in self.items() if t >= time and wave),
+                   default=None)
+
+    def snapshot(self):
+        """Return the state of the plan, for AntColony.snapshot."""
+        return {time: tuple(wave) for time, wave in self.items()}
+
+    def restore(self, state):
+        """Return the plan to a STATE returned by snapshot."""
+        self.clear()
+        for time, wave in state.items():
+            self[time] = list(wave)
+
+
+class LazyAssaultPlan(AssaultPlan):
+    """An AssaultPlan that stores each wave as (bee_type, armor, count) specs
+    and only creates its Bees when the Hive releases them, so that very large
+    plans start quickly and hold no Bees before they enter the colony.
+
+    >>> plan = LazyAssaultPlan().add_wave(Bee, 3, 4, 2)
+    >>> plan.all_bees, plan.pending_bees
+    ([], 2)
+    >>> plan.release(4)
+    [Bee(3, None), Bee(3, None)]
+    >>> plan.pending_bees, plan.release(4)
+    (0, [])
+    """
+
+    def __init__(self):
+        AssaultPlan.__init__(self)
+        self.pending_bees = 0
+
+    def add_wave(self, bee_type, bee_armor, time, count):
+        """Add a wave at time with count Bees that have the specified armor."""
+        self.setdefault(time, []).append((bee_type, bee_armor, count))
+        self.pending_bees += count
+        return self
+
+    @property
+    def all_bees(self):
+        """No Bees start in the hive; they are created on release."""
+        return []
+
+    def release(self, time):
+        """Create and return the Bees of the wave at time."""
+        bees = []
+        for bee_type, bee_armor, count in self.pop(time, ()):
+            bees.extend(bee_type(bee_armor) for _ in range(count))
+        self.pending_bees -= len(bees)
+        return bees
+
+    def snapshot(self):
+        return AssaultPlan.snapshot(self), self.pending_bees
+
+    def restore(self, state):
+        AssaultPlan.restore(self, state[0])
+        self.pending_bees = state[1]
+
+
+class EndlessAssaultPlan(LazyAssaultPlan):
+    """A LazyAssaultPlan that draws its waves from an iterable of
+    (bee_type, armor, time, count) specs, such as the endless generator made
+    by endless_waves, as the game reaches their times.  Waves must come in
+    order of time.  Since the waves may never run out, the plan counts an
+    infinite number of pending Bees and the ants can only survive it.
+
+    >>> plan = EndlessAssaultPlan(endless_waves(ramp_schedule(ramp=2)))
+    >>> plan.release(1), plan.release(2)
+    ([], [Bee(3, None)])
+    >>> plan.release(4), plan.release(6)
+    ([Bee(3, None)], [Wasp(4, None)])
+    >>> plan.pending_bees
+    inf
+    """
+
+    def __init__(self, waves):
+        LazyAssaultPlan.__init__(self)
+        self.pending_bees = float('inf')
+        # A tee, so that snapshots and clones of the plan can copy it
+        self.waves = itertools.tee(waves, 1)[0]
+        self.upcoming = next(self.waves, None)
+
+    def release(self, time):
+        """Create and return the Bees of the wave at time, including any
+        waves whose times have already passed.
+        """
+        while self.upcoming is not None and self.upcoming[2] <= time:
+            bee_type, bee_armor, _, count = self.upcoming
+            self.add_wave(bee_type, bee_armor, time, count)
+            self.upcoming = next(self.waves, None)
+        return LazyAssaultPlan.release(self, time)
+
+    def next_wave(self, time):
+        upcoming = LazyAssaultPlan.next_wave(self, time)
+        if self.upcoming is not None:
+            upcoming = min(upcoming or float('inf'), max(self.upcoming[2], time))
+        return upcoming
+
+    def snapshot(self):
+        return LazyAssaultPlan.snapshot(self), self.waves.__copy__(), self.upcoming
+
+    def restore(self, state):
+        LazyAssaultPlan.restore(self, state[0])
+        self.waves, self.upcoming = state[1].__copy__(), state[2]
+
+
+def endless_waves(schedule, interval=2, start=2):
+    """Yield (bee_type, armor, time, count) wave specs forever, one wave
+    every INTERVAL turns from turn START.  SCHEDULE(n) returns the
+    (bee_type, armor, count) specs of the nth wave.
+    """
+    n = 0
+    while True:
+        for bee_type, bee_armor, count in schedule(n):
+            yield bee_type, bee_armor, start + n * interval, count
+        n += 1
+
+def ramp_schedule(armor=3, count=1, ramp=10,
+                  bee_types=(Bee, Bee, Wasp, Bee, NinjaBee, Hornet)):
+    """Return a schedule for endless_waves whose waves cycle through
+    BEE_TYPES, starting with COUNT bees with ARMOR armor.  Every RAMP waves,
+    the bees gain one armor and every other time each wave gains a bee.
+    """
+    def schedule(n):
+        level = n // ramp
+        return [(bee_types[n % len(bee_types)], armor + level, count + level // 2)]
+    return schedule
+
+def make_endless_assault_plan(schedule=None):
+    return EndlessAssaultPlan(endless_waves(schedule or ramp_schedule()))
+
+def make_test_assault_plan(plan_type=AssaultPlan):
+    return plan_type().add_wave(Bee, 3, 2, 1).add_wave(Bee, 3, 3, 1)
 
-def make_easy_assault_plan():
-    plan = AssaultPlan()
+def make_easy_assault_plan(plan_type=AssaultPlan):
+    plan = plan_type()
     for time in range(3, 16, 2):
         plan.add_wave(Bee, 3, time, 1)
     plan.add_wave(Wasp, 3, 4, 1)
@@ -930,8 +2319,8 @@ def make_easy_assault_plan():
     plan.add_wave(Boss, 15, 16, 1)
     return plan
 
-def make_normal_assault_plan():
-    plan = AssaultPlan()
+def make_normal_assault_plan(plan_type=AssaultPlan):
+    plan = plan_type()
     for time in range(3, 16, 2):
         plan.add_wave(Bee, 3, time, 2)
     plan.add_wave(Wasp, 3, 4, 1)
@@ -949,8 +2338,8 @@ def make_normal_assault_plan():
     plan.add_wave(Boss, 20, 30, 1)
     return plan
 
-def make_hard_assault_plan():
-    plan = AssaultPlan()
+def make_hard_assault_plan(plan_type=AssaultPlan):
+    plan = plan_type()
     for time in range(3, 16, 2):
         plan.add_wave(Bee, 4, time, 2)
     plan.add_wave(Hornet, 4, 4, 2)
@@ -968,8 +2357,8 @@ def make_hard_assault_plan():
     plan.add_wave(Boss, 30, 30, 1)
     return plan
 
-def make_insane_assault_plan():
-    plan = AssaultPlan()
+def make_insane_assault_plan(plan_type=AssaultPlan):
+    plan = plan_type()
     plan.add_wave(Hornet, 5, 2, 2)
     for time in range(3, 16, 2):
         plan.add_wave(Bee, 5, time, 2)
@@ -992,7 +2381,18 @@ def make_insane_assault_plan():
 from utils import *
 @main
 def run(*args):
-    Insect.reduce_armor = class_method_wrapper(Insect.reduce_armor,
-            pre=print_expired_insects)
-    start_with_strategy(args, interactive_strategy)
+    args = parse_game_args(args)
+    if args.headless:
+        colony = make_colony(args, baseline_strategy, headless=True)
+        print(colony.play(args.max_turns))
+        if colony.stats is not None:
+            print(colony.stats)
+        return
+    colony = make_colony(args, interactive_strategy)
+    colony.events.subscribe(InsectDied, print_expired)
+    try:
+        colony.simulate(args.max_turns)
+    finally:
+        if colony.stats is not None:
+            print(colony.stats)
 
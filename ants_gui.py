@@ -90,6 +90,8 @@ class AntsGUI:
         self._click_rectangles = list()
         self._init_control_panel(colony)
         self._init_places(colony)
+        colony.events.subscribe(ants.LeafThrown, self._throw)
+        colony.events.subscribe(ants.InsectDied, print_expired)
 
         start_text = self.canvas.draw_text('CLICK TO START', MESSAGE_POS)
         self.canvas.wait_for_click()
@@ -187,12 +189,6 @@ class AntsGUI:
             if pos is not None:
                 self._interpret_click(pos, colony)
 
-        # Throw leaves at the end of the turn
-        has_ant = lambda a: hasattr(a, 'ant') and a.ant
-        for ant in colony.ants + [a.ant for a in colony.ants if has_ant(a)]:
-            if ant.name in LEAF_COLORS:
-                self._throw(ant, colony)
-
     def _interpret_click(self, pos, colony):
         """Interpret a click position by finding its click rectangle."""
         x, y = pos
@@ -246,7 +242,8 @@ class AntsGUI:
                     self.images[name][bee] = image
 
             # Remove expired insects
-            valid_insects = set(place.bees + [place.ant])
+            valid_insects = set(place.bees)
+            valid_insects.add(place.ant)
             if place.ant is not None and hasattr(place.ant, 'container') and \
                 place.ant.container:
                 valid_insects.add(place.ant.ant)
@@ -265,10 +262,10 @@ class AntsGUI:
         image = self.canvas.draw_image(pos, image_file, behind=behind)
         self.images[place_name][insect] = image
 
-    def _throw(self, ant, colony):
-        """Animate a leaf thrown at a Bee."""
-        bee = ant.nearest_bee(colony.hive)  # nearest_bee logic from ants.py
-        if bee:
+    def _throw(self, event):
+        """Animate a leaf thrown at a Bee, as the ant throws it."""
+        ant, bee = event
+        if ant.name in LEAF_COLORS:
             start = shift_point(self.place_points[ant.place.name], LEAF_START_OFFSET)
             end = shift_point(self.place_points[bee.place.name], LEAF_END_OFFSET)
             animate_leaf(self.canvas, start, end, color=LEAF_COLORS[ant.name])
@@ -302,6 +299,4 @@ def animate_leaf(canvas, start, end, duration=0.3, color='ForestGreen'):
 from utils import *
 @main
 def run(*args):
-    ants.Insect.reduce_armor = class_method_wrapper(ants.Insect.reduce_armor,
-            pre=print_expired_insects)
     ants.start_with_strategy(args, AntsGUI().strategy)
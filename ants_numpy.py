@@ -0,0 +1,954 @@
+"""The ants_numpy module plays Ants Vs. SomeBees with the board stored as
+NumPy arrays instead of Place and Insect objects.
+
+The ants of a colony with T tunnels of length L are kept in a (2, T * L)
+structured array, indexed by slot (0 for the ant in a place, 1 for the ant
+inside a container) and cell (tunnel * L + depth).  The bees are kept in
+parallel arrays of kind, armor, cell and entry order.  Each phase of a turn
+runs as array operations across all tunnels: ants act one depth at a time,
+and bees act one rank at a time, where the rank of a bee is its position
+among the active bees of its tunnel.  Tunnels never affect one another, so
+this plays the same game as AntColony.play, as compare_engines checks.
+
+A BatchColony plays many games in lockstep by laying their boards end to
+end, so that the tunnels of every game act together; ArrayColony is a
+BatchColony of one game.
+
+Run with `python3 ants_numpy.py -d hard --seed 1`, or check the engine
+against ants.py with `python3 ants_numpy.py --check 100`.
+"""
+
+import random
+
+import numpy as np
+
+import ants
+from ucb import main
+
+#########
+# Types #
+#########
+
+NO_ANT = -1
+
+# Ant actions
+HARVEST, THROW, SLOW, STUN, QUEEN, NINJA, HUNGRY, TANK, IDLE = range(9)
+
+ACTIONS = {
+    ants.HarvesterAnt: HARVEST,
+    ants.ThrowerAnt: THROW,
+    ants.LongThrower: THROW,
+    ants.ShortThrower: THROW,
+    ants.ScubaThrower: THROW,
+    ants.SlowThrower: SLOW,
+    ants.StunThrower: STUN,
+    ants.QueenAnt: QUEEN,
+    ants.NinjaAnt: NINJA,
+    ants.HungryAnt: HUNGRY,
+    ants.TankAnt: TANK,
+    ants.BodyguardAnt: IDLE,
+    ants.FireAnt: IDLE,
+    ants.WallAnt: IDLE,
+}
+
+ANT_TYPES = [t for t in ants.ant_types() if t in ACTIONS]
+ANT_CODES = {t.name: code for code, t in enumerate(ANT_TYPES)}
+ANT_ACTION = np.array([ACTIONS[t] for t in ANT_TYPES])
+ANT_COST = np.array([t.food_cost for t in ANT_TYPES])
+# Building a QueenAnt outside of a colony would count it as a queen
+ANT_ARMOR = np.array([1.0 if t is ants.QueenAnt else t().armor
+                      for t in ANT_TYPES])
+ANT_DAMAGE = np.array([float(t.damage) for t in ANT_TYPES])
+ANT_MIN_RANGE = np.array([getattr(t, 'min_range', 0) for t in ANT_TYPES])
+ANT_MAX_RANGE = np.array([getattr(t, 'max_range', 0) for t in ANT_TYPES])
+ANT_BLOCKS = np.array([t.blocks_path for t in ANT_TYPES])
+ANT_WATERSAFE = np.array([t.watersafe for t in ANT_TYPES])
+ANT_CONTAINER = np.array([t.container for t in ANT_TYPES])
+ANT_BURSTS = np.array([issubclass(t, ants.FireAnt) for t in ANT_TYPES])
+
+ANT_DTYPE = np.dtype([('kind', 'i1'), ('armor', 'f8'), ('damage', 'f8'),
+                      ('buffed', '?'), ('digesting', 'i4'), ('og', '?')])
+EMPTY = np.array((NO_ANT, 0, 0, False, 0, False), ANT_DTYPE)
+
+BEE_TYPES = [ants.Bee, ants.Wasp, ants.Hornet, ants.NinjaBee, ants.Boss]
+BEE_CODES = {t: code for code, t in enumerate(BEE_TYPES)}
+BEE_NAMES = [t.name for t in BEE_TYPES]
+BEE_DAMAGE = np.array([float(t.damage) for t in BEE_TYPES])
+BEE_ACTIONS = np.array([2 if t.action is ants.Hornet.action else 1
+                        for t in BEE_TYPES])
+BEE_UNBLOCKABLE = np.array([t.blocked is not ants.Bee.blocked
+                            for t in BEE_TYPES])
+BEE_IMMUNE = np.array([t.status_immune for t in BEE_TYPES])
+BEE_CAP = np.array([float(getattr(t, 'damage_cap', np.inf))
+                    for t in BEE_TYPES])
+
+# Status effects, with the durations used by SlowThrower and StunThrower
+SLOW_EFFECT, STUN_EFFECT = 1, 2
+EFFECT_NAMES = {SLOW_EFFECT: 'slow', STUN_EFFECT: 'stun'}
+SLOW_TURNS, STUN_TURNS = 3, 1
+
+
+##########
+# Colony #
+##########
+
+NO_END = np.iinfo(np.intp).max
+
+
+class BatchColony(object):
+    """A batch of independent games of Ants Vs. SomeBees played in lockstep,
+    with their places and insects stored in arrays.
+
+    A BatchColony takes the same assault plans and layout functions as an
+    AntColony, but only layouts of straight tunnels that each lead from the
+    queen to a bee entrance, such as dry_layout and wet_layout.  Every game
+    faces the same assault plan on its own copy of the layout.  Each turn,
+    the strategy is called once with the whole BatchColony, and may deploy
+    ants by game and place name with deploy_ant or work on the arrays
+    directly, as baseline_strategy does.  Games that have ended no longer
+    act, and are left out of the playing mask.
+
+    The board of each game has T tunnels of length L, and the cells of game
+    g are numbered from g * T * L.
+
+    Attributes:
+    games -- the number of games
+    time -- elapsed time, shared by all games
+    playing -- whether each game is still being played
+    food -- the available food total of each game
+    ants -- a (2, cells) ANT_DTYPE array of ants in places (slot 0) and in
+            containers (slot 1)
+    bee_count -- the number of live bees in each cell
+    cells -- a dictionary from place names to cells of the first game
+    water -- whether each cell is Water
+    entrances -- the cells of the bee entrances of the first game
+    """
+
+    def __init__(self, strategy, assault_plan, create_places, dimensions,
+                 games, food=2, seed=None, rng=None):
+        """Create a BatchColony for simulating GAMES games.
+
+        Arguments:
+        strategy -- a function to deploy ants to places
+        assault_plan -- an AssaultPlan, released to every game
+        create_places -- a function that creates the places of each colony
+        dimensions -- a pair containing the dimensions of the game layout
+        games -- the number of games to play
+        food -- the starting amount of food for each colony
+        seed -- the seed of the random choices made during the games
+        rng -- a source of uniform random floats with a random(size) method,
+               which defaults to a numpy Generator seeded with SEED.  The
+               entrances of a wave are drawn with a (games, bees) size.
+        """
+        self.strategy = strategy
+        self.assault_plan = assault_plan
+        self.rng = np.random.default_rng(seed) if rng is None else rng
+        self.games = games
+        self.time = 0
+        self.playing = np.ones(games, bool)
+        self.winner = np.full(games, None, object)
+        self.turns = np.zeros(games, np.int64)
+        self.food = np.full(games, food, np.int64)
+        self.food_spent = np.zeros(games, np.int64)
+        self.crowned = np.zeros(games, bool)  # Whether a QueenAnt was built
+        self.killed = np.zeros(games, np.int64)
+        self.end = np.full(games, NO_END)  # The bee that ended each game
+        self.total_bees = len(assault_plan.all_bees) + assault_plan.pending_bees
+        self.configure(create_places, dimensions)
+        weights = assault_plan.lane_weights
+        self.lane_weights = None if weights is None else np.cumsum(weights)
+        self.bee_kind = np.zeros(0, np.int8)
+        self.bee_armor = np.zeros(0)
+        self.bee_cell = np.zeros(0, np.intp)
+        self.bee_entered = np.zeros(0, np.int64)
+        self.bee_alive = np.zeros(0, bool)
+        self.effect_kind = np.zeros((0, 4), np.int8)   # Oldest effect first
+        self.effect_left = np.zeros((0, 4), np.int16)  # 0 for an expired one
+        self.effect_len = np.zeros(0, np.intp)
+        self.entries = 0  # Bees ever added to a place, for their entry order
+
+    def configure(self, create_places, dimensions):
+        """Lay out the cells of every game with CREATE_PLACES."""
+        layout = ants.AntColony(None, ants.Hive(ants.AssaultPlan()), [],
+                                create_places, dimensions, headless=True)
+        tunnels = layout.tunnels
+        if sum(len(t.places) for t in tunnels) != len(layout.place_list) - 1 \
+                or any(t.places[0].exit is not layout.queen for t in tunnels):
+            raise ValueError('{0} only supports straight tunnels'.format(
+                type(self).__name__))
+        self.tunnels = len(tunnels)
+        self.lanes = self.games * self.tunnels
+        self.length = max(len(t.places) for t in tunnels)
+        self.board = self.tunnels * self.length
+        self.place_names = [None] * self.board
+        self.cells = {}
+        water = np.zeros(self.board, bool)
+        for lane, tunnel in enumerate(tunnels):
+            for place in tunnel.places:
+                cell = lane * self.length + place.depth
+                self.place_names[cell] = place.name
+                self.cells[place.name] = cell
+                water[cell] = isinstance(place, ants.Water)
+        self.water = np.tile(water, self.games)
+        self.entrances = np.array([self.cells[p.name]
+                                   for p in layout.bee_entrances])
+        size = self.games * self.board
+        self.ants = np.empty((2, size), ANT_DTYPE)
+        self.ants[...] = EMPTY
+        self.bee_count = np.zeros(size, np.intp)
+        # The dry cells between the queen and each entrance, nearest the
+        # queen first, for baseline_strategy
+        steps = [(step, i, cell - depth + step)
+                 for i, cell in enumerate(self.entrances)
+                 for depth in [cell % self.length]
+                 for step in range(depth + 1)]
+        self.baseline_cells = np.array(
+            [cell for _, _, cell in sorted(steps) if not water[cell]], np.intp)
+        self.baseline_kinds = np.where(
+            self.baseline_cells % self.length == 0,
+            ANT_CODES[ants.HarvesterAnt.name], ANT_CODES[ants.ThrowerAnt.name])
+
+    def play(self, max_turns=None):
+        """Play every game to completion and return a list of GameResults
+        describing their outcomes, as AntColony.play does.
+        """
+        killed = self.killed.copy()
+        while self.playing.any() and (max_turns is None or self.time < max_turns):
+            self.step()
+        return [ants.GameResult(winner, int(turns) if winner else self.time,
+                                int(spent), int(kills))
+                for winner, turns, spent, kills in zip(
+                    self.winner, self.turns, self.food_spent,
+                    self.killed - killed)]
+
+    def step(self):
+        """Play one turn of every game still being played, and return a mask
+        of the games that ended.
+        """
+        self.release_bees()
+        self.strategy(self)
+        self.ants_act()
+        self.bees_act()
+        lost = self.end < NO_END
+        won = ~lost & (self.killed == self.total_bees)
+        ended = self.playing & (lost | won)
+        self.winner[ended & lost] = 'bees'
+        self.winner[ended & won] = 'ants'
+        self.turns[ended] = self.time + 1
+        self.playing &= ~ended
+        if self.playing.any():
+            self.time += 1
+            self.drop_dead_bees()
+        return ended
+
+    def game_of(self, cells):
+        """Return the game of each of CELLS."""
+        return cells // self.board
+
+    def count_kills(self, bees):
+        """Count the expired BEES towards the games they were in."""
+        np.add.at(self.killed, self.game_of(self.bee_cell[bees]), 1)
+
+    ##############
+    # Deployment #
+    ##############
+
+    def deploy_ant(self, place_name, ant_type_name, game=0):
+        """Place an ant in GAME if enough food is available, as
+        AntColony.deploy_ant does, raising an AssertionError if the place
+        cannot hold it.
+        """
+        kind = ANT_CODES[ant_type_name]
+        cost = int(ANT_COST[kind])
+        if self.food[game] < cost:
+            return
+        ant = EMPTY.copy()
+        ant['kind'], ant['armor'], ant['damage'] = \
+            kind, ANT_ARMOR[kind], ANT_DAMAGE[kind]
+        queen = ANT_ACTION[kind] == QUEEN
+        if queen:
+            ant['og'] = not self.crowned[game]
+        cell = game * self.board + self.cells[place_name]
+        slot = self.add_ant(cell, ant, place_name)
+        if queen:  # Only once the queen is placed
+            self.crowned[game] = True
+        self.food[game] -= cost
+        self.food_spent[game] += cost
+        if self.water[cell] and not ANT_WATERSAFE[kind]:
+            if ANT_BURSTS[kind]:
+                self.count_kills(self.damage_all(np.array([cell]),
+                                                 ANT_DAMAGE[kind:kind + 1]))
+            self.remove_ants(np.array([slot]), np.array([cell]))
+
+    def add_ant(self, cell, ant, place_name):
+        """Add ANT to CELL, following the rules of Place.add_insect, and
+        return the slot it was added to.
+        """
+        kind, outer = ant['kind'], self.ants['kind'][0, cell]
+        if outer == NO_ANT:
+            self.ants[0, cell] = ant
+            return 0
+        if ANT_CONTAINER[outer] and self.ants['kind'][1, cell] == NO_ANT \
+                and not ANT_CONTAINER[kind]:
+            self.ants[1, cell] = ant
+            return 1
+        if ANT_CONTAINER[kind] and not ANT_CONTAINER[outer]:
+            self.ants[1, cell] = self.ants[0, cell]
+            self.ants[0, cell] = ant
+            return 0
+        raise AssertionError('Two ants in {0}'.format(place_name))
+
+    def fill(self, cells, kinds):
+        """Deploy ants of KINDS to the empty, dry CELLS and pay for them."""
+        assert not (ANT_ACTION[kinds] == QUEEN).any(), 'Deploy queens singly'
+        self.ants[0, cells] = EMPTY
+        self.ants['kind'][0, cells] = kinds
+        self.ants['armor'][0, cells] = ANT_ARMOR[kinds]
+        self.ants['damage'][0, cells] = ANT_DAMAGE[kinds]
+        cost = np.bincount(self.game_of(cells), ANT_COST[kinds],
+                           self.games).astype(np.int64)
+        self.food -= cost
+        self.food_spent += cost
+
+    def remove_ant(self, place_name, game=0):
+        """Remove the ant in a place of GAME, unless it is the true QueenAnt."""
+        cell = game * self.board + self.cells[place_name]
+        if self.ants['kind'][0, cell] != NO_ANT and not self.ants['og'][0, cell]:
+            self.remove_ants(np.array([0]), np.array([cell]))
+
+    def remove_ants(self, slots, cells):
+        """Remove the ants in SLOTS of CELLS.  A removed container leaves
+        the ant it contains in its place.
+        """
+        outer, inner = cells[slots == 0], cells[slots == 1]
+        self.ants[1, inner] = EMPTY
+        self.ants[0, outer] = self.ants[1, outer]
+        self.ants[1, outer] = EMPTY
+
+    ########
+    # Bees #
+    ########
+
+    def release_bees(self):
+        """Add the bees of this turn's wave to random bee entrances of every
+        game still being played.
+        """
+        bees = self.assault_plan.release(self.time)
+        if not bees:
+            return
+        try:
+            kinds = np.array([BEE_CODES[type(bee)] for bee in bees], np.int8)
+        except KeyError as e:
+            raise ValueError('{0} does not support {1}'.format(
+                type(self).__name__, e))
+        games = np.flatnonzero(self.playing)
+        n = len(bees) * len(games)
+        draws = self.rng.random((len(games), len(bees))).ravel()
+        count = len(self.entrances)
+        if self.lane_weights is None:
+            lanes = (draws * count).astype(np.intp)
+        else:
+            lanes = np.searchsorted(self.lane_weights,
+                                    draws * self.lane_weights[-1], 'right')
+        cells = self.entrances[np.minimum(lanes, count - 1)] + \
+            np.repeat(games * self.board, len(bees))
+        self.bee_kind = np.concatenate([self.bee_kind, np.tile(kinds, len(games))])
+        self.bee_armor = np.concatenate(
+            [self.bee_armor, np.tile([float(bee.armor) for bee in bees],
+                                     len(games))])
+        self.bee_cell = np.concatenate([self.bee_cell, cells])
+        self.bee_entered = np.concatenate(
+            [self.bee_entered, np.arange(self.entries, self.entries + n)])
+        self.bee_alive = np.concatenate([self.bee_alive, np.ones(n, bool)])
+        width = self.effect_kind.shape[1]
+        self.effect_kind = np.concatenate(
+            [self.effect_kind, np.zeros((n, width), np.int8)])
+        self.effect_left = np.concatenate(
+            [self.effect_left, np.zeros((n, width), np.int16)])
+        self.effect_len = np.concatenate([self.effect_len, np.zeros(n, np.intp)])
+        self.entries += n
+        np.add.at(self.bee_count, cells, 1)
+
+    def drop_dead_bees(self):
+        """Forget dead bees and the bees of ended games once they make up
+        most of the bee arrays.
+        """
+        keep = self.bee_alive & self.playing[self.game_of(self.bee_cell)]
+        if len(keep) < 64 or 2 * keep.sum() > len(keep):
+            return
+        for name in ['bee_kind', 'bee_armor', 'bee_cell', 'bee_entered',
+                     'bee_alive', 'effect_kind', 'effect_left', 'effect_len']:
+            setattr(self, name, getattr(self, name)[keep])
+
+    def pick(self, cells):
+        """Return a random live bee in each of the distinct CELLS, which
+        must hold bees.  Bees are numbered in the order they entered a cell,
+        as in its BeeList.
+        """
+        count = self.bee_count[cells]
+        k = np.minimum((self.rng.random(len(cells)) * count).astype(np.intp),
+                       count - 1)
+        bees = np.flatnonzero(self.bee_alive & np.isin(self.bee_cell, cells))
+        bees = bees[np.lexsort((self.bee_entered[bees], self.bee_cell[bees]))]
+        return bees[np.searchsorted(self.bee_cell[bees], cells) + k]
+
+    def hit(self, bees, amounts):
+        """Reduce the armor of distinct BEES by AMOUNTS and return the bees
+        that expired.
+        """
+        amounts = np.array(amounts, float)
+        cap = BEE_CAP[self.bee_kind[bees]]
+        capped = np.isfinite(cap)
+        amount, cap = amounts[capped], cap[capped]
+        amounts[capped] = amount * cap / (cap + amount)
+        self.bee_armor[bees] -= amounts
+        dead = bees[self.bee_armor[bees] <= 0]
+        self.bee_alive[dead] = False
+        np.subtract.at(self.bee_count, self.bee_cell[dead], 1)
+        return dead
+
+    def damage_all(self, cells, amounts):
+        """Damage every bee in each of the distinct CELLS by the matching
+        amount and return the bees that expired.
+        """
+        bees = np.flatnonzero(self.bee_alive & np.isin(self.bee_cell, cells))
+        order = np.argsort(cells)
+        where = order[np.searchsorted(cells[order], self.bee_cell[bees])]
+        return self.hit(bees, amounts[where])
+
+    def apply_effect(self, bees, effect, duration):
+        """Apply a status effect to distinct BEES, as apply_effect does."""
+        bees = bees[~BEE_IMMUNE[self.bee_kind[bees]]]
+        full = bees[self.effect_len[bees] == self.effect_kind.shape[1]]
+        if len(full):
+            # Squeeze out expired effects, keeping the rest in order
+            live = self.effect_left[full] > 0
+            order = np.argsort(~live, axis=1, kind='stable')
+            self.effect_kind[full] = np.take_along_axis(
+                self.effect_kind[full], order, 1)
+            self.effect_left[full] = np.take_along_axis(
+                self.effect_left[full], order, 1)
+            self.effect_len[full] = live.sum(1)
+            if (self.effect_len[full] == self.effect_kind.shape[1]).any():
+                self.effect_kind = np.hstack(
+                    [self.effect_kind, np.zeros_like(self.effect_kind)])
+                self.effect_left = np.hstack(
+                    [self.effect_left, np.zeros_like(self.effect_left)])
+        top = self.effect_len[bees]
+        self.effect_kind[bees, top] = effect
+        self.effect_left[bees, top] = duration
+        self.effect_len[bees] += 1
+
+    def pass_effects(self, bees):
+        """Count down the status effects of distinct BEES for one action, as
+        pass_effects does, and return whether each of them may act.
+        """
+        allowed = np.ones(len(bees), bool)
+        length = self.effect_len[bees]
+        if not length.any():
+            return allowed
+        checking = length > 0
+        slow_passes = self.time % 2 == 0
+        for i in range(length.max() - 1, -1, -1):
+            at = np.flatnonzero(checking & (i < length))
+            at = at[self.effect_left[bees[at], i] > 0]
+            rows = bees[at]
+            self.effect_left[rows, i] -= 1
+            passes = (self.effect_kind[rows, i] == SLOW_EFFECT) & slow_passes
+            allowed[at[~passes]] = checking[at[~passes]] = False
+        # Pop expired effects off the top of each stack
+        rows = bees[length > 0]
+        while len(rows):
+            expired = self.effect_left[rows, self.effect_len[rows] - 1] <= 0
+            rows = rows[expired]
+            self.effect_len[rows] -= 1
+            rows = rows[self.effect_len[rows] > 0]
+        return allowed
+
+    ###########
+    # Actions #
+    ###########
+
+    def ants_act(self):
+        """Let every ant of the games still being played act, in place
+        order.  Ants at the same depth of different tunnels act together.
+        """
+        kind = self.ants['kind']
+        starts = np.flatnonzero(np.repeat(self.playing, self.tunnels)) * self.length
+        # No bees enter a tunnel while ants act, so only the tunnels that
+        # hold bees now can hold a target
+        busy = self.bee_count.reshape(self.lanes, self.length).any(1)
+        for depth in range(self.length):
+            cells = starts + depth
+            cells = cells[kind[0, cells] != NO_ANT]
+            if not len(cells):
+                continue
+            outer = kind[0, cells]
+            # A container acts through the ant it contains
+            slots = ANT_CONTAINER[outer].astype(np.intp)
+            acting = kind[slots, cells] != NO_ANT
+            self.act(slots[acting], cells[acting], busy)
+            tanks = cells[ANT_ACTION[outer] == TANK]
+            if len(tanks):
+                self.count_kills(self.damage_all(
+                    tanks, self.ants['damage'][0, tanks]))
+
+    def act(self, slots, cells, busy):
+        """Perform the actions of the ants in SLOTS of distinct CELLS, where
+        BUSY tells which tunnels may hold bees.
+        """
+        kinds = self.ants['kind'][slots, cells]
+        action = ANT_ACTION[kinds]
+        og = self.ants['og'][slots, cells]
+        harvest = action == HARVEST
+        if harvest.any():
+            np.add.at(self.food, self.game_of(cells[harvest]), 1)
+        throwing = np.isin(action, (THROW, SLOW, STUN)) | ((action == QUEEN) & og)
+        throwing &= busy[cells // self.length]
+        if throwing.any():
+            self.throw(slots[throwing], cells[throwing])
+        ninjas = action == NINJA
+        if ninjas.any():
+            self.count_kills(self.damage_all(
+                cells[ninjas], self.ants['damage'][slots[ninjas], cells[ninjas]]))
+        hungry = action == HUNGRY
+        if hungry.any():
+            self.eat(slots[hungry], cells[hungry])
+        impostors = (action == QUEEN) & ~og
+        if impostors.any():
+            armor = self.ants['armor']
+            armor[slots[impostors], cells[impostors]] -= 1
+            expired = impostors & (armor[slots, cells] <= 0)
+            self.remove_ants(slots[expired], cells[expired])
+        queens = (action == QUEEN) & og
+        if queens.any():
+            self.buff(cells[queens])
+
+    def throw(self, slots, cells):
+        """Throw leaves from the ants in SLOTS of CELLS at the nearest bee in
+        range, as ThrowerAnt.action does.
+        """
+        kinds = self.ants['kind'][slots, cells]
+        depth = cells % self.length
+        low = (depth + ANT_MIN_RANGE[kinds])[:, None]
+        high = (depth + ANT_MAX_RANGE[kinds])[:, None]
+        steps = np.arange(self.length)
+        occupied = self.bee_count.reshape(self.lanes, self.length)[cells // self.length]
+        window = (occupied > 0) & (steps >= low) & (steps < high)
+        found = window.any(1)
+        if not found.any():
+            return
+        slots, cells, kinds = slots[found], cells[found], kinds[found]
+        targets = self.pick(cells - depth[found] + window[found].argmax(1))
+        action = ANT_ACTION[kinds]
+        slow, stun = action == SLOW, action == STUN
+        leaf = ~(slow | stun)
+        self.count_kills(self.hit(
+            targets[leaf], self.ants['damage'][slots[leaf], cells[leaf]]))
+        self.apply_effect(targets[slow], SLOW_EFFECT, SLOW_TURNS)
+        self.apply_effect(targets[stun], STUN_EFFECT, STUN_TURNS)
+
+    def eat(self, slots, cells):
+        """Let the HungryAnts in SLOTS of CELLS eat or digest."""
+        digesting = self.ants['digesting']
+        eating = (digesting[slots, cells] <= 0) & (self.bee_count[cells] > 0)
+        digesting[slots[~eating], cells[~eating]] -= 1
+        slots, cells = slots[eating], cells[eating]
+        if len(cells):
+            bees = self.pick(cells)
+            self.count_kills(self.hit(bees, self.bee_armor[bees]))
+            digesting[slots, cells] = ants.HungryAnt.time_to_digest
+
+    def buff(self, cells):
+        """Double the damage of the ants behind the true queens at CELLS
+        that they have not doubled before.
+        """
+        depth = cells % self.length
+        steps = np.arange(self.length)
+        behind = ((cells - depth)[:, None] + steps)[steps < depth[:, None]]
+        fresh = (self.ants['kind'][:, behind] != NO_ANT) & \
+            ~self.ants['buffed'][:, behind]
+        slots, where = np.nonzero(fresh)
+        self.ants['damage'][slots, behind[where]] *= 2
+        self.ants['buffed'][slots, behind[where]] = True
+
+    def bees_act(self):
+        """Let every active bee of the games still being played act, in the
+        order they were released, recording in END the bee that ended each
+        game the bees won.
+
+        The bees of different tunnels act together, one rank at a time.  If
+        a bee ends its game, bees released after it in other tunnels of that
+        game may already have acted, so the bees killed by their actions are
+        not counted.
+        """
+        bees = np.flatnonzero(self.bee_alive &
+                              self.playing[self.game_of(self.bee_cell)])
+        lanes = self.bee_cell[bees] // self.length
+        order = np.argsort(lanes, kind='stable')
+        bees, lanes = bees[order], lanes[order]
+        ranks = np.arange(len(bees)) - np.searchsorted(lanes, lanes)
+        order = np.argsort(ranks, kind='stable')
+        bees, ranks = bees[order], ranks[order]
+        self.end[:] = NO_END
+        self.burned = []    # The cause of each bee killed by a FireAnt
+        for group in np.split(bees, np.flatnonzero(np.diff(ranks)) + 1):
+            for turn in range(BEE_ACTIONS.max()):
+                group = group[self.bee_alive[group]]
+                group = group[BEE_ACTIONS[self.bee_kind[group]] > turn]
+                group = group[group < self.end[self.game_of(self.bee_cell[group])]]
+                if not len(group):
+                    break
+                self.bee_action(group)
+        causes = np.concatenate([np.zeros(0, np.intp)] + self.burned)
+        games = self.game_of(self.bee_cell[causes])
+        np.add.at(self.killed, games[causes <= self.end[games]], 1)
+
+    def bee_action(self, bees):
+        """Perform the actions of BEES, which are in distinct tunnels."""
+        bees = bees[self.pass_effects(bees)]
+        cells = self.bee_cell[bees]
+        outer = self.ants['kind'][0, cells]
+        blocked = outer != NO_ANT
+        blocked[blocked] = ANT_BLOCKS[outer[blocked]]
+        blocked &= ~BEE_UNBLOCKABLE[self.bee_kind[bees]]
+        if blocked.any():
+            self.sting(bees[blocked], cells[blocked])
+        self.advance(bees[~blocked], cells[~blocked])
+
+    def sting(self, bees, cells):
+        """Let BEES sting the ants in their distinct CELLS."""
+        armor = self.ants['armor'][0, cells] - BEE_DAMAGE[self.bee_kind[bees]]
+        expired = armor <= 0
+        fatal = expired & self.ants['og'][0, cells]
+        if fatal.any():
+            self.end_game(bees[fatal])
+        bees, cells, armor, expired = \
+            bees[~fatal], cells[~fatal], armor[~fatal], expired[~fatal]
+        fire = expired & ANT_BURSTS[self.ants['kind'][0, cells]]
+        if fire.any():
+            dead = self.damage_all(cells[fire], self.ants['damage'][0, cells[fire]])
+            order = np.argsort(cells[fire])
+            where = order[np.searchsorted(cells[fire][order], self.bee_cell[dead])]
+            self.burned.append(bees[fire][where])
+        self.ants['armor'][0, cells] = armor
+        self.remove_ants(np.zeros(expired.sum(), np.intp), cells[expired])
+
+    def advance(self, bees, cells):
+        """Move BEES from their distinct CELLS to the exits of those cells."""
+        home = cells % self.length == 0
+        if home.any():
+            self.end_game(bees[home])
+        bees, cells = bees[~home], cells[~home]
+        np.subtract.at(self.bee_count, cells, 1)
+        np.add.at(self.bee_count, cells - 1, 1)
+        self.bee_cell[bees] = cells - 1
+        self.bee_entered[bees] = np.arange(self.entries, self.entries + len(bees))
+        self.entries += len(bees)
+
+    def end_game(self, bees):
+        """Record that the actions of BEES let the bees win their games."""
+        np.minimum.at(self.end, self.game_of(self.bee_cell[bees]), bees)
+
+
+class ArrayColony(BatchColony):
+    """A single game of Ants Vs. SomeBees stored in arrays: a BatchColony of
+    one game, whose play method returns one GameResult.
+    """
+
+    def __init__(self, strategy, assault_plan, create_places, dimensions,
+                 food=2, seed=None, rng=None):
+        """Create an ArrayColony for simulating a game.
+
+        Arguments:
+        strategy -- a function to deploy ants to places
+        assault_plan -- an AssaultPlan
+        create_places -- a function that creates the places of the colony
+        dimensions -- a pair containing the dimensions of the game layout
+        food -- the starting amount of food for the colony
+        seed -- the seed of the random choices made during the game
+        rng -- a source of uniform random floats with a random(size) method,
+               which defaults to a numpy Generator seeded with SEED
+        """
+        BatchColony.__init__(self, strategy, assault_plan, create_places,
+                             dimensions, 1, food, seed, rng)
+
+    def play(self, max_turns=None):
+        """Play the game to completion and return a GameResult describing
+        its outcome, as AntColony.play does.
+        """
+        return BatchColony.play(self, max_turns)[0]
+
+
+def baseline_strategy(colony):
+    """The array version of ants.baseline_strategy: in each game still being
+    played, fill the empty, dry places of each tunnel that hold no bees from
+    the back, with a HarvesterAnt nearest the queen and ThrowerAnts in front
+    of it, for as long as there is enough food.
+    """
+    games = np.flatnonzero(colony.playing)
+    cells = (games * colony.board)[:, None] + colony.baseline_cells
+    kinds = np.broadcast_to(colony.baseline_kinds, cells.shape)
+    free = (colony.ants['kind'][0, cells] == NO_ANT) & (colony.bee_count[cells] == 0)
+    cost = np.where(free, ANT_COST[kinds], 0).cumsum(1)
+    deploy = free & (cost <= colony.food[games, None])
+    if deploy.any():
+        colony.fill(cells[deploy], kinds[deploy])
+
+
+STRATEGIES = {
+    'baseline': baseline_strategy,
+}
+
+
+###########################
+# Differential Testing    #
+###########################
+
+LAST = np.nextafter(1.0, 0.0)
+
+class LastChoice(object):
+    """A stand-in for random.Random that always chooses the last option.
+    The last item of a BeeList is never a hole, so it chooses the Bee that
+    entered a place last.
+    """
+
+    def choice(self, seq):
+        return seq[-1]
+
+    def randrange(self, n):
+        return n - 1
+
+    def random(self):
+        return LAST
+
+
+class LastDraw(object):
+    """A stand-in for a numpy Generator whose uniform draws all pick the
+    last option, matching LastChoice.
+    """
+
+    def random(self, size):
+        return np.full(size, LAST)
+
+
+class RotatingChoice(LastChoice):
+    """A LastChoice that sends the bees of the wave at time t to the bee
+    entrances of COLONY in turn, the kth to entrance (t + k) mod n, so that
+    every lane is checked.  Bees entering through lane weights still choose
+    the last option.
+
+    >>> colony = ants.AntColony(None, ants.Hive(ants.AssaultPlan()),
+    ...                         ants.ant_types(), ants.dry_layout, (3, 9))
+    >>> colony.rng = rng = RotatingChoice(colony)
+    >>> colony.time = 4
+    >>> [rng.choice(colony.bee_entrances).name for _ in range(3)]
+    ['tunnel_1_8', 'tunnel_2_8', 'tunnel_0_8']
+    """
+
+    def __init__(self, colony):
+        self.colony = colony
+        self.time, self.released = None, 0
+
+    def choice(self, seq):
+        colony = self.colony
+        if seq is not colony.bee_entrances:
+            return seq[-1]
+        if colony.time != self.time:
+            self.time, self.released = colony.time, 0
+        self.released += 1
+        return seq[(colony.time + self.released - 1) % len(seq)]
+
+
+class RotatingDraw(LastDraw):
+    """A LastDraw whose draws for the entrances of a wave match the
+    choices of RotatingChoice in every game of COLONY.
+    """
+
+    def __init__(self, colony):
+        self.colony = colony
+
+    def random(self, size):
+        if not isinstance(size, tuple):
+            return LastDraw.random(self, size)
+        count = len(self.colony.entrances)
+        lanes = (self.colony.time + np.arange(size[1])) % count
+        return np.broadcast_to((lanes + 0.5) / count, size)
+
+
+def describe_colony(colony):
+    """Describe the state of an AntColony for compare_engines."""
+    def ant(a):
+        return (a.name, a.armor, a.damage, getattr(a, 'OG', False),
+                getattr(a, 'digesting', 0))
+    def bee(b):
+        effects = tuple(('slow' if 'make_slow' in gate.__qualname__ else 'stun',
+                         left) for gate, left in b.effects or ())
+        return (b.name, b.armor, effects)
+    places = []
+    for place in colony.place_list:
+        if place is colony.hive:
+            continue
+        held = []
+        if place.ant is not None:
+            held.append(ant(place.ant))
+            if place.ant.container and place.ant.ant is not None:
+                held.append(ant(place.ant.ant))
+        places.append((place.name, tuple(held),
+                       tuple(bee(b) for b in place.bees)))
+    return colony.time, colony.food, sorted(places)
+
+
+def describe_arrays(colony, game=0):
+    """Describe the state of GAME in a BatchColony for compare_engines."""
+    def ant(a):
+        return (ANT_TYPES[a['kind']].name, a['armor'], a['damage'], a['og'],
+                a['digesting'])
+    def bee(b):
+        effects = tuple((EFFECT_NAMES[k], left) for k, left in zip(
+            colony.effect_kind[b, :colony.effect_len[b]],
+            colony.effect_left[b, :colony.effect_len[b]]) if left > 0)
+        return (BEE_NAMES[colony.bee_kind[b]], colony.bee_armor[b], effects)
+    bees = np.flatnonzero(colony.bee_alive &
+                          (colony.game_of(colony.bee_cell) == game))
+    bees = bees[np.lexsort((colony.bee_entered[bees], colony.bee_cell[bees]))]
+    places = []
+    for cell, name in enumerate(colony.place_names, game * colony.board):
+        if name is None:
+            continue
+        held = tuple(ant(colony.ants[slot, cell]) for slot in (0, 1)
+                     if colony.ants['kind'][slot, cell] != NO_ANT)
+        places.append((name, held, tuple(
+            bee(b) for b in bees[colony.bee_cell[bees] == cell])))
+    return colony.time, colony.food[game], sorted(places)
+
+
+def scripted_strategy(seed, place_names, describe, log, deployments=2):
+    """Return a strategy that records the state of the colony in LOG with
+    DESCRIBE, then tries to deploy random ants to random places, making the
+    same choices for both engines.  The strategy takes the game to play as
+    an optional second argument, for a BatchColony.
+    """
+    rng = random.Random(seed)
+    names = sorted(ANT_CODES)
+    def strategy(colony, *game):
+        log.append(describe(colony, *game))
+        for _ in range(deployments):
+            place, ant = rng.choice(place_names), rng.choice(names)
+            try:
+                colony.deploy_ant(place, ant, *game)
+            except AssertionError:
+                pass
+    return strategy
+
+
+def play_scripted(plan_factory, create_places, dimensions, seed, names, food,
+                  deployments, max_turns):
+    """Play a scripted game with AntColony, and return its log and result."""
+    log = []
+    strategy = scripted_strategy(seed, names, describe_colony, log, deployments)
+    colony = ants.AntColony(strategy, ants.Hive(plan_factory()),
+                            ants.ant_types(), create_places, dimensions,
+                            food, headless=True)
+    colony.rng = RotatingChoice(colony)
+    return log, colony.play(max_turns)
+
+
+def compare_engines(plan_factory, create_places, dimensions, seeds, food=10,
+                    deployments=2, max_turns=200):
+    """Play one scripted game per seed with both AntColony and ArrayColony,
+    and return the seeds of the games in which they disagree.
+
+    Both engines send each wave's bees to the entrances in turn and choose
+    the last option for every other random choice, so that their games
+    must match turn by turn.
+
+    >>> compare_engines(ants.make_hard_assault_plan, ants.wet_layout,
+    ...                 (3, 9), range(30), food=60, deployments=4)
+    []
+    >>> compare_engines(ants.make_insane_assault_plan, ants.dry_layout,
+    ...                 (2, 9), range(30), food=100, deployments=6)
+    []
+    """
+    names = [name for name in ArrayColony(None, ants.AssaultPlan(), create_places,
+                                          dimensions).place_names if name]
+    differences = []
+    for seed in seeds:
+        expected = play_scripted(plan_factory, create_places, dimensions, seed,
+                                 names, food, deployments, max_turns)
+        log = []
+        strategy = scripted_strategy(seed, names, describe_arrays, log,
+                                     deployments)
+        colony = ArrayColony(strategy, plan_factory(), create_places,
+                             dimensions, food)
+        colony.rng = RotatingDraw(colony)
+        result = colony.play(max_turns)
+        if expected != (log, result):
+            differences.append(seed)
+    return differences
+
+
+def compare_batch(plan_factory, create_places, dimensions, seeds, food=10,
+                  deployments=2, max_turns=200):
+    """Play one scripted game per seed with AntColony, play all of them at
+    once with a BatchColony, and return the seeds of the games in which they
+    disagree.
+
+    >>> compare_batch(ants.make_hard_assault_plan, ants.wet_layout,
+    ...               (3, 9), range(30), food=60, deployments=4)
+    []
+    >>> compare_batch(ants.make_insane_assault_plan, ants.dry_layout,
+    ...               (2, 9), range(30), food=100, deployments=6)
+    []
+    """
+    seeds = list(seeds)
+    names = [name for name in ArrayColony(None, ants.AssaultPlan(), create_places,
+                                          dimensions).place_names if name]
+    logs = [[] for _ in seeds]
+    strategies = [scripted_strategy(seed, names, describe_arrays, log,
+                                    deployments)
+                  for seed, log in zip(seeds, logs)]
+    def strategy(colony):
+        for game in np.flatnonzero(colony.playing):
+            strategies[game](colony, game)
+    colony = BatchColony(strategy, plan_factory(), create_places, dimensions,
+                         len(seeds), food)
+    colony.rng = RotatingDraw(colony)
+    results = colony.play(max_turns)
+    return [seed for seed, log, result in zip(seeds, logs, results)
+            if play_scripted(plan_factory, create_places, dimensions, seed,
+                             names, food, deployments, max_turns) != (log, result)]
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Play Ants vs. SomeBees on arrays")
+    parser.add_argument('-d', type=str, metavar='DIFFICULTY',
+                        help='sets difficulty of game (easy/medium/hard/insane/endless)')
+    parser.add_argument('-w', '--water', action='store_true',
+                        help='loads a full layout with water')
+    parser.add_argument('--food', type=int, default=2,
+                        help='number of food to start with when testing')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for the random choices made during the game')
+    parser.add_argument('--max-turns', type=int, default=None,
+                        help='stop the game after this many turns')
+    parser.add_argument('--check', type=int, metavar='GAMES', default=None,
+                        help='compare GAMES scripted games with ants.py, one at a time '
+                             'and in a batch')
+    args = parser.parse_args(args)
+
+    assault_plan, layout, dimensions, food = ants.game_config(args)
+    if args.check is None:
+        colony = ArrayColony(baseline_strategy, assault_plan, layout,
+                             dimensions, food, args.seed)
+        print(colony.play(args.max_turns))
+        return
+    factory = lambda: ants.game_config(args)[0]
+    differences = sorted(set().union(*(
+        compare(factory, layout, dimensions, range(args.check), max(food, 10))
+        for compare in (compare_engines, compare_batch))))
+    print('{0} of {1} games differ{2}'.format(
+        len(differences), args.check,
+        ': seeds ' + str(differences) if differences else ''))
@@ -0,0 +1,214 @@
+"""The batch module plays many headless games of Ants Vs. SomeBees across a
+pool of processes and summarizes how often a strategy wins.
+
+Run with `python3 batch.py -d hard -n 1000` from the project directory.
+"""
+
+import math
+import multiprocessing
+import statistics
+from collections import namedtuple
+
+import ants
+import replay
+import search
+from ucb import main
+
+PLANS = {
+    'test': (ants.make_test_assault_plan, 1),
+    'easy': (ants.make_easy_assault_plan, 2),
+    'normal': (ants.make_normal_assault_plan, 3),
+    'hard': (ants.make_hard_assault_plan, 4),
+    'insane': (ants.make_insane_assault_plan, 4),
+    'endless': (ants.make_endless_assault_plan, 4),
+}
+
+STRATEGIES = {
+    'baseline': ants.baseline_strategy,
+    'search': search.search_strategy,
+}
+
+
+class BatchResult(namedtuple('BatchResult', ['results', 'win_rate', 'win_rate_ci',
+                                             'mean_turns', 'turns_ci'])):
+    """Summary statistics of a batch of games.
+
+    results -- the GameResult of every game, in seed order
+    win_rate -- the fraction of games won by the ants
+    win_rate_ci -- a (low, high) confidence interval for win_rate
+    mean_turns -- the mean number of turns per game
+    turns_ci -- a (low, high) confidence interval for mean_turns
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        return ('{0} games: win rate {1:.3f} [{2[0]:.3f}, {2[1]:.3f}], '
+                'mean turns {3:.2f} [{4[0]:.2f}, {4[1]:.2f}]').format(
+                    len(self.results), self.win_rate, self.win_rate_ci,
+                    self.mean_turns, self.turns_ci)
+
+
+def z_score(confidence):
+    """Return the two-sided standard normal quantile for CONFIDENCE.
+
+    >>> round(z_score(0.95), 2)
+    1.96
+    """
+    return statistics.NormalDist().inv_cdf((1 + confidence) / 2)
+
+
+def wilson_interval(successes, trials, confidence=0.95):
+    """Return the Wilson score interval for a binomial proportion.
+
+    >>> low, high = wilson_interval(50, 100)
+    >>> round(low, 3), round(high, 3)
+    (0.404, 0.596)
+    >>> wilson_interval(0, 0)
+    (0.0, 1.0)
+    """
+    if trials == 0:
+        return (0.0, 1.0)
+    z = z_score(confidence)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    spread = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials))
+    return (max(0.0, center - spread / denominator),
+            min(1.0, center + spread / denominator))
+
+
+def mean_interval(values, confidence=0.95):
+    """Return the mean of VALUES and a normal-approximation confidence
+    interval for it.
+
+    >>> mean_interval([10, 12, 14])  # doctest: +ELLIPSIS
+    (12, (9.736..., 14.263...))
+    """
+    mean = statistics.mean(values)
+    if len(values) < 2:
+        return mean, (mean, mean)
+    spread = z_score(confidence) * statistics.stdev(values) / math.sqrt(len(values))
+    return mean, (mean - spread, mean + spread)
+
+
+def play_game(task):
+    """Play one headless game described by TASK and return its GameResult,
+    or if it is recorded, its GameResult and replay.
+
+    task -- a tuple (strategy, plan_factory, layout, dimensions, food, seed,
+            max_turns, record)
+    """
+    strategy, plan_factory, layout, dimensions, food, seed, max_turns, \
+        record = task
+    hive = ants.Hive(plan_factory())
+    colony = ants.AntColony(strategy, hive, ants.ant_types(), layout,
+                            dimensions, food, headless=True, seed=seed)
+    if record:
+        return replay.record_game(colony, max_turns)
+    return colony.play(max_turns)
+
+
+def summarize(results, confidence=0.95):
+    """Return a BatchResult for a list of GameResults."""
+    wins = sum(1 for result in results if result.winner == 'ants')
+    mean_turns, turns_ci = mean_interval([r.turns for r in results], confidence)
+    return BatchResult(results, wins / len(results),
+                       wilson_interval(wins, len(results), confidence),
+                       mean_turns, turns_ci)
+
+
+def run_batch(strategy, plan_factory, layout, seeds, dimensions=(4, 9), food=2,
+              workers=None, confidence=0.95, max_turns=None, archive=None):
+    """Play one game per seed across a pool of processes and return a
+    BatchResult.
+
+    strategy -- a module-level strategy function, e.g. ants.baseline_strategy
+    plan_factory -- a function returning an AssaultPlan, e.g.
+                    ants.make_hard_assault_plan
+    layout -- a layout function, e.g. ants.dry_layout or ants.wet_layout
+    seeds -- an iterable of random seeds, or the number of games to play
+    dimensions -- the (tunnels, length) of the layout
+    food -- the food each colony starts with
+    workers -- the number of processes (defaults to the number of CPUs)
+    max_turns -- if given, stop each game after this many turns
+    archive -- if given, the path of a replay archive to record the games
+               in, with their seeds as their ids
+    """
+    if isinstance(seeds, int):
+        seeds = range(seeds)
+    tasks = [(strategy, plan_factory, layout, dimensions, food, seed, max_turns,
+              archive is not None) for seed in seeds]
+    with multiprocessing.Pool(workers) as pool:
+        if archive is None:
+            results = pool.map(play_game, tasks)
+        else:
+            results = []
+            with replay.ArchiveWriter(archive) as writer:
+                for task, (result, data) in zip(
+                        tasks, pool.imap(play_game, tasks, chunksize=16)):
+                    writer.add(task[5], data)
+                    results.append(result)
+    return summarize(results, confidence)
+
+
+def run_array_batch(strategy, plan_factory, layout, games, dimensions=(4, 9),
+                    food=2, seed=None, confidence=0.95, max_turns=None):
+    """Play GAMES games in lockstep on one ants_numpy.BatchColony and return
+    a BatchResult.  Requires NumPy.
+
+    strategy -- a BatchColony strategy, e.g. ants_numpy.baseline_strategy
+    plan_factory -- a function returning an AssaultPlan
+    layout -- a layout function, e.g. ants.dry_layout or ants.wet_layout
+    games -- the number of games to play
+    dimensions -- the (tunnels, length) of the layout
+    food -- the food each colony starts with
+    seed -- the seed of the random choices made during the games
+    max_turns -- if given, stop each game after this many turns
+    """
+    import ants_numpy
+    colony = ants_numpy.BatchColony(strategy, plan_factory(), layout,
+                                    dimensions, games, food, seed)
+    return summarize(colony.play(max_turns), confidence)
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Play many headless games")
+    parser.add_argument('-d', type=str, default='easy', choices=sorted(PLANS),
+                        metavar='DIFFICULTY', help='sets the assault plan')
+    parser.add_argument('-w', '--water', action='store_true',
+                        help='loads a full layout with water')
+    parser.add_argument('-s', '--strategy', default='baseline',
+                        choices=sorted(STRATEGIES), help='strategy to play')
+    parser.add_argument('-n', '--games', type=int, default=100,
+                        help='number of games (seeds 0 to n-1)')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='number of worker processes')
+    parser.add_argument('--food', type=int, default=2,
+                        help='number of food to start with')
+    parser.add_argument('--max-turns', type=int, default=None,
+                        help='stop each game after this many turns')
+    parser.add_argument('--arrays', action='store_true',
+                        help='play all games in lockstep with ants_numpy')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for the random choices of --arrays games')
+    parser.add_argument('--archive', metavar='PATH', default=None,
+                        help='record the games in a replay archive')
+    args = parser.parse_args(args)
+
+    plan_factory, num_tunnels = PLANS[args.d]
+    layout = ants.wet_layout if args.water else ants.dry_layout
+    if args.arrays:
+        import ants_numpy
+        if args.strategy not in ants_numpy.STRATEGIES:
+            parser.error('no array version of ' + args.strategy)
+        if args.archive is not None:
+            parser.error('--arrays games cannot be recorded')
+        print(run_array_batch(ants_numpy.STRATEGIES[args.strategy], plan_factory,
+                              layout, args.games, (num_tunnels, 9), args.food,
+                              args.seed, max_turns=args.max_turns))
+        return
+    print(run_batch(STRATEGIES[args.strategy], plan_factory, layout,
+                    args.games, (num_tunnels, 9), args.food, args.workers,
+                    max_turns=args.max_turns, archive=args.archive))
@@ -0,0 +1,995 @@
+"""Benchmarks for the Ants Vs. SomeBees game engine.
+
+Run with `python3 benchmarks.py` from the project directory.
+
+The suite (`python3 benchmarks.py --suite`) measures full games of each
+assault plan on each layout, single actions, and boards of up to 1000 by
+1000 places.  It can write its results as JSON with --json, and compare
+them with results written earlier with --compare.
+
+The regression gate (`python3 benchmarks.py --gate`) plays a fixed, seeded
+workload several times and exits with status 1 if its speed or peak
+memory is worse than the checked-in baseline in benchmarks_baseline.json
+by more than a threshold.  Baselines depend on the machine, so record one
+with `python3 benchmarks.py --gate --update-baseline` before comparing.
+"""
+
+import contextlib
+import copy
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+import ants
+import utils
+from ucb import main
+
+DIFFICULTIES = ['easy', 'normal', 'hard', 'insane']
+
+# Lookahead strategies clone the colony thousands of times a turn, so a
+# clone of a 4x9 board must take microseconds, well under a millisecond
+CLONE_TARGET = 1000.0
+
+
+def make_args(difficulty, water=False, seed=None):
+    """Return the parsed command-line arguments for a game at DIFFICULTY."""
+    args = ['-d', difficulty]
+    if water:
+        args.append('-w')
+    if seed is not None:
+        args += ['--seed', str(seed)]
+    return ants.parse_game_args(args)
+
+
+def time_games(play, difficulty, water, games):
+    """Play GAMES seeded games at DIFFICULTY with PLAY(args) and return the
+    total number of turns played and the elapsed wall time in seconds.
+    """
+    games = [make_args(difficulty, water, seed) for seed in range(games)]
+    turns = 0
+    start = time.perf_counter()
+    for args in games:
+        turns += play(args)
+    return turns, time.perf_counter() - start
+
+
+def play_console(args):
+    """Play a game the way `python3 ants.py` does, with the expired insect
+    messages enabled and all console output discarded.
+    """
+    colony = ants.make_colony(args, ants.baseline_strategy)
+    colony.events.subscribe(ants.InsectDied, utils.print_expired)
+    with contextlib.redirect_stdout(io.StringIO()):
+        colony.simulate()
+    return colony.time + 1
+
+
+def play_headless(args):
+    """Play a game in headless mode."""
+    colony = ants.make_colony(args, ants.baseline_strategy, headless=True)
+    return colony.play().turns
+
+
+def bench_headless(games=200, water=False):
+    """Compare turns per second of the console and headless paths.
+
+    Returns a list of (difficulty, console turns/sec, headless turns/sec).
+    """
+    results = []
+    for difficulty in DIFFICULTIES:
+        turns, elapsed = time_games(play_console, difficulty, water, games)
+        console = turns / elapsed
+        turns, elapsed = time_games(play_headless, difficulty, water, games)
+        results.append((difficulty, console, turns / elapsed))
+    return results
+
+
+def scan_ants(colony):
+    """List the ants of COLONY by scanning every place."""
+    return [p.ant for p in colony.places.values() if p.ant is not None]
+
+
+def scan_bees(colony):
+    """List the bees of COLONY by scanning every place."""
+    return [b for p in colony.places.values() for b in p.bees]
+
+
+def bench_registries(tunnels=100, length=100, queries=200):
+    """Compare listing ants and bees by scanning places against the live
+    registries on a large board with one ant and one bee every 10 places.
+
+    Returns a pair of (scan queries/sec, registry queries/sec).
+    """
+    hive = ants.Hive(ants.AssaultPlan())
+    colony = ants.AntColony(None, hive, ants.ant_types(), ants.dry_layout,
+                            (tunnels, length), headless=True)
+    for place in colony.place_list[1::10]:
+        place.add_insect(ants.ThrowerAnt())
+        place.add_insect(ants.Bee(3))
+
+    def rate(list_ants, list_bees):
+        start = time.perf_counter()
+        for _ in range(queries):
+            list_ants(colony)
+            list_bees(colony)
+        return queries / (time.perf_counter() - start)
+
+    return (rate(scan_ants, scan_bees),
+            rate(lambda c: c.ants, lambda c: c.bees))
+
+
+def bytes_per_instance(make, count):
+    """Return the memory allocated per object when calling MAKE COUNT times,
+    not counting the list that holds them.
+    """
+    tracemalloc.start()
+    try:
+        objects = [None] * count
+        before = tracemalloc.get_traced_memory()[0]
+        for i in range(count):
+            objects[i] = make()
+        return (tracemalloc.get_traced_memory()[0] - before) / count
+    finally:
+        tracemalloc.stop()
+
+
+def bench_memory(count=100000):
+    """Measure the bytes allocated per Bee, ThrowerAnt and Place.
+
+    Returns a list of (kind, bytes per instance).
+    """
+    return [('Bee', bytes_per_instance(lambda: ants.Bee(3), count)),
+            ('ThrowerAnt', bytes_per_instance(ants.ThrowerAnt, count)),
+            ('Place', bytes_per_instance(lambda: ants.Place('p'), count))]
+
+
+def stress_plan(plan_type, bees):
+    """Return a plan of plan_type that releases BEES bees, 100 per turn."""
+    plan = plan_type()
+    for time in range(bees // 100):
+        plan.add_wave(ants.Bee, 3, time, 100)
+    return plan
+
+
+def bench_lazy_plan(bees=200000):
+    """Compare creating a Hive for a stress plan of BEES bees, with the plan
+    built eagerly and lazily.
+
+    Returns a list of (plan kind, seconds, peak MB).
+    """
+    results = []
+    for plan_type in (ants.AssaultPlan, ants.LazyAssaultPlan):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            hive = ants.Hive(stress_plan(plan_type, bees))
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        finally:
+            tracemalloc.stop()
+        results.append((plan_type.__name__, elapsed, peak))
+    return results
+
+
+def bench_endless(turns=100000, checkpoints=4):
+    """Play an endless game with weak bees for TURNS turns, measuring the
+    traced memory at evenly spaced CHECKPOINTS to check that it stays flat.
+
+    Returns a list of (turns played, turns/sec, traced MB).
+    """
+    schedule = ants.ramp_schedule(armor=1, ramp=turns, bee_types=(ants.Bee,))
+    hive = ants.Hive(ants.make_endless_assault_plan(schedule))
+    colony = ants.AntColony(ants.baseline_strategy, hive, ants.ant_types(),
+                            ants.dry_layout, (4, 9), headless=True, seed=0)
+    results = []
+    tracemalloc.start()
+    try:
+        for i in range(1, checkpoints + 1):
+            start = time.perf_counter()
+            played = colony.time
+            colony.play(turns * i // checkpoints)
+            rate = (colony.time - played) / (time.perf_counter() - start)
+            size = tracemalloc.get_traced_memory()[0] / 2 ** 20
+            results.append((colony.time, rate, size))
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def bench_fast_forward(turns=20000, interval=50):
+    """Compare turns per second of an endless game with one weak bee every
+    INTERVAL turns, played by the baseline strategy with and without
+    fast-forwarding through the idle turns between waves.
+
+    Returns a list of (kind, turns/sec).
+    """
+    def plain_strategy(colony):
+        ants.baseline_strategy(colony)  # Has no idle_turns, so never skips
+
+    results = []
+    for kind, strategy in [('turn by turn', plain_strategy),
+                           ('fast-forward', ants.baseline_strategy)]:
+        schedule = ants.ramp_schedule(armor=1, ramp=turns, bee_types=(ants.Bee,))
+        plan = ants.EndlessAssaultPlan(ants.endless_waves(schedule, interval))
+        colony = ants.AntColony(strategy, ants.Hive(plan), ants.ant_types(),
+                                ants.dry_layout, (4, 9), headless=True, seed=0)
+        start = time.perf_counter()
+        colony.play(turns)
+        results.append((kind, colony.time / (time.perf_counter() - start)))
+    return results
+
+
+def bench_engines(lanes=(4, 100, 1000, 10000), turns=50):
+    """Compare turns per second of AntColony and ArrayColony playing a
+    stress plan of 100 bees per turn with the baseline strategy, on boards
+    with each number of tunnels in LANES.  Each colony starts with enough
+    food to fill its board.
+
+    Returns a list of (tunnels, object turns/sec, array turns/sec), or an
+    empty list if NumPy is not installed.
+    """
+    try:
+        import ants_numpy
+    except ImportError:
+        return []
+    results = []
+    for n in lanes:
+        rates = []
+        for make in (lambda plan: ants.AntColony(
+                         ants.baseline_strategy, ants.Hive(plan),
+                         ants.ant_types(), ants.dry_layout, (n, 9),
+                         40 * n, headless=True, seed=0),
+                     lambda plan: ants_numpy.ArrayColony(
+                         ants_numpy.baseline_strategy, plan, ants.dry_layout,
+                         (n, 9), 40 * n, seed=0)):
+            colony = make(stress_plan(ants.LazyAssaultPlan, 100 * turns))
+            start = time.perf_counter()
+            played = colony.play(turns).turns
+            rates.append(played / (time.perf_counter() - start))
+        results.append((n,) + tuple(rates))
+    return results
+
+
+def bench_batch(sizes=(10, 100, 1000, 10000), difficulty='hard'):
+    """Compare turns per second of playing baseline games at DIFFICULTY one
+    at a time on AntColony and in lockstep on a BatchColony of each size in
+    SIZES.
+
+    Returns a list of (games, object turns/sec, batch turns/sec), or an
+    empty list if NumPy is not installed.
+    """
+    try:
+        import ants_numpy
+    except ImportError:
+        return []
+    args = make_args(difficulty)
+    turns, elapsed = time_games(play_headless, difficulty, False, 200)
+    objects = turns / elapsed
+    results = []
+    for n in sizes:
+        plan, layout, dimensions, food = ants.game_config(args)
+        start = time.perf_counter()
+        colony = ants_numpy.BatchColony(ants_numpy.baseline_strategy, plan,
+                                        layout, dimensions, n, food, seed=0)
+        turns = sum(result.turns for result in colony.play())
+        results.append((n, objects, turns / (time.perf_counter() - start)))
+    return results
+
+
+def bench_clone(turns=8, copies=500):
+    """Compare copying a hard game on a 4x9 board after TURNS turns with
+    copy.deepcopy, AntColony.clone, and AntColony.snapshot and restore.
+
+    Returns a list of (method, microseconds per copy).
+    """
+    colony = ants.AntColony(ants.baseline_strategy,
+                            ants.Hive(ants.make_hard_assault_plan()),
+                            ants.ant_types(), ants.dry_layout, (4, 9),
+                            headless=True, seed=1)
+    colony.play(turns)
+    saved = colony.snapshot()
+    results = []
+    for method, make in [('deepcopy', lambda: copy.deepcopy(colony)),
+                         ('clone', colony.clone),
+                         ('snapshot', colony.snapshot),
+                         ('restore', lambda: colony.restore(saved))]:
+        start = time.perf_counter()
+        for _ in range(copies):
+            make()
+        results.append((method, (time.perf_counter() - start) / copies * 1e6))
+    return results
+
+
+def bench_replay(games=20, difficulties=DIFFICULTIES):
+    """Compare playing baseline games of each of DIFFICULTIES again from
+    their seeds with reading the records of their replays, and with
+    rebuilding their last turn from their replays.
+
+    Returns a list of (difficulty, bytes per game, bytes per turn, play ms,
+    scan ms, rebuild ms), where the milliseconds are per game.
+    """
+    import replay
+    results = []
+    for difficulty in difficulties:
+        colonies = [ants.make_colony(make_args(difficulty, seed=seed),
+                                     ants.baseline_strategy, headless=True)
+                    for seed in range(games)]
+        recorded = [replay.record_game(colony) for colony in colonies]
+        size = sum(len(data) for _, data in recorded)
+        turns = sum(result.turns for result, _ in recorded)
+        start = time.perf_counter()
+        for seed in range(games):
+            ants.make_colony(make_args(difficulty, seed=seed),
+                             ants.baseline_strategy, headless=True).play()
+        played = time.perf_counter() - start
+        start = time.perf_counter()
+        for result, data in recorded:
+            for record in replay.Replay(data).records():
+                pass
+        scanned = time.perf_counter() - start
+        start = time.perf_counter()
+        for result, data in recorded:
+            replay.Replay(data).colony_at(result.turns)
+        rebuilt = time.perf_counter() - start
+        results.append((difficulty, size / games, size / turns,
+                        played / games * 1e3, scanned / games * 1e3,
+                        rebuilt / games * 1e3))
+    return results
+
+
+def bench_seek(turns=2000, intervals=(None, 128, 32, 8), seeks=50):
+    """Compare rebuilding random turns of an endless game of TURNS turns
+    from replays with a keyframe every turns in INTERVALS (None for only
+    the first).
+
+    Returns a list of (interval, bytes, milliseconds per seek).
+    """
+    import random
+    import replay
+    rng = random.Random(0)
+    targets = [rng.randrange(turns) for _ in range(seeks)]
+    results = []
+    for interval in intervals:
+        colony = ants.AntColony(ants.baseline_strategy,
+                                ants.Hive(ants.make_endless_assault_plan()),
+                                ants.ant_types(), ants.dry_layout, (4, 9),
+                                1000, headless=True, seed=0)
+        _, data = replay.record_game(colony, turns, interval or turns + 1)
+        recorded = replay.Replay(data)
+        start = time.perf_counter()
+        for turn in targets:
+            recorded.colony_at(turn)
+        results.append((interval, len(data),
+                        (time.perf_counter() - start) / seeks * 1e3))
+    return results
+
+
+def bench_archive(games=2000, difficulty='hard', seeks=200):
+    """Compare the archives of GAMES baseline games at DIFFICULTY made with
+    each compression, by their bytes per game and the milliseconds to open
+    one and rebuild a random turn of a random game from it.
+
+    Returns a list of (compression, bytes per game, seek ms), after a row
+    for the replays on their own, read from bytes.
+    """
+    import random
+    import replay
+    import tempfile
+    recorded = [replay.record_game(ants.make_colony(
+                    make_args(difficulty, seed=seed), ants.baseline_strategy,
+                    headless=True)) for seed in range(games)]
+    rng = random.Random(0)
+    targets = [(rng.randrange(games), rng.randrange(30)) for _ in range(seeks)]
+    start = time.perf_counter()
+    for seed, turn in targets:
+        replay.Replay(recorded[seed][1]).colony_at(turn)
+    results = [('replays', sum(len(data) for _, data in recorded) / games,
+                (time.perf_counter() - start) / seeks * 1e3)]
+    with tempfile.TemporaryDirectory() as directory:
+        for compression in replay.COMPRESSIONS:
+            path = os.path.join(directory, compression)
+            with replay.ArchiveWriter(path, compression) as writer:
+                for seed, (_, data) in enumerate(recorded):
+                    writer.add(seed, data)
+            start = time.perf_counter()
+            for seed, turn in targets:
+                with replay.ReplayArchive(path) as archive:
+                    archive.colony_at(seed, turn)
+            results.append((compression, os.path.getsize(path) / games,
+                            (time.perf_counter() - start) / seeks * 1e3))
+    return results
+
+
+#########
+# Suite #
+#########
+
+PLANS = ['test', 'easy', 'normal', 'hard', 'insane', 'endless']
+ENDLESS_TURNS = 200  # Endless games are stopped after this many turns
+TUNNELS = (1, 10, 100, 1000)
+LENGTHS = (10, 100, 1000)
+
+
+class Metric(object):
+    """A named measurement, taken several times, of a rate or a duration.
+
+    name -- identifies the measurement across runs, e.g. 'games/easy/dry'
+    unit -- what is measured, e.g. 'turns/s'
+    higher_is_better -- True for rates and False for durations
+    samples -- the value of each run
+    """
+
+    def __init__(self, name, unit, higher_is_better, samples=()):
+        self.name = name
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+        self.samples = list(samples)
+
+    @property
+    def median(self):
+        return statistics.median(self.samples)
+
+    @property
+    def mad(self):
+        """The median absolute deviation of the samples from their median."""
+        median = self.median
+        return statistics.median(abs(x - median) for x in self.samples)
+
+    def to_json(self):
+        return {'unit': self.unit, 'higher_is_better': self.higher_is_better,
+                'median': self.median, 'samples': self.samples}
+
+    @classmethod
+    def from_json(cls, name, data):
+        return cls(name, data['unit'], data['higher_is_better'], data['samples'])
+
+
+def game_rate(difficulty, water, games):
+    """Return the turns per second of GAMES seeded baseline games."""
+    def play(args):
+        colony = ants.make_colony(args, ants.baseline_strategy, headless=True)
+        return colony.play(ENDLESS_TURNS if difficulty == 'endless' else None).turns
+    turns, elapsed = time_games(play, difficulty, water, games)
+    return turns / elapsed
+
+
+def suite_games(games):
+    """Measure the turns per second of each plan on each layout.
+
+    Each suite function yields a tuple of Metrics and a function that
+    measures them once, returning a tuple of values in the same order.
+    """
+    for difficulty in PLANS:
+        for water in (False, True):
+            name = 'games/{0}/{1}'.format(difficulty, 'wet' if water else 'dry')
+            yield (Metric(name, 'turns/s', True),), \
+                lambda d=difficulty, w=water: (game_rate(d, w, games),)
+
+
+def bench_colony(length=1000):
+    """Return an empty colony with one tunnel of LENGTH places and no bees."""
+    return ants.AntColony(None, ants.Hive(ants.AssaultPlan()), ants.ant_types(),
+                          ants.dry_layout, (1, length), headless=True, seed=0)
+
+
+def action_rate(make_calls, calls):
+    """Return the calls per second of the CALLS functions that MAKE_CALLS
+    returns, which are set up before the clock starts.  Ants that act more
+    than once do no damage, so that their targets never expire.
+    """
+    functions = make_calls(calls)
+    start = time.perf_counter()
+    for function in functions:
+        function()
+    return calls / (time.perf_counter() - start)
+
+
+def thrower_calls(calls):
+    """A ThrowerAnt throwing at a bee three places away."""
+    colony = bench_colony()
+    thrower = ants.ThrowerAnt()
+    thrower.damage = 0
+    colony.places['tunnel_0_0'].add_insect(thrower)
+    colony.places['tunnel_0_3'].add_insect(ants.Bee(3))
+    return [lambda: thrower.action(colony)] * calls
+
+
+def fire_calls(calls):
+    """A FireAnt expiring in a place with two bees, in CALLS places."""
+    colony = bench_colony(calls)
+    fires = []
+    for place in colony.place_list[1:]:
+        fires.append(ants.FireAnt())
+        place.add_insect(fires[-1])
+        place.add_insect(ants.Bee(10))
+        place.add_insect(ants.Bee(10))
+    return [lambda fire=fire: fire.reduce_armor(fire.armor) for fire in fires]
+
+
+def ninja_calls(calls):
+    """A NinjaAnt striking the three bees in its place."""
+    colony = bench_colony()
+    ninja = ants.NinjaAnt()
+    ninja.damage = 0
+    place = colony.places['tunnel_0_1']
+    place.add_insect(ninja)
+    for _ in range(3):
+        place.add_insect(ants.Bee(3))
+    return [lambda: ninja.action(colony)] * calls
+
+
+def tank_calls(calls):
+    """A TankAnt holding a ThrowerAnt, with two bees in its place."""
+    colony = bench_colony()
+    tank, thrower = ants.TankAnt(), ants.ThrowerAnt()
+    tank.damage = thrower.damage = 0
+    place = colony.places['tunnel_0_1']
+    place.add_insect(tank)
+    place.add_insect(thrower)
+    for _ in range(2):
+        place.add_insect(ants.Bee(3))
+    return [lambda: tank.action(colony)] * calls
+
+
+def queen_calls(calls):
+    """A QueenAnt throwing at a bee, with eight ants behind her, after her
+    first action has buffed them.
+    """
+    colony = bench_colony(20)
+    for i in range(8):
+        colony.places['tunnel_0_{0}'.format(i)].add_insect(ants.ThrowerAnt())
+    queen = ants.QueenAnt(colony)
+    queen.damage = 0
+    colony.places['tunnel_0_8'].add_insect(queen)
+    colony.places['tunnel_0_12'].add_insect(ants.Bee(3))
+    queen.action(colony)
+    return [lambda: queen.action(colony)] * calls
+
+
+def move_calls(calls):
+    """A Bee moving between two places that hold other bees."""
+    colony = bench_colony()
+    here, there = colony.places['tunnel_0_5'], colony.places['tunnel_0_4']
+    for place in (here, there):
+        place.add_insect(ants.Bee(3))
+    bee = ants.Bee(3)
+    here.add_insect(bee)
+    return [lambda: bee.move_to(there), lambda: bee.move_to(here)] * (calls // 2)
+
+
+ACTIONS = [('ThrowerAnt.action', thrower_calls),
+           ('FireAnt.reduce_armor', fire_calls),
+           ('NinjaAnt.action', ninja_calls),
+           ('TankAnt.action', tank_calls),
+           ('QueenAnt.action', queen_calls),
+           ('Bee.move_to', move_calls)]
+
+
+def suite_actions(calls):
+    """Measure the calls per second of single actions."""
+    for name, make_calls in ACTIONS:
+        yield (Metric('actions/' + name, 'calls/s', True),), \
+            lambda make_calls=make_calls: (action_rate(make_calls, calls),)
+
+
+def board_rates(tunnels, length, turns):
+    """Return the seconds to set up a board of TUNNELS by LENGTH places with
+    a ThrowerAnt at the back of each tunnel and a wave of one bee per
+    tunnel, and the turns per second of playing it for TURNS turns with a
+    strategy that never moves.
+    """
+    start = time.perf_counter()
+    plan = ants.LazyAssaultPlan().add_wave(ants.Bee, 3, 0, tunnels)
+    colony = ants.AntColony(lambda colony: None, ants.Hive(plan),
+                            ants.ant_types(), ants.dry_layout,
+                            (tunnels, length), headless=True, seed=0)
+    for tunnel in colony.tunnels:
+        tunnel.places[0].add_insect(ants.ThrowerAnt())
+    setup = time.perf_counter() - start
+    start = time.perf_counter()
+    colony.play(turns)
+    return setup, turns / (time.perf_counter() - start)
+
+
+def suite_boards(turns, largest):
+    """Measure the setup time and turns per second of each board size up to
+    LARGEST places in each dimension.
+    """
+    for tunnels in TUNNELS:
+        for length in LENGTHS:
+            if tunnels > largest or length > largest:
+                continue
+            name = 'boards/{0}x{1}'.format(tunnels, length)
+            setup = Metric(name + '/setup', 's', False)
+            rate = Metric(name + '/turns', 'turns/s', True)
+            yield (setup, rate), \
+                lambda t=tunnels, l=length: board_rates(t, l, turns)
+
+
+def run_suite(repeat=3, games=20, calls=10000, turns=20, largest=1000,
+              log=None):
+    """Run the benchmark suite REPEAT times and return its Metrics.
+
+    games -- the number of games per plan and layout
+    calls -- the number of calls of each action
+    turns -- the number of turns played on each board
+    largest -- the most places in either dimension of a board
+    log -- called with each Metric once it is measured
+    """
+    benchmarks = list(suite_games(games)) + list(suite_actions(calls)) + \
+        list(suite_boards(turns, largest))
+    metrics = []
+    for measured, measure in benchmarks:
+        for _ in range(repeat):
+            for metric, value in zip(measured, measure()):
+                metric.samples.append(value)
+        for metric in measured:
+            metrics.append(metric)
+            if log is not None:
+                log(metric)
+    return metrics
+
+
+def dump_results(metrics, path, **extra):
+    """Write METRICS, and any EXTRA entries, to the JSON file at PATH."""
+    data = {'python': platform.python_version(),
+            'machine': platform.machine(),
+            'metrics': {m.name: m.to_json() for m in metrics}}
+    data.update(extra)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(path):
+    """Read the Metrics written to the JSON file at PATH by dump_results."""
+    with open(path) as f:
+        data = json.load(f)
+    return [Metric.from_json(name, m) for name, m in data['metrics'].items()]
+
+
+def speedup(metric, baseline):
+    """Return how many times better METRIC is than BASELINE, by median."""
+    if metric.higher_is_better:
+        return metric.median / baseline.median
+    return baseline.median / metric.median
+
+
+def compare_results(metrics, baselines):
+    """Return a report comparing METRICS with the BASELINES of the same
+    names, in which a speedup above 1 means METRICS did better.
+    """
+    baselines = {b.name: b for b in baselines}
+    lines = ['{0:<36} {1:>14} {2:>14} {3:>8}'.format(
+        'benchmark', 'baseline', 'current', 'speedup')]
+    for metric in metrics:
+        baseline = baselines.get(metric.name)
+        if baseline is None:
+            continue
+        lines.append('{0:<36} {1:>14.4g} {2:>14.4g} {3:>7.2f}x'.format(
+            metric.name, baseline.median, metric.median,
+            speedup(metric, baseline)))
+    return '\n'.join(lines)
+
+
+########
+# Gate #
+########
+
+GATE_PLANS = ['easy', 'normal', 'hard', 'insane', 'endless']
+GATE_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             'benchmarks_baseline.json')
+
+
+def gate_games(difficulty, water, games):
+    """Return the colonies of the gate's workload for DIFFICULTY, seeded
+    from 0, played by baseline_strategy.
+    """
+    return [ants.make_colony(make_args(difficulty, water, seed),
+                             ants.baseline_strategy, headless=True)
+            for seed in range(games)]
+
+
+def play_gate_games(colonies, difficulty):
+    """Play COLONIES to the end and return the total number of turns."""
+    max_turns = ENDLESS_TURNS if difficulty == 'endless' else None
+    return sum(colony.play(max_turns).turns for colony in colonies)
+
+
+class ReferenceObject(object):
+    """An object for reference_rate to create and call."""
+    __slots__ = ('key', 'items')
+
+    def __init__(self, key):
+        self.key = key
+        self.items = []
+
+    def add(self, item):
+        self.items.append(item)
+        return len(self.items)
+
+
+def reference_rate(iterations=20000):
+    """Return the number of times per second of process time that this
+    machine runs a fixed loop of object creation, method calls and dict
+    and list updates that does not depend on the game engine.
+    """
+    start = time.process_time()
+    table, total = {}, 0
+    for i in range(iterations):
+        value = ReferenceObject(i)
+        value.add(i)
+        table[i % 97] = value
+        total += value.add(i)
+        if i % 3:
+            del value.items[:]
+    return 1 / (time.process_time() - start)
+
+
+def run_gate(repeat=7, games=20, log=None):
+    """Play the gate's workload REPEAT times and return its Metrics and the
+    number of turns it took for each plan and layout.
+
+    Speeds are measured in turns per run of the reference loop, by dividing
+    the turns per second of process time by reference_rate, measured
+    before and after each run.  Both measures vary less than wall time
+    when the machine is busy or changes its clock speed.  Colonies are
+    created before the clock starts.  Peak memory is measured by playing
+    the workload once more with tracemalloc.
+    """
+    metrics, turns = [], {}
+    for difficulty in GATE_PLANS:
+        for water in (False, True):
+            name = 'gate/{0}/{1}'.format(difficulty, 'wet' if water else 'dry')
+            speed = Metric(name + '/speed', 'turns/ref', True)
+            for _ in range(repeat):
+                colonies = gate_games(difficulty, water, games)
+                reference = reference_rate()
+                start = time.process_time()
+                played = play_gate_games(colonies, difficulty)
+                rate = played / (time.process_time() - start)
+                reference = (reference + reference_rate()) / 2
+                speed.samples.append(rate / reference)
+            tracemalloc.start()
+            try:
+                play_gate_games(gate_games(difficulty, water, games), difficulty)
+                peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            finally:
+                tracemalloc.stop()
+            memory = Metric(name + '/memory', 'MB', False, [peak])
+            turns[name] = played
+            for metric in (speed, memory):
+                metrics.append(metric)
+                if log is not None:
+                    log(metric)
+    return metrics, turns
+
+
+def regressed(metric, baseline, threshold, spread=3):
+    """Return whether METRIC is worse than BASELINE by more than THRESHOLD,
+    as a fraction of the baseline median, and by more than SPREAD times
+    the larger of their median absolute deviations.
+
+    >>> base = Metric('speed', 'turns/s', True, [100, 102, 98, 101, 99])
+    >>> regressed(Metric('speed', 'turns/s', True, [95, 96, 94]), base, 0.1)
+    False
+    >>> regressed(Metric('speed', 'turns/s', True, [80, 81, 79]), base, 0.1)
+    True
+    >>> regressed(Metric('speed', 'turns/s', True, [80, 120, 60]), base, 0.1)
+    False
+    >>> memory = Metric('memory', 'MB', False, [10.0])
+    >>> regressed(Metric('memory', 'MB', False, [11.5]), memory, 0.1)
+    True
+    """
+    loss = baseline.median - metric.median
+    if not metric.higher_is_better:
+        loss = -loss
+    return loss > threshold * baseline.median and \
+        loss > spread * max(metric.mad, baseline.mad)
+
+
+def gate_report(metrics, baselines, speed_threshold, memory_threshold):
+    """Compare METRICS with the BASELINES of the same names and return a
+    report and the names of the metrics that regressed.
+    """
+    baselines = {b.name: b for b in baselines}
+    lines = ['{0:<28} {1:>20} {2:>20} {3:>8}  {4}'.format(
+        'benchmark', 'baseline (MAD)', 'current (MAD)', 'change', 'status')]
+    failures = []
+    for metric in metrics:
+        baseline = baselines.get(metric.name)
+        if baseline is None:
+            lines.append('{0:<28} {1:>20}'.format(metric.name, 'no baseline'))
+            continue
+        threshold = speed_threshold if metric.higher_is_better else memory_threshold
+        if regressed(metric, baseline, threshold):
+            status = 'REGRESSED'
+            failures.append(metric.name)
+        elif speedup(metric, baseline) > 1 + threshold:
+            status = 'improved'
+        else:
+            status = 'ok'
+        lines.append('{0:<28} {1:>20} {2:>20} {3:>+7.1f}%  {4}'.format(
+            metric.name,
+            '{0:.4g} ({1:.2g})'.format(baseline.median, baseline.mad),
+            '{0:.4g} ({1:.2g})'.format(metric.median, metric.mad),
+            100 * (metric.median / baseline.median - 1), status))
+    return '\n'.join(lines), failures
+
+
+def run_gate_command(args):
+    """Run the regression gate for the parsed command-line ARGS."""
+    log = lambda m: print(format_metric(m)) if args.update_baseline else None
+    metrics, turns = run_gate(args.repeat, args.games or 20, log)
+    if args.update_baseline:
+        dump_results(metrics, args.baseline, turns=turns)
+        print('Wrote the baseline to ' + args.baseline)
+        return
+    if not os.path.exists(args.baseline):
+        print('No baseline at {0}; record one with --update-baseline'.format(
+            args.baseline))
+        sys.exit(2)
+    with open(args.baseline) as f:
+        recorded = json.load(f).get('turns', {})
+    report, failures = gate_report(metrics, load_results(args.baseline),
+                                   args.threshold, args.memory_threshold)
+    print(report)
+    changed = [name for name in turns if recorded.get(name) not in (None, turns[name])]
+    if changed:
+        print()
+        print('The workload now plays a different number of turns in ' +
+              ', '.join(changed) + ', so the rules or strategy have changed.')
+    print()
+    if failures:
+        print('FAILED: {0} of {1} benchmarks regressed past the threshold: {2}'.format(
+            len(failures), len(metrics), ', '.join(failures)))
+        sys.exit(1)
+    print('PASSED: no benchmark regressed past the threshold')
+
+
+def format_metric(metric):
+    return '{0:<36} {1:>14.4g} {2}'.format(metric.name, metric.median,
+                                           metric.unit)
+
+
+def run_tables(args):
+    """Print the tables of the benchmarks that compare implementations."""
+    print('{0:<8} {1:>14} {2:>14} {3:>8}'.format(
+        'plan', 'console t/s', 'headless t/s', 'speedup'))
+    for difficulty, console, headless in bench_headless(args.games, args.water):
+        print('{0:<8} {1:>14.0f} {2:>14.0f} {3:>7.2f}x'.format(
+            difficulty, console, headless, headless / console))
+
+    scan, registry = bench_registries()
+    print()
+    print('{0:<8} {1:>14} {2:>14} {3:>8}'.format(
+        '100x100', 'scan q/s', 'registry q/s', 'speedup'))
+    print('{0:<8} {1:>14.0f} {2:>14.0f} {3:>7.2f}x'.format(
+        'ants+bees', scan, registry, registry / scan))
+
+    print()
+    print('{0:<10} {1:>14}'.format('object', 'bytes each'))
+    for kind, size in bench_memory():
+        print('{0:<10} {1:>14.1f}'.format(kind, size))
+
+    print()
+    print('{0:<16} {1:>10} {2:>10}'.format('200000 bees', 'setup s', 'peak MB'))
+    for kind, elapsed, peak in bench_lazy_plan():
+        print('{0:<16} {1:>10.3f} {2:>10.1f}'.format(kind, elapsed, peak))
+
+    print()
+    print('{0:<16} {1:>10} {2:>10}'.format('endless turns', 't/s', 'traced MB'))
+    for turns, rate, size in bench_endless():
+        print('{0:<16} {1:>10.0f} {2:>10.2f}'.format(turns, rate, size))
+
+    print()
+    print('{0:<16} {1:>10}'.format('sparse waves', 't/s'))
+    for kind, rate in bench_fast_forward():
+        print('{0:<16} {1:>10.0f}'.format(kind, rate))
+
+    print()
+    print('{0:<8} {1:>12} {2:>12} {3:>10} {4:>10} {5:>10}'.format(
+        'replays', 'bytes/game', 'bytes/turn', 'play ms', 'scan ms',
+        'rebuild ms'))
+    for row in bench_replay():
+        print('{0:<8} {1:>12.0f} {2:>12.1f} {3:>10.2f} {4:>10.2f} '
+              '{5:>10.2f}'.format(*row))
+
+    print()
+    print('{0:<16} {1:>10} {2:>10}'.format('keyframes', 'bytes', 'seek ms'))
+    for interval, size, millis in bench_seek():
+        print('{0:<16} {1:>10} {2:>10.2f}'.format(
+            'first only' if interval is None else 'every {0}'.format(interval),
+            size, millis))
+
+    print()
+    print('{0:<16} {1:>10} {2:>10}'.format('archives', 'bytes/game',
+                                           'seek ms'))
+    for compression, size, millis in bench_archive():
+        print('{0:<16} {1:>10.0f} {2:>10.2f}'.format(compression, size, millis))
+
+    print()
+    print('{0:<16} {1:>10} {2:>10}'.format('4x9 copy', 'us each', 'speedup'))
+    copies = bench_clone()
+    deepcopy = copies[0][1]
+    for method, micros in copies:
+        print('{0:<16} {1:>10.1f} {2:>9.2f}x'.format(method, micros,
+                                                     deepcopy / micros))
+    clone = dict(copies)['clone']
+    print('clone target: under {0:.0f} us, {1}'.format(
+        CLONE_TARGET, 'met' if clone < CLONE_TARGET else 'missed'))
+
+    engines = bench_engines()
+    if engines:
+        print()
+        print('{0:<8} {1:>14} {2:>14} {3:>8}'.format(
+            'tunnels', 'object t/s', 'array t/s', 'speedup'))
+        for n, objects, arrays in engines:
+            print('{0:<8} {1:>14.1f} {2:>14.1f} {3:>7.2f}x'.format(
+                n, objects, arrays, arrays / objects))
+
+    batches = bench_batch()
+    if batches:
+        print()
+        print('{0:<8} {1:>14} {2:>14} {3:>8}'.format(
+            'games', 'object t/s', 'batch t/s', 'speedup'))
+        for n, objects, batch in batches:
+            print('{0:<8} {1:>14.1f} {2:>14.1f} {3:>7.2f}x'.format(
+                n, objects, batch, batch / objects))
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Benchmark the game engine")
+    parser.add_argument('-n', '--games', type=int, default=None,
+                        help='number of games per difficulty (default 200, '
+                             'or 20 per plan and layout with --suite)')
+    parser.add_argument('-w', '--water', action='store_true',
+                        help='use the layout with water')
+    parser.add_argument('--suite', action='store_true',
+                        help='run the benchmark suite instead of the tables')
+    parser.add_argument('--quick', action='store_true',
+                        help='run a smaller suite, with boards of up to 100x100')
+    parser.add_argument('--repeat', type=int, default=None,
+                        help='number of times to run each benchmark '
+                             '(default 3, or 7 with --gate)')
+    parser.add_argument('--json', type=str, metavar='PATH',
+                        help='write the suite results to PATH')
+    parser.add_argument('--compare', type=str, metavar='PATH',
+                        help='compare the suite results with those in PATH')
+    parser.add_argument('--gate', action='store_true',
+                        help='check the seeded workload against the baseline')
+    parser.add_argument('--baseline', type=str, default=GATE_BASELINE,
+                        metavar='PATH', help='the baseline file of the gate')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='record the baseline of the gate instead of checking it')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='fraction of turns/s that the gate allows to be lost')
+    parser.add_argument('--memory-threshold', type=float, default=0.10,
+                        help='fraction of peak memory that the gate allows to be added')
+    args = parser.parse_args(args)
+
+    if args.gate:
+        args.repeat = args.repeat or 7
+        run_gate_command(args)
+        return
+    if not args.suite:
+        args.games = args.games or 200
+        run_tables(args)
+        return
+    if args.quick:
+        settings = dict(games=args.games or 5, calls=2000, largest=100)
+    else:
+        settings = dict(games=args.games or 20)
+    log = None if args.compare else lambda m: print(format_metric(m))
+    metrics = run_suite(args.repeat or 3, log=log, **settings)
+    if args.json:
+        dump_results(metrics, args.json)
+    if args.compare:
+        print(compare_results(metrics, load_results(args.compare)))
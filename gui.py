@@ -1,5 +1,4 @@
 import ants
-import utils
 import state
 import json
 import distutils.core
@@ -66,9 +65,10 @@ class GUI:
         self.beeLocations = {}
         self.throwAt = {}
 
-    def makeHooks(self):
-        ants.Insect.reduce_armor = utils.class_method_wrapper(ants.Insect.reduce_armor, post=dead_insects)
-        ants.AntColony.remove_ant = utils.class_method_wrapper(ants.AntColony.remove_ant, post=removed_ant)
+    def makeHooks(self, colony):
+        colony.events.subscribe(ants.InsectDied, dead_insects)
+        colony.events.subscribe(ants.AntRemoved, removed_ant)
+        colony.events.subscribe(ants.LeafThrown, thrown_leaf)
     
 
     def newGameThread(self):
@@ -93,6 +93,7 @@ class GUI:
     def initialize_colony_graphics(self, colony):
 
         self.colony = colony
+        self.makeHooks(colony)
         self.ant_type_selected = -1
         self.saveState("strategyTime", STRATEGY_SECONDS)
         self.saveState("food", self.colony.food)
@@ -140,16 +141,7 @@ class GUI:
             self._update_control_panel(colony)
             sleep(0.25) 
             elapsed += 0.25
-        #Check to see if we need to throw any leaves at the end of the turn
-        self.throwLeaves(colony)
-
-    def throwLeaves(self, colony):
-        has_ant = lambda a: hasattr(a, 'ant') and a.ant
-        for ant in colony.ants + [a.ant for a in colony.ants if has_ant(a)]:
-            if ant.name in LEAF_FILES:
-                bee = ant.nearest_bee(colony.hive)
-                if bee is not None:
-                    self.throwAt[self.insectToId[ant]] = self.beeToId[bee] 
+        #Leaves thrown this turn are logged by thrown_leaf
         self.saveState("throwAt", self.throwAt)
 
     
@@ -288,23 +280,29 @@ class HttpHandler(http.server.SimpleHTTPRequestHandler):
             response = json.dumps(response)
             self.wfile.write(response.encode('ascii'))
 
-def dead_insects(self, rv, *args):
-    if self.armor <= 0 and self:
-        print('{0} ran out of armor and expired'.format(self))
-        if self in gui.insectToId:
-            gui.deadinsects.append(gui.insectToId[self])
-            gui.saveState("deadinsects", gui.deadinsects)
-        elif self in gui.beeToId:
-            gui.deadbees.append(gui.beeToId[self])
-            gui.saveState("deadbees", gui.deadbees)
-def removed_ant(self, rv, *args):
-    r = gui.get_place_row(args[0])
-    c = gui.get_place_column(args[0])
+def dead_insects(event):
+    insect = event.insect
+    print('{0} ran out of armor and expired'.format(insect))
+    if insect in gui.insectToId:
+        gui.deadinsects.append(gui.insectToId[insect])
+        gui.saveState("deadinsects", gui.deadinsects)
+    elif insect in gui.beeToId:
+        gui.deadbees.append(gui.beeToId[insect])
+        gui.saveState("deadbees", gui.deadbees)
+def removed_ant(event):
+    r = gui.get_place_row(event.place.name)
+    c = gui.get_place_column(event.place.name)
     if c in gui.places[r]:
         if "id" in gui.places[r][c]["insects"]:
             gui.deadinsects.append(gui.places[r][c]["insects"]["id"])
             gui.saveState("deadinsects", gui.deadinsects)
 
+def thrown_leaf(event):
+    ant, bee = event
+    if ant.name in LEAF_FILES and ant in gui.insectToId and bee in gui.beeToId:
+        gui.throwAt[gui.insectToId[ant]] = gui.beeToId[bee]
+        gui.saveState("throwAt", gui.throwAt)
+
 def update():
     request = urllib.request.Request("https://api.github.com/repos/colinschoen/Ants-Web-Viewer/releases/latest")
     data = None
@@ -378,7 +376,6 @@ def run(*args):
     PORT = 8000
     global gui
     gui = GUI()
-    gui.makeHooks()
     gui.args = args
     #Basic HTTP Handler
     #Handler = http.server.SimpleHTTPRequestHandler
@@ -0,0 +1,1306 @@
+"""The replay module records games of Ants Vs. SomeBees as compact binary
+logs of their events, and rebuilds the state of a recorded game at any turn
+without running its strategies.
+
+A ReplayRecorder follows the events of one colony on its EventBus and writes
+each as a record: an opcode followed by its operands, which are varints.
+Places are named by their index in the colony and insects by ids given in
+the order they first appear.  Classes, layouts and status effects are named
+by name_of, and read back only from REGISTRY, to which register adds custom
+ones.  Deaths are not recorded, since they follow from damage that leaves
+no armor.  Every keyframe_interval turns, the recorder also writes a
+keyframe holding the whole state of the colony, so that a Replay rebuilds a
+turn from the keyframe before it rather than from the start of the game.
+
+A replay reproduces the type, armor and place of each insect, the status
+effects of the bees, the food, and the time, as AntColony.state_hash covers
+them, and also the state of individual ants: the damage a QueenAnt has
+doubled, which ants she has buffed, a HungryAnt's digestion, and the ants
+her tunnel has logged for her.  The recorder compares the ants with what it
+last wrote at the start of each turn, and records those that changed.
+Keyframes also hold the waves left in the assault plan and the order of the
+active bees, so that a rebuilt colony can be played on.
+
+Many replays can be kept in one archive, which ArchiveWriter writes and
+ReplayArchive reads through mmap: each game's records are compressed in
+chunks, and indexes of games and keyframes let one turn of one game be
+rebuilt without decompressing the rest.
+
+Run with `python3 replay.py game.replay -d hard --seed 1 --record` to record
+a game, `python3 replay.py game.replay --turn 12` to show one of its turns,
+and `python3 replay.py --check 20` to check replays of 20 games; add
+`-s reckless` to check them against a strategy that tries illegal deploys.  Archives
+are written by `python3 batch.py --archive games.archive` and read with
+`python3 replay.py games.archive --game 7 --turn 12`.
+"""
+
+import bisect
+import struct
+
+import ants
+from ucb import main
+
+##########
+# Format #
+##########
+
+MAGIC = b'AVSR'
+VERSION = 2
+KEYFRAME_INTERVAL = 32  # Turns between keyframes
+FRACTION = 256  # Floats that are multiples of 1 / FRACTION take a varint
+
+# Opcodes, and the operands of each: v for a varint, z for a signed varint,
+# n for a number (see write_number), and b for a block of bytes
+(TURN, DEPLOY, REMOVE, SPAWN, ADVANCE, MOVE, DAMAGE, EFFECT, COUNT, KEYFRAME,
+ ANT, QUEEN) = range(12)
+OPCODES = ['turn', 'deploy', 'remove', 'spawn', 'advance', 'move', 'damage',
+           'effect', 'count', 'keyframe', 'ant', 'queen']
+OPERANDS = ['vz', 'vv', 'v', 'vvn', 'v', 'vv', 'vn', 'vvv', 'v', 'b',
+            'vnvz', 'b']
+
+WINNERS = [None, 'ants', 'bees']
+
+def write_varint(out, n):
+    """Append the unsigned integer N to the bytearray OUT, seven bits to a
+    byte, with the high bit set on all bytes but the last.
+
+    >>> out = bytearray()
+    >>> write_varint(out, 5); write_varint(out, 300)
+    >>> bytes(out)
+    b'\\x05\\xac\\x02'
+    >>> read_varint(out, 1)
+    (300, 3)
+    """
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+def read_varint(data, pos):
+    """Return the varint at POS in DATA and the position after it."""
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+def zigzag(n):
+    """Map the integer N to an unsigned integer, small if N is near zero.
+
+    >>> [zigzag(n) for n in (0, -1, 1, -2, 2)]
+    [0, 1, 2, 3, 4]
+    >>> [unzigzag(zigzag(n)) for n in (0, -1, 1, -200, 200)]
+    [0, -1, 1, -200, 200]
+    """
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+def unzigzag(n):
+    """Invert zigzag."""
+    return -((n + 1) >> 1) if n & 1 else n >> 1
+
+def write_number(out, x):
+    """Append the armor or damage X to OUT.  Ints and floats that are
+    multiples of 1 / FRACTION, such as a Hornet's damage, take one varint,
+    whose low two bits tell them apart; other floats take eight more bytes.
+
+    >>> out = bytearray()
+    >>> for x in (3, 0.25, 2.0, 8 / 3):
+    ...     write_number(out, x)
+    >>> len(out)
+    14
+    >>> pos, numbers = 0, []
+    >>> while pos < len(out):
+    ...     x, pos = read_number(out, pos)
+    ...     numbers.append(x)
+    >>> numbers == [3, 0.25, 2.0, 8 / 3], [type(x).__name__ for x in numbers]
+    (True, ['int', 'float', 'float', 'float'])
+    """
+    if type(x) is int:
+        write_varint(out, zigzag(x) << 2)
+        return
+    scaled = x * FRACTION
+    if scaled.is_integer():
+        write_varint(out, zigzag(int(scaled)) << 2 | 1)
+    else:
+        out.append(2)
+        out += struct.pack('<d', x)
+
+def read_number(data, pos):
+    """Return the number at POS in DATA and the position after it."""
+    code, pos = read_varint(data, pos)
+    tag = code & 3
+    if tag == 0:
+        return unzigzag(code >> 2), pos
+    if tag == 1:
+        return unzigzag(code >> 2) / FRACTION, pos
+    return struct.unpack_from('<d', data, pos)[0], pos + 8
+
+def write_string(out, text):
+    """Append TEXT to OUT as its UTF-8 length and bytes."""
+    encoded = text.encode()
+    write_varint(out, len(encoded))
+    out += encoded
+
+def read_string(data, pos):
+    """Return the string at POS in DATA and the position after it."""
+    size, pos = read_varint(data, pos)
+    return bytes(data[pos:pos + size]).decode(), pos + size
+
+def write_record(out, opcode, *operands):
+    """Append a record of OPCODE and its OPERANDS to OUT."""
+    out.append(opcode)
+    for kind, operand in zip(OPERANDS[opcode], operands):
+        if kind == 'v':
+            write_varint(out, operand)
+        elif kind == 'z':
+            write_varint(out, zigzag(operand))
+        elif kind == 'n':
+            write_number(out, operand)
+        else:
+            write_varint(out, len(operand))
+            out += operand
+
+def read_record(data, pos):
+    """Return the opcode and operands of the record at POS in DATA and the
+    position after it.  A block operand is returned as its position.
+    """
+    opcode = data[pos]
+    pos += 1
+    operands = []
+    for kind in OPERANDS[opcode]:
+        if kind == 'v':
+            operand = data[pos]
+            if operand < 0x80:  # Most operands take one byte
+                pos += 1
+            else:
+                operand, pos = read_varint(data, pos)
+        elif kind == 'z':
+            operand, pos = read_varint(data, pos)
+            operand = unzigzag(operand)
+        elif kind == 'n':
+            operand, pos = read_number(data, pos)
+        else:
+            size, pos = read_varint(data, pos)
+            operand, pos = pos, pos + size
+        operands.append(operand)
+    return opcode, operands, pos
+
+def name_of(value):
+    """Return the name that resolve finds VALUE, a class or function, by."""
+    return value.__module__ + ':' + value.__qualname__
+
+REGISTRY = {}  # The classes and functions that replays may name, by name
+
+def register(value):
+    """Let replays name VALUE, a class or function such as a custom layout
+    or Bee, and return it, so that register can be used as a decorator.
+    """
+    REGISTRY[name_of(value)] = value
+    return value
+
+def resolve(name):
+    """Return the class or function in REGISTRY that NAME, returned by
+    name_of, names.  Replays are read from files, so no other name is
+    imported or called.
+
+    >>> resolve('ants:Wasp') is ants.Wasp
+    True
+    >>> resolve('os:system')
+    Traceback (most recent call last):
+        ...
+    ValueError: unknown name in replay: 'os:system'
+    """
+    value = REGISTRY.get(name)
+    if value is None:
+        raise ValueError('unknown name in replay: {0!r}'.format(name))
+    return value
+
+def effect_of(gate):
+    """Return the status effect, such as ants.make_slow, that made GATE."""
+    return resolve(gate.__module__ + ':' + gate.__qualname__.split('.')[0])
+
+def bee_types():
+    """Return Bee and all of its subclasses."""
+    all_bee_types = new_types = [ants.Bee]
+    while new_types:
+        new_types = [t for c in new_types for t in c.__subclasses__()]
+        all_bee_types = all_bee_types + new_types
+    return all_bee_types
+
+for value in ants.ant_types() + bee_types() + [
+        ants.dry_layout, ants.wet_layout, ants.make_slow, ants.make_stun]:
+    register(value)
+
+def all_ants(colony):
+    """Return the ants of COLONY, including those inside containers."""
+    result = []
+    for ant in colony.ants:
+        result.append(ant)
+        if ant.container and ant.ant is not None:
+            result.append(ant.ant)
+    return result
+
+def ant_state(ant):
+    """Return the damage, buffed flag and digestion of ANT."""
+    return ant.damage, ant.buffed, getattr(ant, 'digesting', 0)
+
+def set_ant_state(ant, damage, buffed, digesting):
+    """Give ANT the state returned by ant_state."""
+    if ant.damage != damage:
+        ant.damage = damage
+    if ant.buffed != buffed:
+        ant.buffed = buffed
+    if digesting != getattr(ant, 'digesting', 0):
+        ant.digesting = digesting
+
+def watched_tunnel(colony):
+    """Return the Tunnel that the true queen of COLONY watches, or None."""
+    queen = colony.true_queen
+    return queen.watching if queen is not None else None
+
+def write_queen(out, state):
+    """Append the queen STATE returned by ReplayRecorder.queen_state to OUT."""
+    if state is None:
+        write_varint(out, 0)
+        return
+    write_varint(out, len(state) + 1)
+    for ant_id in state:
+        write_varint(out, ant_id)
+
+def read_queen(data, pos):
+    """Return the queen state at POS in DATA and the position after it."""
+    count, pos = read_varint(data, pos)
+    if count == 0:
+        return None, pos
+    state = []
+    for _ in range(count - 1):
+        ant_id, pos = read_varint(data, pos)
+        state.append(ant_id)
+    return state, pos
+
+def set_queen_state(colony, insects, state):
+    """Make the true queen of COLONY watch her tunnel, with the ants whose
+    ids in INSECTS are listed by STATE logged, or watch none if STATE is None.
+    """
+    queen = colony.true_queen
+    if queen.watching is not None:
+        queen.watching.arrivals = None
+    if state is None:
+        queen.watching = None
+    else:
+        queen.watching = tunnel = queen.place.tunnel
+        tunnel.arrivals = [insects[ant_id] for ant_id in state]
+
+
+#############
+# Recording #
+#############
+
+class ReplayRecorder(object):
+    """Records the game played by an AntColony from its current state on.
+
+    The recorder subscribes to the colony's events when it is created, and
+    stops when finish returns the replay.  Copies of the colony, such as
+    those that a SearchStrategy plays rollouts on, have buses of their own.
+    """
+
+    def __init__(self, colony, keyframe_interval=KEYFRAME_INTERVAL):
+        self.colony = colony
+        self.keyframe_interval = keyframe_interval
+        self.out = bytearray(MAGIC)
+        self.ids = {}         # The id of each living insect
+        self.next_id = 0
+        self.type_ids = {}    # The index of each class and effect in names
+        self.names = []
+        self.keyframes = []   # The (time, offset) of each keyframe
+        self.states = {}      # The ant_state of each ant, as last recorded
+        self.queen = None     # The queen_state, as last recorded
+        self.time, self.food = colony.time, colony.food
+        dimensions = colony.dimensions
+        for n in (VERSION, dimensions[0], dimensions[1], keyframe_interval):
+            write_varint(self.out, n)
+        layout = name_of(colony.create_places)
+        resolve(layout)  # Replays can only name what is registered
+        write_string(self.out, layout)
+        self.keyframe()
+        self.handlers = [(ants.TurnStarted, self.turn_started),
+                         (ants.AntDeployed, self.ant_deployed),
+                         (ants.AntRemoved, self.ant_removed),
+                         (ants.BeeMoved, self.bee_moved),
+                         (ants.InsectDamaged, self.insect_damaged),
+                         (ants.InsectDied, self.insect_died),
+                         (ants.EffectApplied, self.effect_applied),
+                         (ants.EffectsCounted, self.effects_counted)]
+        for event_type, handler in self.handlers:
+            colony.events.subscribe(event_type, handler)
+
+    def type_id(self, value):
+        """Return the index of VALUE, a class or status effect, in names."""
+        index = self.type_ids.get(value)
+        if index is None:
+            name = name_of(value)
+            resolve(name)  # Replays can only name what is registered
+            index = self.type_ids[value] = len(self.names)
+            self.names.append(name)
+        return index
+
+    def new_id(self, insect):
+        """Give INSECT the next id and return it."""
+        insect_id = self.ids[insect] = self.next_id
+        self.next_id += 1
+        return insect_id
+
+    def turn(self, time, food):
+        """Record the TIME and FOOD of the colony, if they changed."""
+        if time != self.time or food != self.food:
+            write_record(self.out, TURN, time - self.time, food - self.food)
+            self.time, self.food = time, food
+
+    def keyframe(self):
+        """Record the whole state of the colony."""
+        colony, ids = self.colony, self.ids
+        insects = []
+        for place in colony.place_list:
+            ant = place.ant
+            if ant is not None:
+                insects.append(ant)
+                if ant.container and ant.ant is not None:
+                    insects.append(ant.ant)
+            insects.extend(place.bees)
+        for insect in insects:
+            if insect not in ids:
+                self.new_id(insect)
+        block = bytearray()
+        queen = ids.get(colony.true_queen, -1) + 1
+        for n in (colony.time, zigzag(colony.food), colony.food_spent,
+                  self.next_id, queen, len(insects)):
+            write_varint(block, n)
+        for insect in insects:
+            for n in (insect.place.index, self.type_id(type(insect)),
+                      ids[insect]):
+                write_varint(block, n)
+            write_number(block, insect.armor)
+            if insect.is_ant:
+                damage, buffed, digesting = self.states[insect] = \
+                    ant_state(insect)
+                write_number(block, damage)
+                write_varint(block, int(buffed))
+                write_varint(block, zigzag(digesting))
+            else:
+                effects = insect.effects or ()
+                write_varint(block, len(effects))
+                for gate, remaining in effects:
+                    write_varint(block, self.type_id(effect_of(gate)))
+                    write_varint(block, remaining)
+        self.queen = self.queen_state()
+        write_queen(block, self.queen)
+        active = [ids[bee] for bee in colony.active_bees if bee in ids]
+        write_varint(block, len(active))
+        for bee_id in active:
+            write_varint(block, bee_id)
+        self.write_plan(block, colony.hive.assault_plan)
+        self.keyframes.append((colony.time, len(self.out)))
+        write_record(self.out, KEYFRAME, block)
+
+    def write_plan(self, block, plan):
+        """Append to BLOCK the lane weights of PLAN and its waves from the
+        current turn on.  A lazy plan's waves are specs; an eager plan's are
+        the ids of the Bees waiting in the Hive.  The waves that an
+        EndlessAssaultPlan has yet to draw are not recorded.
+        """
+        weights = plan.lane_weights or ()
+        write_varint(block, len(weights))
+        for weight in weights:
+            write_number(block, weight)
+        lazy = isinstance(plan, ants.LazyAssaultPlan)
+        write_varint(block, int(lazy))
+        if lazy:
+            write_number(block, plan.pending_bees)
+        waves = [(time, wave) for time, wave in sorted(plan.items())
+                 if time >= self.colony.time]
+        write_varint(block, len(waves))
+        for time, wave in waves:
+            write_varint(block, time)
+            write_varint(block, len(wave))
+            for entry in wave:
+                if lazy:
+                    bee_type, armor, count = entry
+                    write_varint(block, self.type_id(bee_type))
+                    write_number(block, armor)
+                    write_varint(block, count)
+                else:
+                    write_varint(block, self.ids[entry])
+
+    def queen_state(self):
+        """Return None if the true queen watches no tunnel, or else the ids
+        of the living ants that her tunnel has logged since she last looked.
+        """
+        tunnel = watched_tunnel(self.colony)
+        if tunnel is None:
+            return None
+        ids = self.ids
+        return tuple(ids[ant] for ant in tunnel.arrivals if ant in ids)
+
+    def record_states(self):
+        """Record the ants whose ant_state, and the queen_state, changed
+        since they were last recorded.
+        """
+        ids, states = self.ids, self.states
+        for ant in all_ants(self.colony):
+            state = ant_state(ant)
+            if states.get(ant) != state and ant in ids:
+                states[ant] = state
+                damage, buffed, digesting = state
+                write_record(self.out, ANT, ids[ant], damage, int(buffed),
+                             digesting)
+        queen = self.queen_state()
+        if queen != self.queen:
+            self.queen = queen
+            block = bytearray()
+            write_queen(block, queen)
+            write_record(self.out, QUEEN, block)
+
+    def turn_started(self, event):
+        colony = event.colony
+        self.record_states()
+        self.turn(colony.time, colony.food)
+        if self.time >= self.keyframes[-1][0] + self.keyframe_interval:
+            self.keyframe()
+
+    def deploy(self, ant, place):
+        """Record ANT, which is not yet known, as deployed to PLACE."""
+        ant_id = self.new_id(ant)
+        self.states[ant] = ant_state(ant)
+        if self.queen is not None and \
+                place.tunnel is watched_tunnel(self.colony):
+            self.queen += (ant_id,)  # Logged again as the replay deploys it
+        write_record(self.out, DEPLOY, place.index, self.type_id(type(ant)))
+
+    def ant_deployed(self, event):
+        ant, place = event
+        # An ant that drowned on arrival was recorded by its damage
+        if ant.place is not None and ant not in self.ids:
+            self.deploy(ant, place)
+
+    def ant_removed(self, event):
+        self.states.pop(event.ant, None)
+        write_record(self.out, REMOVE, self.ids.pop(event.ant))
+
+    def bee_moved(self, event):
+        bee, origin, destination = event
+        bee_id = self.ids.get(bee)
+        if bee_id is None:  # Created on release by a lazy plan
+            self.new_id(bee)
+            write_record(self.out, SPAWN, destination.index,
+                         self.type_id(type(bee)), bee.armor)
+        elif destination is origin.exit:
+            write_record(self.out, ADVANCE, bee_id)
+        else:
+            write_record(self.out, MOVE, bee_id, destination.index)
+
+    def insect_damaged(self, event):
+        insect = event.insect
+        insect_id = self.ids.get(insect)
+        if insect_id is None:  # Damaged as it is deployed
+            self.deploy(insect, insect.place)
+            insect_id = self.ids[insect]
+        write_record(self.out, DAMAGE, insect_id, event.amount)
+
+    def insect_died(self, event):
+        self.ids.pop(event.insect, None)
+        self.states.pop(event.insect, None)
+
+    def effect_applied(self, event):
+        write_record(self.out, EFFECT, self.ids[event.bee],
+                     self.type_id(event.effect), event.duration)
+
+    def effects_counted(self, event):
+        write_record(self.out, COUNT, self.ids[event.bee])
+
+    def close(self):
+        """Stop following the events of the colony."""
+        events = self.colony.events
+        for event_type, handler in self.handlers:
+            if handler in getattr(events, event_type.topic):
+                events.unsubscribe(event_type, handler)
+
+    def finish(self, result):
+        """Stop recording the game, which ended with the GameResult RESULT,
+        and return its replay as bytes.
+        """
+        self.close()
+        self.record_states()
+        self.turn(result.turns, self.colony.food)
+        out = self.out
+        footer = len(out)
+        write_varint(out, len(self.names))
+        for name in self.names:
+            write_string(out, name)
+        write_varint(out, len(self.keyframes))
+        last_time = last_offset = 0
+        for time, offset in self.keyframes:
+            write_varint(out, time - last_time)
+            write_varint(out, offset - last_offset)
+            last_time, last_offset = time, offset
+        write_varint(out, WINNERS.index(result.winner))
+        for n in result[1:]:
+            write_varint(out, n)
+        out += struct.pack('<I', footer)
+        return bytes(out)
+
+def record_game(colony, max_turns=None, keyframe_interval=KEYFRAME_INTERVAL):
+    """Play the game of COLONY as AntColony.play does, and return its
+    GameResult and replay.
+
+    >>> colony = ants.AntColony(ants.baseline_strategy,
+    ...                         ants.Hive(ants.make_hard_assault_plan()),
+    ...                         ants.ant_types(), ants.wet_layout, (4, 9),
+    ...                         headless=True, seed=1)
+    >>> result, data = record_game(colony)
+    >>> result
+    GameResult(winner='bees', turns=13, food_spent=40, bees_killed=5)
+    >>> replay = Replay(data)
+    >>> replay.result == result
+    True
+    >>> ants.insects_hash(replay.colony_at(13)) == ants.insects_hash(colony)
+    True
+    """
+    recorder = ReplayRecorder(colony, keyframe_interval)
+    try:
+        result = colony.play(max_turns)
+    finally:
+        recorder.close()
+    return result, recorder.finish(result)
+
+
+#############
+# Replaying #
+#############
+
+class Replay(object):
+    """A recorded game, read from DATA: bytes or a buffer such as an mmap.
+
+    Only the header and footer are read when a Replay is created; the
+    records are read by colony_at and records.
+
+    layout -- the name of the layout function of the colony
+    dimensions -- the dimensions of the layout
+    keyframe_interval -- the turns between keyframes
+    names -- the names of the insect classes and status effects
+    keyframes -- the (time, offset) of each keyframe
+    result -- the GameResult of the game
+    start, end -- the offsets of the first record and of the footer
+    """
+
+    def __init__(self, data):
+        if bytes(data[:len(MAGIC)]) != MAGIC:
+            raise ValueError('not a replay')
+        self.data = data
+        self.start = self.read_header(data, len(MAGIC))
+        self.end = struct.unpack_from('<I', data, len(data) - 4)[0]
+        self.read_footer(data, self.end)
+        self.types = None  # The classes and status effects named by names
+
+    def read_header(self, data, pos):
+        """Read the header at POS in DATA and return the position after it."""
+        version, pos = read_varint(data, pos)
+        if version != VERSION:
+            raise ValueError('unsupported replay version {0}'.format(version))
+        tunnels, pos = read_varint(data, pos)
+        length, pos = read_varint(data, pos)
+        self.dimensions = (tunnels, length)
+        self.keyframe_interval, pos = read_varint(data, pos)
+        self.layout, pos = read_string(data, pos)
+        return pos
+
+    def read_footer(self, data, pos):
+        """Read the footer at POS in DATA and return the position after it."""
+        count, pos = read_varint(data, pos)
+        self.names = []
+        for _ in range(count):
+            name, pos = read_string(data, pos)
+            self.names.append(name)
+        count, pos = read_varint(data, pos)
+        self.keyframes = []
+        time = offset = 0
+        for _ in range(count):
+            delta, pos = read_varint(data, pos)
+            time += delta
+            delta, pos = read_varint(data, pos)
+            offset += delta
+            self.keyframes.append((time, offset))
+        self.keyframe_times = [time for time, _ in self.keyframes]
+        result = []
+        for _ in range(4):
+            n, pos = read_varint(data, pos)
+            result.append(n)
+        result[0] = WINNERS[result[0]]
+        self.result = ants.GameResult(*result)
+        return pos
+
+    def resolve_types(self):
+        """Return the classes and status effects named by names."""
+        if self.types is None:
+            self.types = [resolve(name) for name in self.names]
+        return self.types
+
+    def segment(self, index):
+        """Return the buffer that holds the keyframe at INDEX in keyframes
+        and the records up to the next one, the offset of the keyframe in
+        it, and the offset where those records end.
+        """
+        if index + 1 < len(self.keyframes):
+            end = self.keyframes[index + 1][1]
+        else:
+            end = self.end
+        return self.data, self.keyframes[index][1], end
+
+    def records(self):
+        """Yield the (time, opcode name, operands) of each record but the
+        keyframes, in order.
+
+        >>> colony = ants.AntColony(ants.baseline_strategy,
+        ...                         ants.Hive(ants.make_test_assault_plan()),
+        ...                         ants.ant_types(), ants.dry_layout, (1, 9),
+        ...                         headless=True, seed=0)
+        >>> replay = Replay(record_game(colony)[1])
+        >>> for record in list(replay.records())[:6]:
+        ...     print(record)
+        (0, 'deploy', [1, 1])
+        (1, 'turn', [1, -1])
+        (2, 'turn', [1, 1])
+        (2, 'move', [0, 9])
+        (2, 'advance', [0])
+        (3, 'turn', [1, 1])
+        """
+        for index in range(len(self.keyframes)):
+            data, pos, end = self.segment(index)
+            opcode, operands, pos = read_record(data, pos)
+            time = read_varint(data, operands[0])[0]
+            while pos < end:
+                opcode, operands, pos = read_record(data, pos)
+                if opcode == TURN:
+                    time += operands[0]
+                yield time, OPCODES[opcode], operands
+
+    def colony_at(self, turn, strategy=None):
+        """Return a new AntColony in the state of the game at the start of
+        TURN, or at its end if TURN is later, which plays on with STRATEGY.
+        Its random choices are not those of the recorded game.
+
+        >>> colony = ants.AntColony(ants.baseline_strategy,
+        ...                         ants.Hive(ants.make_normal_assault_plan()),
+        ...                         ants.ant_types(), ants.wet_layout, (3, 9),
+        ...                         headless=True, seed=2)
+        >>> recorder = ReplayRecorder(colony, keyframe_interval=4)
+        >>> _ = colony.play(10)
+        >>> state = colony.state_hash
+        >>> replay = Replay(recorder.finish(colony.play(20)))
+        >>> replay.keyframe_times
+        [0, 4, 8, 12]
+        >>> copy = replay.colony_at(10, ants.baseline_strategy)
+        >>> copy.state_hash == state
+        True
+        >>> copy.play().winner
+        'bees'
+        """
+        index = max(bisect.bisect_right(self.keyframe_times, turn) - 1, 0)
+        colony = ants.AntColony(strategy, ants.Hive(ants.AssaultPlan()),
+                                ants.ant_types(), resolve(self.layout),
+                                self.dimensions, headless=True)
+        insects = {}
+        data, pos, end = self.segment(index)
+        opcode, operands, pos = read_record(data, pos)
+        next_id = self.read_keyframe(colony, insects, data, operands[0])
+        self.play(colony, insects, next_id, data, pos, end, turn)
+        plan = colony.hive.assault_plan
+        if isinstance(plan, ants.LazyAssaultPlan):  # Drop released waves
+            for time in [time for time in plan if time < colony.time]:
+                plan.pending_bees -= sum(spec[2] for spec in plan.pop(time))
+        return colony
+
+    def read_keyframe(self, colony, insects, data, pos):
+        """Put the insects of the keyframe at POS in DATA into COLONY, which
+        is new, and record them in INSECTS by id, then give COLONY the
+        active bees and assault plan of the keyframe.  Return the next id.
+        """
+        types = self.resolve_types()
+        place_list = colony.place_list
+        values = []
+        for _ in range(6):
+            n, pos = read_varint(data, pos)
+            values.append(n)
+        colony.time, food, colony.food_spent, next_id, queen, count = values
+        colony.food = unzigzag(food)
+        for _ in range(count):
+            index, pos = read_varint(data, pos)
+            kind, pos = read_varint(data, pos)
+            insect_id, pos = read_varint(data, pos)
+            armor, pos = read_number(data, pos)
+            cls = types[kind]
+            if cls.is_ant:
+                insect = cls.for_colony(colony)
+                if isinstance(insect, ants.QueenAnt):
+                    insect.OG = insect_id + 1 == queen
+                damage, pos = read_number(data, pos)
+                buffed, pos = read_varint(data, pos)
+                digesting, pos = read_varint(data, pos)
+                set_ant_state(insect, damage, bool(buffed),
+                              unzigzag(digesting))
+            else:
+                insect = cls(armor)
+                effects, pos = read_varint(data, pos)
+                if effects:
+                    insect.effects = []
+                for _ in range(effects):
+                    effect, pos = read_varint(data, pos)
+                    remaining, pos = read_varint(data, pos)
+                    insect.effects.append([types[effect](ants.proceed),
+                                           remaining])
+            insect.armor = armor
+            ants.Place.add_insect(place_list[index], insect)
+            insects[insect_id] = insect
+        colony.true_queen = insects.get(queen - 1)
+        state, pos = read_queen(data, pos)
+        if state is not None:
+            set_queen_state(colony, insects, state)
+        count, pos = read_varint(data, pos)
+        for _ in range(count):
+            bee_id, pos = read_varint(data, pos)
+            colony.active_bees.append(insects[bee_id])
+        self.read_plan(colony, insects, data, pos)
+        return next_id
+
+    def read_plan(self, colony, insects, data, pos):
+        """Give COLONY the assault plan written by ReplayRecorder.write_plan
+        at POS in DATA, whose Bees are in INSECTS by id.
+        """
+        types = self.resolve_types()
+        count, pos = read_varint(data, pos)
+        weights = []
+        for _ in range(count):
+            weight, pos = read_number(data, pos)
+            weights.append(weight)
+        lazy, pos = read_varint(data, pos)
+        if lazy:
+            plan = ants.LazyAssaultPlan()
+            plan.pending_bees, pos = read_number(data, pos)
+        else:
+            plan = ants.AssaultPlan()
+        count, pos = read_varint(data, pos)
+        for _ in range(count):
+            time, pos = read_varint(data, pos)
+            size, pos = read_varint(data, pos)
+            wave = plan[time] = []
+            for _ in range(size):
+                if lazy:
+                    kind, pos = read_varint(data, pos)
+                    armor, pos = read_number(data, pos)
+                    bees, pos = read_varint(data, pos)
+                    wave.append((types[kind], armor, bees))
+                else:
+                    bee_id, pos = read_varint(data, pos)
+                    wave.append(insects[bee_id])
+        if weights:
+            plan.lane_weights = weights
+            colony.bee_lanes = ants.AliasTable(weights)
+        colony.hive.assault_plan = plan
+
+    def play(self, colony, insects, next_id, data, pos, end, turn):
+        """Apply the records from POS to END in DATA to COLONY, whose insects
+        are in INSECTS by id and whose next new insect has NEXT_ID, up to the
+        start of TURN.
+
+        Places are changed with the methods of Place itself, so that Water
+        does not drown the ants deployed to it twice: their damage follows
+        in the records.  Turns skipped by AntColony.fast_forward only
+        gather food, at the same rate on each turn.
+        """
+        types = self.resolve_types()
+        place_list, active_bees = colony.place_list, colony.active_bees
+        add_insect, remove_insect = ants.Place.add_insect, ants.Place.remove_insect
+        while pos < end and colony.time < turn:
+            opcode, operands, pos = read_record(data, pos)
+            if opcode == TURN:
+                turns, food = operands
+                if colony.time + turns > turn:
+                    colony.food += food * (turn - colony.time) // turns
+                    colony.time = turn
+                    break
+                colony.time += turns
+                colony.food += food
+            elif opcode == ADVANCE:
+                bee = insects[operands[0]]
+                place = bee.place
+                remove_insect(place, bee)
+                if place.exit is not colony.queen:  # Else the bees won
+                    add_insect(place.exit, bee)
+            elif opcode == DAMAGE:
+                insect_id, amount = operands
+                insect = insects[insect_id]
+                ants.Insect.reduce_armor(insect, amount)
+                if insect.armor <= 0:
+                    del insects[insect_id]
+                    if insect in active_bees:
+                        active_bees.remove(insect)
+            elif opcode == COUNT:
+                ants.pass_effects(insects[operands[0]].effects, colony)
+            elif opcode == DEPLOY:
+                cls = types[operands[1]]
+                ant = insects[next_id] = cls.for_colony(colony)
+                next_id += 1
+                add_insect(place_list[operands[0]], ant)
+                colony.food_spent += cls.food_cost
+            elif opcode == REMOVE:
+                ant = insects.pop(operands[0])
+                remove_insect(ant.place, ant)
+            elif opcode == SPAWN:
+                index, kind, armor = operands
+                bee = insects[next_id] = types[kind](armor)
+                next_id += 1
+                add_insect(place_list[index], bee)
+                active_bees.append(bee)
+            elif opcode == MOVE:
+                bee = insects[operands[0]]
+                if bee.place is colony.hive:
+                    active_bees.append(bee)
+                remove_insect(bee.place, bee)
+                add_insect(place_list[operands[1]], bee)
+            elif opcode == EFFECT:
+                bee_id, effect, duration = operands
+                ants.apply_effect(types[effect], insects[bee_id], duration)
+            elif opcode == ANT:
+                ant_id, damage, buffed, digesting = operands
+                set_ant_state(insects[ant_id], damage, bool(buffed), digesting)
+            elif opcode == QUEEN:
+                set_queen_state(colony, insects, read_queen(data, operands[0])[0])
+
+
+def dump_colony(colony):
+    """Return the state of COLONY as a replay of no turns, which load_colony
+    reads back into a new AntColony.  It holds one keyframe, like those that
+    begin each segment of a replay or an archive.
+
+    >>> colony = ants.AntColony(ants.baseline_strategy,
+    ...                         ants.Hive(ants.make_insane_assault_plan()),
+    ...                         ants.ant_types(), ants.wet_layout, (4, 9),
+    ...                         headless=True, seed=3)
+    >>> _ = colony.play(7)
+    >>> copy = load_colony(dump_colony(colony))
+    >>> copy.state_hash == colony.state_hash, copy.time, copy.food_spent
+    (True, 7, 16)
+    >>> game_state(copy) == game_state(colony)
+    True
+    """
+    result = ants.GameResult(None, colony.time, colony.food_spent, 0)
+    return ReplayRecorder(colony).finish(result)
+
+def load_colony(data):
+    """Return a new AntColony in the state recorded by dump_colony."""
+    replay = Replay(data)
+    return replay.colony_at(replay.keyframe_times[0])
+
+
+############
+# Archives #
+############
+
+ARCHIVE_MAGIC = b'AVSA'
+ARCHIVE_VERSION = 1
+CHUNK_SIZE = 1 << 16  # Bytes of records to compress together
+COMPRESSIONS = ['none', 'zlib', 'lzma']
+CHUNK_ENTRY = struct.Struct('<QI')  # Offset and size of a chunk
+GAME_ENTRY = struct.Struct('<QQ')   # Id and directory offset of a game
+TRAILER = struct.Struct('<QQQQ')    # Offsets and lengths of the tables
+
+def compressor(compression):
+    """Return the (compress, decompress) functions of COMPRESSION."""
+    if compression == 'zlib':
+        import zlib
+        return zlib.compress, zlib.decompress
+    if compression == 'lzma':
+        import lzma
+        return lzma.compress, lzma.decompress
+    return bytes, bytes
+
+class ArchiveWriter(object):
+    """Writes many replays to one archive file at PATH.
+
+    The records of each replay are split at its keyframes into segments,
+    which are packed in order into chunks of about chunk_size bytes, each
+    compressed on its own.  A segment is never split, so rebuilding a turn
+    decompresses one chunk.  The header and footer of each replay are kept
+    uncompressed in a directory that also holds the chunk, offset and size
+    of each of its segments.  The file ends with a table of the offset and
+    size of each chunk, a table of the id and directory offset of each game
+    sorted by id, and a trailer locating them, so a ReplayArchive finds a
+    game by binary search over the memory-mapped file.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'games.archive')
+    >>> games = {}
+    >>> with ArchiveWriter(path, chunk_size=1024) as writer:
+    ...     for seed in range(20):
+    ...         colony = ants.AntColony(ants.baseline_strategy,
+    ...                                 ants.Hive(ants.make_hard_assault_plan()),
+    ...                                 ants.ant_types(), ants.dry_layout,
+    ...                                 (4, 9), headless=True, seed=seed)
+    ...         recorder = ReplayRecorder(colony, keyframe_interval=4)
+    ...         _ = colony.play(6)
+    ...         games[seed] = colony.state_hash
+    ...         writer.add(seed, recorder.finish(colony.play()))
+    >>> with ReplayArchive(path) as archive:
+    ...     len(archive), archive.chunks > 1, 7 in archive, 20 in archive
+    ...     all(archive.colony_at(seed, 6).state_hash == games[seed]
+    ...         for seed in archive.game_ids())
+    (20, True, True, False)
+    True
+    """
+
+    def __init__(self, path, compression='zlib', chunk_size=CHUNK_SIZE):
+        self.file = open(path, 'wb')
+        self.compress = compressor(compression)[0]
+        self.chunk_size = chunk_size
+        self.chunk = bytearray()  # The records of the chunk being filled
+        self.chunk_entries = []   # The offset and size of each chunk
+        self.games = {}           # The directory offset of each game id
+        header = bytearray(ARCHIVE_MAGIC)
+        write_varint(header, ARCHIVE_VERSION)
+        write_varint(header, COMPRESSIONS.index(compression))
+        self.file.write(header)
+
+    def add(self, game_id, data):
+        """Add the replay DATA, returned by ReplayRecorder.finish, as the game
+        GAME_ID, a non-negative integer.
+        """
+        if game_id in self.games:
+            raise ValueError('duplicate game id {0}'.format(game_id))
+        replay = Replay(data)
+        directory = bytearray(data[len(MAGIC):replay.start])
+        directory += data[replay.end:-4]
+        for index in range(len(replay.keyframes)):
+            _, start, end = replay.segment(index)
+            if self.chunk and len(self.chunk) + end - start > self.chunk_size:
+                self.flush()
+            for n in (len(self.chunk_entries), len(self.chunk), end - start):
+                write_varint(directory, n)
+            self.chunk += data[start:end]
+        self.games[game_id] = self.file.tell()
+        self.file.write(directory)
+
+    def flush(self):
+        """Compress and write the chunk being filled."""
+        if self.chunk:
+            compressed = self.compress(bytes(self.chunk))
+            self.chunk_entries.append((self.file.tell(), len(compressed)))
+            self.file.write(compressed)
+            self.chunk = bytearray()
+
+    def close(self):
+        """Write the last chunk and the tables, and close the file."""
+        if self.file.closed:
+            return
+        self.flush()
+        chunks = self.file.tell()
+        for entry in self.chunk_entries:
+            self.file.write(CHUNK_ENTRY.pack(*entry))
+        games = self.file.tell()
+        for entry in sorted(self.games.items()):
+            self.file.write(GAME_ENTRY.pack(*entry))
+        self.file.write(TRAILER.pack(chunks, len(self.chunk_entries),
+                                     games, len(self.games)))
+        self.file.write(ARCHIVE_MAGIC)
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ReplayArchive(object):
+    """An archive written by ArchiveWriter, read through mmap.  Opening it
+    reads only its header and trailer; a game's directory is read when the
+    game is, and its chunks when its turns are rebuilt.  The last chunk
+    decompressed is kept, so reading the games in order decompresses each
+    chunk once.
+
+    The segments of a game are those of its replay, so the colonies that
+    colony_at rebuilds have the state of individual ants, the active bees
+    and the assault plan, as Replay.colony_at's do.
+
+    >>> import os, tempfile
+    >>> path = os.path.join(tempfile.mkdtemp(), 'reckless.archive')
+    >>> colony = ants.AntColony(reckless_strategy,
+    ...                         ants.Hive(ants.make_hard_assault_plan()),
+    ...                         ants.ant_types(), ants.dry_layout, (4, 9),
+    ...                         food=30, headless=True, seed=7)
+    >>> recorder = ReplayRecorder(colony, keyframe_interval=4)
+    >>> _ = colony.play(7)
+    >>> state = game_state(colony)
+    >>> with ArchiveWriter(path) as writer:
+    ...     writer.add(7, recorder.finish(colony.play()))
+    >>> with ReplayArchive(path) as archive:
+    ...     copy = archive.colony_at(7, 7, ants.baseline_strategy)
+    >>> game_state(copy) == state
+    True
+    >>> for ant in all_ants(copy):
+    ...     if ant.buffed or isinstance(ant, ants.HungryAnt):
+    ...         print(ant.name, ant_state(ant))
+    Hungry (0, False, -6)
+    Short (2, True, 0)
+    Harvester (0, True, 0)
+    """
+
+    def __init__(self, path):
+        import mmap
+        self.file = open(path, 'rb')
+        self.data = data = mmap.mmap(self.file.fileno(), 0,
+                                     access=mmap.ACCESS_READ)
+        if data[:len(ARCHIVE_MAGIC)] != ARCHIVE_MAGIC or \
+                data[-len(ARCHIVE_MAGIC):] != ARCHIVE_MAGIC:
+            raise ValueError('not a replay archive')
+        version, pos = read_varint(data, len(ARCHIVE_MAGIC))
+        if version != ARCHIVE_VERSION:
+            raise ValueError('unsupported archive version {0}'.format(version))
+        compression, pos = read_varint(data, pos)
+        self.decompress = compressor(COMPRESSIONS[compression])[1]
+        self.chunk_table, self.chunks, self.game_table, self.games = \
+            TRAILER.unpack_from(data, len(data) - len(ARCHIVE_MAGIC) -
+                                TRAILER.size)
+        self.cached = (None, None)  # The index and records of a chunk
+
+    def __len__(self):
+        return self.games
+
+    def __contains__(self, game_id):
+        return self.find(game_id) is not None
+
+    def game_ids(self):
+        """Yield the id of each game, in increasing order."""
+        for i in range(self.games):
+            yield GAME_ENTRY.unpack_from(
+                self.data, self.game_table + i * GAME_ENTRY.size)[0]
+
+    def find(self, game_id):
+        """Return the directory offset of the game GAME_ID, or None."""
+        low, high = 0, self.games
+        while low < high:
+            mid = (low + high) // 2
+            key, offset = GAME_ENTRY.unpack_from(
+                self.data, self.game_table + mid * GAME_ENTRY.size)
+            if key == game_id:
+                return offset
+            if key < game_id:
+                low = mid + 1
+            else:
+                high = mid
+        return None
+
+    def chunk(self, index):
+        """Return the decompressed records of the chunk at INDEX."""
+        if self.cached[0] != index:
+            offset, size = CHUNK_ENTRY.unpack_from(
+                self.data, self.chunk_table + index * CHUNK_ENTRY.size)
+            self.cached = (index, self.decompress(self.data[offset:offset + size]))
+        return self.cached[1]
+
+    def replay(self, game_id):
+        """Return the ArchivedReplay of the game GAME_ID."""
+        offset = self.find(game_id)
+        if offset is None:
+            raise KeyError(game_id)
+        return ArchivedReplay(self, offset)
+
+    def colony_at(self, game_id, turn, strategy=None):
+        """Return a new AntColony in the state of the game GAME_ID at the
+        start of TURN, which plays on with STRATEGY, as Replay.colony_at does.
+        """
+        return self.replay(game_id).colony_at(turn, strategy)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class ArchivedReplay(Replay):
+    """A Replay read from the directory at OFFSET in a ReplayArchive, whose
+    segments are read from the archive's chunks.
+    """
+
+    def __init__(self, archive, offset):
+        data = archive.data
+        pos = self.read_footer(data, self.read_header(data, offset))
+        self.archive = archive
+        self.segments = []  # The chunk, offset and size of each segment
+        for _ in self.keyframes:
+            values = []
+            for _ in range(3):
+                n, pos = read_varint(data, pos)
+                values.append(n)
+            self.segments.append(values)
+        self.types = None
+
+    def segment(self, index):
+        chunk, offset, size = self.segments[index]
+        return self.archive.chunk(chunk), offset, offset + size
+
+
+############
+# Checking #
+############
+
+def reckless_strategy(colony):
+    """A strategy for checking replays, which tries a few deploys of random
+    ants to random places in the tunnels each turn, including places where
+    they cannot go, and sometimes removes an ant.  Failed deploys are ignored, as the
+    GUIs ignore them.
+    """
+    rng = colony.rng
+    names = sorted(name for name, place in colony.places.items()
+                   if place is not colony.hive)
+    ant_types = sorted(colony.ant_types)
+    for _ in range(3):
+        name = rng.choice(names)
+        if rng.random() < 0.2:
+            colony.remove_ant(name)
+            continue
+        try:
+            colony.deploy_ant(name, rng.choice(ant_types))
+        except AssertionError:
+            pass
+
+def game_state(colony):
+    """Return the state of COLONY that check_game compares: its insects_hash,
+    food and time, which state_hash covers, and what that leaves out.  That
+    is the place, name, armor and ant_state of each ant, the places and names
+    of the living ants logged for the true queen, the places and armor of the
+    active bees still in the colony, in order, and the number of bees left.
+    """
+    tunnel = watched_tunnel(colony)
+    if tunnel is not None:
+        tunnel = [(ant.place.index, ant.name) for ant in tunnel.arrivals
+                  if ant.place is not None]
+    return (ants.insects_hash(colony), colony.food, colony.time,
+            [(ant.place.index, ant.name, ant.armor) + ant_state(ant)
+             for ant in all_ants(colony)],
+            tunnel,
+            [(bee.place.index, bee.armor) for bee in colony.active_bees
+             if bee.armor > 0 and bee.place is not None],
+            colony.num_bees)
+
+def check_game(colony, max_turns=None, keyframe_interval=KEYFRAME_INTERVAL):
+    """Record the game of COLONY, and return the turns, including the end of
+    the game, at which its replay differs from it in the game_state.  Turns
+    skipped by AntColony.fast_forward are not checked.
+
+    >>> def reckless_colony(seed, layout=ants.wet_layout, food=20):
+    ...     return ants.AntColony(reckless_strategy,
+    ...                           ants.Hive(ants.make_hard_assault_plan()),
+    ...                           ants.ant_types(), layout, (4, 9),
+    ...                           food=food, headless=True, seed=seed)
+    >>> [check_game(reckless_colony(seed), 40) for seed in range(3)]
+    [[], [], []]
+    >>> [check_game(reckless_colony(seed, ants.dry_layout, 30), 40, 8)
+    ...  for seed in range(4)]
+    [[], [], [], []]
+    """
+    states = {}
+    def turn_started(event):
+        states[colony.time] = game_state(colony)
+    colony.events.subscribe(ants.TurnStarted, turn_started)
+    try:
+        result, data = record_game(colony, max_turns, keyframe_interval)
+    finally:
+        colony.events.unsubscribe(ants.TurnStarted, turn_started)
+    state = game_state(colony)  # The game may end before its time passes
+    states[result.turns] = state[:2] + (result.turns,) + state[3:]
+    replay = Replay(data)
+    differ = []
+    for turn, state in sorted(states.items()):
+        if game_state(replay.colony_at(turn)) != state:
+            differ.append(turn)
+    return differ
+
+def show(replay, turn):
+    """Print the result and layout of REPLAY, and the state at TURN."""
+    print(replay.result)
+    print('{0}x{1} {2}, {3} keyframes'.format(
+        replay.dimensions[0], replay.dimensions[1], replay.layout,
+        len(replay.keyframes)))
+    if turn is not None:
+        print(replay.colony_at(turn))
+
+
+@main
+def run(*args):
+    import argparse
+    import batch
+    parser = argparse.ArgumentParser(description="Record and replay games")
+    parser.add_argument('path', nargs='?', help='the replay file')
+    parser.add_argument('--record', action='store_true',
+                        help='play a game and record it to the replay file')
+    parser.add_argument('--turn', type=int, default=None,
+                        help='show the state of the replay at this turn')
+    parser.add_argument('--game', type=int, default=None,
+                        help='the id of the game to show from an archive')
+    parser.add_argument('--check', type=int, metavar='GAMES', default=None,
+                        help='check the replays of GAMES seeded games')
+    parser.add_argument('-d', type=str, default='easy', choices=sorted(batch.PLANS),
+                        metavar='DIFFICULTY', help='sets the assault plan')
+    parser.add_argument('-w', '--water', action='store_true',
+                        help='loads a full layout with water')
+    strategies = dict(batch.STRATEGIES, reckless=reckless_strategy)
+    parser.add_argument('-s', '--strategy', default='baseline',
+                        choices=sorted(strategies), help='strategy to play')
+    parser.add_argument('--food', type=int, default=2,
+                        help='number of food to start with')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for the random choices made during the game')
+    parser.add_argument('--max-turns', type=int, default=None,
+                        help='stop the game after this many turns')
+    parser.add_argument('--interval', type=int, default=KEYFRAME_INTERVAL,
+                        help='turns between keyframes')
+    args = parser.parse_args(args)
+
+    plan_factory, num_tunnels = batch.PLANS[args.d]
+    layout = ants.wet_layout if args.water else ants.dry_layout
+    def make_colony(seed):
+        return ants.AntColony(strategies[args.strategy],
+                              ants.Hive(plan_factory()), ants.ant_types(),
+                              layout, (num_tunnels, 9), args.food,
+                              headless=True, seed=seed)
+    if args.check is not None:
+        differ = sum(1 for seed in range(args.check)
+                     if check_game(make_colony(seed), args.max_turns,
+                                   args.interval))
+        print('{0} of {1} games differ'.format(differ, args.check))
+        return
+    if args.path is None:
+        parser.error('a replay file is required')
+    if args.record:
+        result, data = record_game(make_colony(args.seed), args.max_turns,
+                                   args.interval)
+        with open(args.path, 'wb') as f:
+            f.write(data)
+        print(result)
+        print('{0} bytes'.format(len(data)))
+        return
+    with open(args.path, 'rb') as f:
+        is_archive = f.read(len(ARCHIVE_MAGIC)) == ARCHIVE_MAGIC
+    if is_archive:
+        with ReplayArchive(args.path) as archive:
+            print('{0} games in {1} chunks'.format(len(archive), archive.chunks))
+            if args.game is not None:
+                show(archive.replay(args.game), args.turn)
+        return
+    with open(args.path, 'rb') as f:
+        show(Replay(f.read()), args.turn)
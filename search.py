@@ -0,0 +1,385 @@
+"""The search module provides a strategy for Ants Vs. SomeBees that chooses
+its moves by Monte Carlo search over copies of the colony.
+
+Each turn, the strategy makes up to max_moves moves.  For each one, it
+lists a small set of candidate moves: the move of a fast rollout strategy,
+passing, deploying each affordable ant type at the back and front of each
+tunnel, and removing the ants that bees are stinging.  It then scores the
+candidates with UCB1, by making each move on a clone of the colony and
+playing a rollout of a few turns with the rollout strategy, until the
+turn's time budget runs out.  Ties go to the rollout strategy's move, so
+the search only departs from it when another move does better.  Searches
+can be split across a pool of processes (root parallelism), each
+searching from its own copy of the colony with its own random choices.
+The scores of each position are kept in a transposition table keyed by
+the colony's state_hash, so a search of a position seen before, such as
+the opening of another game, continues from the earlier scores.
+
+Run with `python3 search.py -d easy --budget 0.1`.
+"""
+
+import io
+import math
+import multiprocessing
+import pickle
+import random
+import time
+import types
+from collections import OrderedDict
+
+import ants
+from ucb import main
+
+#########
+# Moves #
+#########
+
+ROLLOUT = ('rollout',)
+
+def tunnels_of(colony):
+    """Return the places of each tunnel of COLONY, from the queen outward."""
+    tunnels = []
+    for entrance in colony.bee_entrances:
+        tunnel, place = [], entrance
+        while place.exit is not None:
+            tunnel.append(place)
+            place = place.exit
+        tunnels.append(tunnel[::-1])
+    return tunnels
+
+def can_deploy(place, ant_type):
+    """Return whether an ant of ANT_TYPE can be deployed to PLACE and
+    survive being added to it.
+    """
+    if isinstance(place, ants.Water) and not ant_type.watersafe:
+        return False
+    ant = place.ant
+    if ant is None:
+        return True
+    if ant.container:
+        return ant.ant is None and not ant_type.container
+    return ant_type.container
+
+def candidate_moves(colony):
+    """Return the moves that the search considers for COLONY.
+
+    A move is ROLLOUT for making the move of the rollout strategy, None for
+    passing, ('deploy', place name, ant type name), or ('remove', place
+    name).  Ants may be deployed to the legal place nearest the queen in
+    each tunnel and to the legal place nearest the bees that holds none.
+    A QueenAnt is only deployed if there is no true queen yet.
+
+    >>> colony = ants.AntColony(None, ants.Hive(ants.AssaultPlan()),
+    ...                         [ants.HarvesterAnt, ants.ThrowerAnt],
+    ...                         ants.dry_layout, (1, 3), food=2, headless=True)
+    >>> colony.places['tunnel_0_1'].add_insect(ants.Bee(3))
+    >>> for move in candidate_moves(colony):
+    ...     print(move)
+    ('rollout',)
+    None
+    ('deploy', 'tunnel_0_0', 'Harvester')
+    ('deploy', 'tunnel_0_2', 'Harvester')
+    """
+    moves = [ROLLOUT, None]
+    tunnels = tunnels_of(colony)
+    for name, ant_type in colony.ant_types.items():
+        if ant_type.food_cost > colony.food or (
+                ant_type is ants.QueenAnt and colony.true_queen is not None):
+            continue
+        for tunnel in tunnels:
+            legal = [p for p in tunnel if not p.bees and can_deploy(p, ant_type)]
+            for place in legal[:1] + legal[-1:]:
+                move = ('deploy', place.name, name)
+                if move not in moves:
+                    moves.append(move)
+    for tunnel in tunnels:
+        for place in tunnel:
+            ant = place.ant
+            if place.bees and ant is not None and ant is not colony.true_queen:
+                moves.append(('remove', place.name))
+    return moves
+
+def make_move(colony, move, rollout):
+    """Make MOVE, as returned by candidate_moves, in COLONY, where ROLLOUT
+    is the rollout strategy.
+    """
+    if move is None:
+        return
+    if move == ROLLOUT:
+        rollout(colony)
+    elif move[0] == 'deploy':
+        colony.deploy_ant(move[1], move[2])
+    else:
+        colony.remove_ant(move[1])
+
+
+############
+# Rollouts #
+############
+
+def random_strategy(colony):
+    """A rollout strategy that makes one random move each turn."""
+    move = colony.rng.choice(candidate_moves(colony)[1:])
+    make_move(colony, move, None)
+
+def evaluate(colony, result, start, horizon):
+    """Score the outcome of a rollout that started at time START in [0, 1].
+
+    The ants winning scores 1.  A rollout that reaches its HORIZON scores
+    between 0.5 and 1, by the fraction of bees killed among those killed
+    or on the board.  The bees winning scores below 0.25, more for holding
+    out longer.
+    """
+    if result.winner == 'ants':
+        return 1.0
+    if result.winner == 'bees':
+        return 0.25 * (colony.time - start) / (horizon + 1)
+    left = len(colony.bee_registry) - len(colony.hive.bees)
+    return 0.5 + 0.5 * result.bees_killed / (result.bees_killed + left + 1)
+
+def search_root(root, moves, duration, iterations, horizon, exploration,
+                seed, prior=None):
+    """Score MOVES by UCB1 rollouts from ROOT, a colony in the middle of a
+    turn whose strategy is the rollout strategy, for at most DURATION
+    seconds and ITERATIONS rollouts.  PRIOR is a list of (visits, total
+    score) for each move from earlier searches of the same position.
+
+    Returns a list of [visits, total score] for each move, including PRIOR.
+    """
+    deadline = time.perf_counter() + duration
+    rng = random.Random(seed)
+    saved = root.snapshot()
+    stats = [list(s) for s in prior] if prior else [[0, 0.0] for _ in moves]
+    visited = sum(s[0] for s in stats)
+    for n in range(visited, visited + iterations):
+        if n > visited and time.perf_counter() >= deadline:
+            break
+        unvisited = [i for i, s in enumerate(stats) if not s[0]]
+        if unvisited:
+            i = unvisited[0]
+        else:
+            scale = exploration * math.sqrt(math.log(n))
+            i = max(range(len(moves)), key=lambda i: stats[i][1] / stats[i][0]
+                    + scale / math.sqrt(stats[i][0]))
+        root.restore(saved)
+        root.rng.seed(rng.getrandbits(64))
+        try:
+            make_move(root, moves[i], root.strategy)
+        except AssertionError:
+            pass
+        start = root.time
+        result = root.play(start + horizon, mid_turn=True)
+        stats[i][0] += 1
+        stats[i][1] += evaluate(root, result, start, horizon)
+    return stats
+
+
+#####################
+# Root parallelism  #
+#####################
+
+class ColonyPickler(pickle.Pickler):
+    """A Pickler for colonies that pickles the status effect gates made by
+    apply_effect, which are local functions, by the effect that made them.
+    """
+
+    def reducer_override(self, obj):
+        if type(obj) is types.FunctionType:
+            for effect in (ants.make_slow, ants.make_stun):
+                if obj.__qualname__.startswith(effect.__name__ + '.'):
+                    return effect, (ants.proceed,)
+        return NotImplemented
+
+def dumps_colony(colony):
+    """Pickle COLONY, including any status effects of its bees."""
+    data = io.BytesIO()
+    ColonyPickler(data, pickle.HIGHEST_PROTOCOL).dump(colony)
+    return data.getvalue()
+
+def search_task(task):
+    """Run search_root in a worker process on a pickled colony."""
+    data, moves, duration, iterations, horizon, exploration, seed, prior = task
+    return search_root(pickle.loads(data), moves, duration, iterations,
+                       horizon, exploration, seed, prior)
+
+
+##################
+# Transpositions #
+##################
+
+class TranspositionTable(object):
+    """A table of at most SIZE entries keyed by colony state hashes, which
+    discards the least recently used entry when it is full.
+
+    >>> table = TranspositionTable(2)
+    >>> table.put(1, 'one')
+    >>> table.put(2, 'two')
+    >>> table.get(1)
+    'one'
+    >>> table.put(3, 'three')
+    >>> table.get(2) is None, len(table), table.hits, table.misses
+    (True, 2, 1, 1)
+    """
+
+    def __init__(self, size=10000):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        """Return the entry for KEY, or DEFAULT if there is none."""
+        entry = self.entries.get(key, self)
+        if entry is self:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """Set the entry for KEY, discarding the oldest entry if full."""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+
+############
+# Strategy #
+############
+
+class SearchStrategy(object):
+    """A strategy that chooses moves by Monte Carlo search.
+
+    budget -- the seconds of search per turn
+    max_moves -- the most moves to make per turn
+    iterations -- the most rollouts per move (per worker)
+    horizon -- the number of turns in each rollout
+    rollout -- the strategy that plays rollouts, such as
+               ants.baseline_strategy or random_strategy
+    workers -- the number of processes to search with, or 0 to search in
+               the calling process
+    exploration -- the UCB1 exploration constant
+    seed -- the seed of the search's random choices
+    table_size -- the most positions to keep scores for, or 0 for none
+    """
+
+    def __init__(self, budget=0.05, max_moves=2, iterations=1000, horizon=20,
+                 rollout=ants.baseline_strategy, workers=0, exploration=0.5,
+                 seed=None, table_size=10000):
+        self.budget = budget
+        self.max_moves = max_moves
+        self.iterations = iterations
+        self.horizon = horizon
+        self.rollout = rollout
+        self.workers = workers
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        self.table = TranspositionTable(table_size) if table_size else None
+        self.pool = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['pool'] = None
+        return state
+
+    def __call__(self, colony):
+        deadline = time.perf_counter() + self.budget
+        for i in range(self.max_moves):
+            moves = candidate_moves(colony)
+            if len(moves) == 1:
+                return
+            duration = (deadline - time.perf_counter()) / (self.max_moves - i)
+            move = self.choose(colony, moves, max(duration, 0))
+            make_move(colony, move, self.rollout)
+            if move is None or move == ROLLOUT:
+                return
+
+    def choose(self, colony, moves, duration):
+        """Return the most visited of MOVES after searching COLONY for
+        DURATION seconds, counting earlier searches of the same position.
+        """
+        key = colony.state_hash
+        entry = self.table.get(key) if self.table is not None else None
+        prior = entry and [entry.get(move, (0, 0.0)) for move in moves]
+        root = colony.clone()
+        root.strategy = self.rollout
+        root.headless = True
+        settings = (duration, self.iterations, self.horizon, self.exploration)
+        seeds = [self.rng.getrandbits(64) for _ in range(max(self.workers, 1))]
+        if self.workers:
+            try:
+                data = dumps_colony(root)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                data = None  # An endless plan's waves cannot be pickled
+        if self.workers and data is not None:
+            if self.pool is None:
+                self.pool = multiprocessing.Pool(self.workers)
+            results = self.pool.map(search_task, [(data, moves) + settings +
+                                                  (seed, prior) for seed in seeds])
+        else:
+            results = [search_root(root, moves, *settings, seeds[0], prior)]
+        # Each result includes the prior scores, which are counted once
+        total = [[(1 - len(results)) * n for n in p] for p in prior] \
+            if prior else [[0, 0.0] for _ in moves]
+        for stats in results:
+            for t, s in zip(total, stats):
+                t[0] += s[0]
+                t[1] += s[1]
+        if self.table is not None:
+            self.table.put(key, dict(zip(moves, map(tuple, total))))
+        return moves[max(range(len(moves)), key=lambda i: total[i][0])]
+
+    def close(self):
+        """Shut down the pool of worker processes, if any."""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+
+search_strategy = SearchStrategy()
+
+
+@main
+def run(*args):
+    import argparse
+    parser = argparse.ArgumentParser(description="Play Ants vs. SomeBees by search")
+    parser.add_argument('-d', type=str, metavar='DIFFICULTY',
+                        help='sets difficulty of game (easy/medium/hard/insane/endless)')
+    parser.add_argument('-w', '--water', action='store_true',
+                        help='loads a full layout with water')
+    parser.add_argument('--food', type=int, default=2,
+                        help='number of food to start with when testing')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='seed for the random choices made during the game')
+    parser.add_argument('--max-turns', type=int, default=None,
+                        help='stop the game after this many turns')
+    parser.add_argument('--budget', type=float, default=0.05,
+                        help='seconds of search per turn')
+    parser.add_argument('--moves', type=int, default=2,
+                        help='most moves to make per turn')
+    parser.add_argument('--rollout', choices=['baseline', 'random'],
+                        default='baseline', help='strategy that plays rollouts')
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help='number of worker processes to search with')
+    parser.add_argument('--table', type=int, default=10000,
+                        help='positions to keep in the transposition table (0 for none)')
+    args = parser.parse_args(args)
+
+    rollout = {'baseline': ants.baseline_strategy,
+               'random': random_strategy}[args.rollout]
+    strategy = SearchStrategy(args.budget, args.moves, rollout=rollout,
+                              workers=args.workers, seed=args.seed,
+                              table_size=args.table)
+    colony = ants.make_colony(args, strategy, headless=True)
+    try:
+        print(colony.play(args.max_turns))
+        if strategy.table is not None:
+            print('transposition table: {0} positions, {1} hits, {2} misses'.format(
+                len(strategy.table), strategy.table.hits, strategy.table.misses))
+    finally:
+        strategy.close()
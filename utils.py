@@ -55,6 +55,23 @@ def print_expired_insects(self, rv, *args):
         print('{0}({1}) ran out of armor and expired'.format(
             type(self).__name__, self.place))
 
+def print_expired(event):
+    """Handler for ants.InsectDied events, which prints a message about the
+    insect that expired.
+
+    >>> from ants import AntColony, AssaultPlan, Hive, InsectDied, Bee
+    >>> from ants import ant_types, dry_layout
+    >>> colony = AntColony(None, Hive(AssaultPlan()), ant_types(), dry_layout,
+    ...                    (1, 9))
+    >>> handler = colony.events.subscribe(InsectDied, print_expired)
+    >>> bee = Bee(3)
+    >>> colony.places['tunnel_0_0'].add_insect(bee)
+    >>> bee.reduce_armor(3)
+    Bee(tunnel_0_0) ran out of armor and expired
+    """
+    print('{0}({1}) ran out of armor and expired'.format(
+        type(event.insect).__name__, event.place))
+
 def print_thrower_target(self, rv, *args):
     """Prints the target of a ThrowerAnt, if the ThrowerAnt found a target.
 